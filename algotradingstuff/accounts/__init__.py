@@ -2,3 +2,22 @@ from .oandaaccount import OandaAccount
 from .oandaaccount import get_account
 from .oandaaccount import get_accounts
 from .errors import AccountError
+from .state import AccountState
+from .manager import AccountManager
+from .asyncaccount import AsyncOandaAccount
+from .asyncaccount import get_account_async
+from .asyncaccount import get_accounts_async
+from .bulk import BulkReport
+from .bulk import BulkResult
+from .bulk import submit_orders
+from .bulk import cancel_orders
+from .bulk import close_trades
+from .bulk import close_positions
+from .bulk import close_all_trades
+from .models import Order
+from .models import Trade
+from .models import Position
+from .models import Transaction
+from .models import Candle
+from .models import AccountSummary
+from .models import to_models
@@ -0,0 +1,201 @@
+import os
+import requests
+from algotradingstuff.accounts.errors import AccountError
+from algotradingstuff.accounts.oandaaccount import OandaAccount
+
+
+class AsyncOandaAccount(OandaAccount):
+    """
+    This class mirrors `OandaAccount`, but sends each request with an `AsyncOandaSession` and returns
+    the response instead of the request. Every method is a coroutine.
+    """
+
+    def __init__(self, api_key, base_url, session, **kwargs):
+        """
+
+        :param api_key:
+        :param base_url:
+        :param session: the `AsyncOandaSession` used to send requests. It can be shared by many accounts
+        :param kwargs:
+        """
+        super().__init__(api_key, base_url, session=session, **kwargs)
+
+    async def _update(self, last_transaction_id: str, keys: tuple, what: str):
+        content, new_transaction_id = await self.session.send(super().get_changes(last_transaction_id))
+        parts = [content.get(key, {}) for key in keys]
+        if all(part != {} for part in parts):
+            for part in parts:
+                self._merge(part)
+            return new_transaction_id or last_transaction_id
+        else:
+            raise AccountError(f'failed to update {what} of account with ID: {self.id}.' + os.linesep +
+                               f'Reason {content.get("errorMessage", "")}')
+
+    async def update_account_state(self, last_transaction_id: str):
+        """
+        Update the information about the account's price dependent state since the most recent transaction.
+        :param last_transaction_id: The ID of the most recent transaction
+        :returns: bool
+        :raises: AccountError
+        """
+        await self._update(last_transaction_id, ('state',), 'state')
+        return True
+
+    async def update_account_changes(self, last_transaction_id: str):
+        """
+        Update the account with changes to orders, trades, positions and balance since the most recent transaction.
+        :param last_transaction_id: The ID of the most recent transaction
+        :returns: bool
+        :raises: AccountError
+        """
+        await self._update(last_transaction_id, ('changes',), 'changes')
+        return True
+
+    async def update_account(self, last_transaction_id: str):
+        """
+        Update the account's price dependent state and its changes since the most recent transaction.
+        :param last_transaction_id: The ID of the most recent transaction
+        :returns: str, the ID of the most recent transaction after the update
+        :raises: AccountError
+        """
+        return await self._update(last_transaction_id, ('changes', 'state'), 'account')
+
+    async def get_details(self):
+        """
+        Send the request made by `OandaAccount.get_details`
+        :returns: tuple[dict, str], the response content and the ID of the most recent transaction, if any
+        """
+        return await self.session.send(super().get_details())
+
+    async def get_summary(self):
+        """
+        Send the request made by `OandaAccount.get_summary`
+        :returns: tuple[dict, str], the response content and the ID of the most recent transaction, if any
+        """
+        return await self.session.send(super().get_summary())
+
+    async def get_changes(self, last_transaction_id: str):
+        """
+        Send the request made by `OandaAccount.get_changes`
+        :returns: tuple[dict, str], the response content and the ID of the most recent transaction, if any
+        """
+        return await self.session.send(super().get_changes(last_transaction_id))
+
+    async def create_order(self, data: dict, check: bool = True):
+        """
+        Send the request made by `OandaAccount.create_order`
+        :returns: tuple[dict, str], the response content and the ID of the most recent transaction, if any
+        """
+        return await self.session.send(super().create_order(data, check=check))
+
+    async def get_orders(self):
+        """
+        Send the request made by `OandaAccount.get_orders`
+        :returns: tuple[dict, str], the response content and the ID of the most recent transaction, if any
+        """
+        return await self.session.send(super().get_orders())
+
+    async def cancel_order(self, order_id: str):
+        """
+        Send the request made by `OandaAccount.cancel_order`
+        :returns: tuple[dict, str], the response content and the ID of the most recent transaction, if any
+        """
+        return await self.session.send(super().cancel_order(order_id))
+
+    async def get_open_positions(self):
+        """
+        Send the request made by `OandaAccount.get_open_positions`
+        :returns: tuple[dict, str], the response content and the ID of the most recent transaction, if any
+        """
+        return await self.session.send(super().get_open_positions())
+
+    async def close_position(self, instrument: str, long: bool):
+        """
+        Send the request made by `OandaAccount.close_position`
+        :returns: tuple[dict, str], the response content and the ID of the most recent transaction, if any
+        """
+        return await self.session.send(super().close_position(instrument, long))
+
+    async def get_open_trades(self):
+        """
+        Send the request made by `OandaAccount.get_open_trades`
+        :returns: tuple[dict, str], the response content and the ID of the most recent transaction, if any
+        """
+        return await self.session.send(super().get_open_trades())
+
+    async def close_trade(self, trade_specifier: str):
+        """
+        Send the request made by `OandaAccount.close_trade`
+        :returns: tuple[dict, str], the response content and the ID of the most recent transaction, if any
+        """
+        return await self.session.send(super().close_trade(trade_specifier))
+
+    async def get_candles(self, instrument: str, start: str = '', end: str = '', price: str = 'M',
+                          granularity: str = 'M1', count: int = 500):
+        """
+        Send the request made by `OandaAccount.get_candles`
+        :returns: tuple[dict, str], the response content and the ID of the most recent transaction, if any
+        """
+        return await self.session.send(super().get_candles(instrument, start=start, end=end, price=price,
+                                                           granularity=granularity, count=count))
+
+    async def get_transactions(self, start: str = '', end: str = ''):
+        """
+        Send the request made by `OandaAccount.get_transactions`
+        :returns: tuple[dict, str], the response content and the ID of the most recent transaction, if any
+        """
+        return await self.session.send(super().get_transactions(start=start, end=end))
+
+    async def get_transactions_by_id(self, first: str, last: str, types: list = None):
+        """
+        Send the request made by `OandaAccount.get_transactions_by_id`
+        :returns: tuple[dict, str], the response content and the ID of the most recent transaction, if any
+        """
+        return await self.session.send(super().get_transactions_by_id(first, last, types=types))
+
+    async def get_transactions_since(self, transaction_id: str):
+        """
+        Send the request made by `OandaAccount.get_transactions_since`
+        :returns: tuple[dict, str], the response content and the ID of the most recent transaction, if any
+        """
+        return await self.session.send(super().get_transactions_since(transaction_id))
+
+
+async def get_accounts_async(api_key: str, base_url: str, session):
+    """
+    Retrieve a list of accounts if the request is successful
+    :param api_key: The API key for your OANDA account
+    :param base_url: base URL for the OANDA API
+    :param session: the `AsyncOandaSession` the accounts will use
+    :raises: AccountError
+    :returns: list[AsyncOandaAccount]
+    """
+    req = requests.Request(url=f'{base_url}/accounts', headers={'Authorization': f'Bearer {api_key}'},
+                           method='GET')
+    content, _ = await session.send(req.prepare())
+    accounts = content.get('accounts', [])
+    if accounts:
+        return [AsyncOandaAccount(api_key, base_url, session, **account) for account in accounts]
+    else:
+        raise AccountError(f'no accounts found.' + os.linesep + f'Reason {content.get("errorMessage", "")}')
+
+
+async def get_account_async(account_id: str, api_key: str, base_url: str, session):
+    """
+    Return an individual account
+    :param account_id: The id for the account to be retrieved
+    :param api_key: the API for your OANDA account
+    :param base_url: base URL for the OANDA API
+    :param session: the `AsyncOandaSession` the account will use
+    :raises: AccountError
+    :returns: AsyncOandaAccount
+    """
+    req = requests.Request(url=f'{base_url}/accounts/{account_id}', headers={'Authorization': f'Bearer {api_key}'},
+                           method='GET')
+    content, _ = await session.send(req.prepare())
+    account = content.get('account', {})
+    if account != {}:
+        return AsyncOandaAccount(api_key, base_url, session, **account)
+    else:
+        raise AccountError(f'failed to get account with ID: {account_id}.' + os.linesep +
+                           f'Reason {content.get("errorMessage", "")}')
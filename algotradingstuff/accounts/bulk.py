@@ -0,0 +1,157 @@
+from algotradingstuff.sessions import send_all
+
+
+class BulkResult:
+    """
+    This class holds the outcome of one request of a bulk operation
+    """
+
+    def __init__(self, item, content: dict = None, last_transaction_id: str = None, error: Exception = None):
+        """
+
+        :param item: the order, order ID, trade specifier or instrument the request was for
+        :param content: the response content, if there was a response
+        :param last_transaction_id: the ID of the most recent transaction, if the response had one
+        :param error: the exception raised sending the request, if there was one
+        """
+        self.item = item
+        self.content = content if content is not None else {}
+        self.last_transaction_id = last_transaction_id
+        self.error = error
+
+    @property
+    def ok(self):
+        """
+        Whether the request was sent and neither failed nor was rejected
+        :returns: bool
+        """
+        return self.error is None and 'errorMessage' not in self.content and \
+            not any(key.endswith('RejectTransaction') for key in self.content)
+
+    def __repr__(self):
+        return f'BulkResult(item={self.item!r}, ok={self.ok})'
+
+
+class BulkReport:
+    """
+    This class collects the results of a bulk operation
+    """
+
+    def __init__(self, results: list):
+        """
+
+        :param results: the BulkResult of each request, in the order they were given
+        """
+        self.results = results
+
+    @property
+    def succeeded(self):
+        return [result for result in self.results if result.ok]
+
+    @property
+    def failed(self):
+        return [result for result in self.results if not result.ok]
+
+    @property
+    def last_transaction_id(self):
+        """
+        The most recent transaction ID of all the responses
+        :returns: str or None
+        """
+        ids = [int(result.last_transaction_id) for result in self.results if result.last_transaction_id is not None]
+        return str(max(ids)) if ids else None
+
+    def __len__(self):
+        return len(self.results)
+
+    def __iter__(self):
+        return iter(self.results)
+
+
+def _dispatch(account, items: list, requests: list, session, max_in_flight: int, limiter):
+    if session is None:
+        session = account.session
+    results = []
+    for item, result in zip(items, send_all(session, requests, max_workers=max_in_flight, limiter=limiter)):
+        if isinstance(result, Exception):
+            results.append(BulkResult(item, error=result))
+        else:
+            results.append(BulkResult(item, *result))
+    return BulkReport(results)
+
+
+def submit_orders(account, orders: list, session=None, max_in_flight: int = 10, limiter=None):
+    """
+    Create many orders at once
+    :param account: the `OandaAccount` to create the orders for
+    :param orders: a list of dicts, each as passed to `OandaAccount.create_order`
+    :param session: the `OandaSession` to send the requests with. Defaults to the account's session
+    :param max_in_flight: the most requests in flight at once
+    :param limiter: an optional `TokenBucket` limiting the request rate
+    :returns: BulkReport
+    :raises: RiskError, before any order is sent, if the account has a `RiskEngine` and the orders together fail
+    its checks
+    """
+    if account.risk is not None:
+        account.risk.check_orders(orders)
+    return _dispatch(account, orders, [account.create_order(order, check=False) for order in orders], session,
+                     max_in_flight, limiter)
+
+
+def cancel_orders(account, order_ids: list, session=None, max_in_flight: int = 10, limiter=None):
+    """
+    Cancel many orders at once
+    :param account: the `OandaAccount` the orders belong to
+    :param order_ids: the identifiers of the orders to be cancelled
+    :param session: the `OandaSession` to send the requests with. Defaults to the account's session
+    :param max_in_flight: the most requests in flight at once
+    :param limiter: an optional `TokenBucket` limiting the request rate
+    :returns: BulkReport
+    """
+    return _dispatch(account, order_ids, [account.cancel_order(order_id) for order_id in order_ids], session,
+                     max_in_flight, limiter)
+
+
+def close_trades(account, trade_specifiers: list, session=None, max_in_flight: int = 10, limiter=None):
+    """
+    Close many trades at once
+    :param account: the `OandaAccount` the trades belong to
+    :param trade_specifiers: the specifiers of the trades to close
+    :param session: the `OandaSession` to send the requests with. Defaults to the account's session
+    :param max_in_flight: the most requests in flight at once
+    :param limiter: an optional `TokenBucket` limiting the request rate
+    :returns: BulkReport
+    """
+    return _dispatch(account, trade_specifiers, [account.close_trade(trade) for trade in trade_specifiers],
+                     session, max_in_flight, limiter)
+
+
+def close_positions(account, instruments: list, long: bool = True, session=None, max_in_flight: int = 10,
+                    limiter=None):
+    """
+    Close the positions of many instruments at once
+    :param account: the `OandaAccount` the positions belong to
+    :param instruments: the instruments to close positions for. An item may also be an `(instrument, long)` tuple
+    :param long: True to close longPositions, False to close shortPositions, for items without their own
+    :param session: the `OandaSession` to send the requests with. Defaults to the account's session
+    :param max_in_flight: the most requests in flight at once
+    :param limiter: an optional `TokenBucket` limiting the request rate
+    :returns: BulkReport
+    """
+    sides = [item if isinstance(item, tuple) else (item, long) for item in instruments]
+    return _dispatch(account, instruments, [account.close_position(instrument, side) for instrument, side in sides],
+                     session, max_in_flight, limiter)
+
+
+def close_all_trades(account, session=None, max_in_flight: int = 10, limiter=None):
+    """
+    Close every open trade of the account, e.g. to flatten it in an emergency
+    :param account: the `OandaAccount` to flatten
+    :param session: the `OandaSession` to send the requests with. Defaults to the account's session
+    :param max_in_flight: the most requests in flight at once
+    :param limiter: an optional `TokenBucket` limiting the request rate
+    :returns: BulkReport
+    """
+    content, _ = (session if session is not None else account.session).send(account.get_open_trades())
+    return close_trades(account, [trade['id'] for trade in content.get('trades', [])], session=session,
+                        max_in_flight=max_in_flight, limiter=limiter)
@@ -0,0 +1,208 @@
+import os
+import threading
+from algotradingstuff.accounts.errors import AccountError
+from algotradingstuff.accounts.state import AccountState
+from algotradingstuff.sessions import OandaSession, OandaStreamSession, StreamError, send_all
+
+
+class AccountManager:
+    """
+    This class keeps the state of many accounts up to date over one shared session. Accounts are marked
+    dirty when a newer transaction is seen for them, and a refresh only polls the dirty ones, all at once.
+    """
+
+    def __init__(self, accounts: list, session: OandaSession = None, max_workers: int = 8, limiter=None):
+        """
+
+        :param accounts: `OandaAccount` objects, e.g. from `get_accounts`
+        :param session: the session every account's requests are sent with. A new one is made if not given
+        :param max_workers: the most requests in flight at once
+        :param limiter: an optional `TokenBucket` each request takes a token from before it is sent
+        """
+        self.accounts = {account.id: account for account in accounts}
+        self.session = session if session is not None else OandaSession(pool_size=max_workers)
+        self.max_workers = max_workers
+        self.limiter = limiter
+        # accounts from `get_account` have their details already, those from `get_accounts` are loaded on refresh
+        self.states = {account.id: AccountState.from_account(account) for account in accounts
+                       if hasattr(account, 'lastTransactionID')}
+        self._changed = threading.Condition()
+        self._streams = []
+        self._stopped = threading.Event()
+
+    @property
+    def last_transaction_ids(self):
+        """
+        The ID of the most recent transaction applied to each account's state
+        :returns: dict[str, str]
+        """
+        return {account_id: state.last_transaction_id for account_id, state in self.states.items()}
+
+    @property
+    def dirty(self):
+        """
+        The accounts that aren't loaded yet or have transactions their state doesn't reflect
+        :returns: list[str]
+        """
+        return [account_id for account_id in self.accounts
+                if account_id not in self.states or self.states[account_id].pending]
+
+    def see(self, account_id: str, message: dict):
+        """
+        Note a message from an account's transactions stream
+        :param account_id: the ID of the account the stream is for
+        :param message: the decoded message, a transaction or a heartbeat
+        :returns: bool, whether the account is now dirty
+        """
+        state = self.states.get(account_id)
+        if state is None:
+            return True
+        with self._changed:
+            pending = state.see(message)
+            if pending:
+                self._changed.notify_all()
+        return pending
+
+    def wait(self, timeout: float = None):
+        """
+        Block until an account is dirty
+        :param timeout: the most seconds to wait, `None` to wait for ever
+        :returns: bool, whether an account is dirty
+        """
+        with self._changed:
+            return self._changed.wait_for(lambda: self.dirty, timeout)
+
+    def _send(self, account_ids: list, make_request):
+        results = send_all(self.session, [make_request(account_id) for account_id in account_ids],
+                           max_workers=self.max_workers, limiter=self.limiter)
+        errors = {}
+        for account_id, result in zip(account_ids, results):
+            if isinstance(result, Exception):
+                errors[account_id] = result
+            else:
+                yield account_id, result, errors
+        if errors:
+            raise AccountError(f'failed to refresh accounts with IDs: {", ".join(errors)}') \
+                from next(iter(errors.values()))
+
+    def load(self, account_ids: list = None):
+        """
+        Get the full details of accounts, replacing their state
+        :param account_ids: the accounts to load. Defaults to the accounts that aren't loaded yet
+        :returns: list[str], the IDs of the accounts loaded
+        :raises: AccountError, after every other account has been loaded
+        """
+        if account_ids is None:
+            account_ids = [account_id for account_id in self.accounts if account_id not in self.states]
+        loaded = []
+        for account_id, (content, last_transaction_id), errors in self._send(
+                account_ids, lambda account_id: self.accounts[account_id].get_details()):
+            if 'account' not in content:
+                errors[account_id] = AccountError(f'failed to get account with ID: {account_id}.' + os.linesep +
+                                                  f'Reason {content.get("errorMessage", "")}')
+                continue
+            self.states[account_id] = AccountState(content['account'], last_transaction_id)
+            loaded.append(account_id)
+        return loaded
+
+    def refresh(self, account_ids: list = None):
+        """
+        Bring accounts up to date, with one request to the account changes endpoint for each
+        :param account_ids: the accounts to refresh. Defaults to the dirty accounts, so accounts nothing has
+        happened to cost nothing. Pass `list(manager.accounts)` to also update every price dependent state
+        :returns: dict[str, int], how many orders, trades and positions changed in each account refreshed
+        :raises: AccountError, after every other account has been refreshed
+        """
+        if account_ids is None:
+            account_ids = self.dirty
+        failures = []
+        try:
+            self.load([account_id for account_id in account_ids if account_id not in self.states])
+        except AccountError as error:
+            # the accounts that are loaded are still brought up to date
+            failures.append(error)
+        account_ids = [account_id for account_id in account_ids if account_id in self.states]
+        counts = {}
+        try:
+            for account_id, (content, last_transaction_id), errors in self._send(
+                    account_ids,
+                    lambda account_id: self.accounts[account_id].get_changes(self.states[account_id].last_transaction_id)):
+                if 'changes' not in content:
+                    errors[account_id] = AccountError(f'failed to get changes of account with ID: {account_id}.' +
+                                                      os.linesep + f'Reason {content.get("errorMessage", "")}')
+                    continue
+                counts[account_id] = self.states[account_id].apply_changes(content, last_transaction_id)
+        except AccountError as error:
+            failures.append(error)
+        if len(failures) == 1:
+            raise failures[0]
+        if failures:
+            raise AccountError(os.linesep.join(str(failure) for failure in failures)) from failures[0]
+        return counts
+
+    def watch(self, stream_session: OandaStreamSession = None, stream_url: str = '', **kwargs):
+        """
+        Follow every account's transactions stream on a background thread, marking accounts dirty as
+        transactions arrive. Use with `wait` and `refresh`.
+        :param stream_session: the session the streams are opened with. A new one is made if not given
+        :param stream_url: base URL for the OANDA streaming API. If blank, it is worked out from each account
+        :param kwargs: passed on to `OandaStreamSession.messages`
+        """
+        stream_session = stream_session if stream_session is not None else OandaStreamSession()
+        self._stopped.clear()
+
+        def follow(account):
+            try:
+                for message in stream_session.messages(account.get_transactions_stream(stream_url), heartbeats=True,
+                                                       **kwargs):
+                    if self._stopped.is_set():
+                        return
+                    self.see(account.id, message)
+            except StreamError:
+                # the account is refreshed when it is next polled, so a dead stream only costs freshness
+                pass
+
+        for account in self.accounts.values():
+            thread = threading.Thread(target=follow, args=(account,), daemon=True)
+            thread.start()
+            self._streams.append(thread)
+
+    def stop(self):
+        """
+        Stop following the transactions streams. Each stream ends when it next receives a message.
+        """
+        self._stopped.set()
+        self._streams = []
+
+    def exposure(self):
+        """
+        The net units held of each instrument across all accounts
+        :returns: dict[str, float]
+        """
+        exposure = {}
+        for state in self.states.values():
+            for instrument, position in state.positions.items():
+                exposure[instrument] = exposure.get(instrument, 0) + position.units
+        return {instrument: units for instrument, units in exposure.items() if units}
+
+    def _total(self, field: str):
+        return sum(getattr(state.summary, field) or 0 for state in self.states.values())
+
+    @property
+    def nav(self):
+        """
+        The net asset value of all accounts. The sum assumes they share a home currency.
+        """
+        return self._total('nav')
+
+    @property
+    def unrealized_pl(self):
+        return self._total('unrealized_pl')
+
+    @property
+    def margin_used(self):
+        return self._total('margin_used')
+
+    @property
+    def margin_available(self):
+        return self._total('margin_available')
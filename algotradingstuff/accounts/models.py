@@ -0,0 +1,271 @@
+_MISSING = object()
+
+
+class Field:
+    """
+    A model attribute read from the raw response content, converted the first time it is accessed
+    """
+
+    def __init__(self, *path, number: bool = False, convert=None):
+        """
+
+        :param path: the keys leading to the value in the raw content, e.g. ('long', 'units')
+        :param number: whether the value is a decimal string to convert with the model's number type
+        :param convert: a function to convert the value with instead
+        """
+        self.path = path
+        self.number = number
+        self.convert = convert
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        values = instance._values
+        if values is None:
+            values = instance._values = {}
+        value = values.get(self.name, _MISSING)
+        if value is _MISSING:
+            value = instance._raw
+            for key in self.path:
+                value = value.get(key) if isinstance(value, dict) else None
+            if value is not None:
+                if self.number:
+                    value = instance._number(value)
+                elif self.convert is not None:
+                    value = self.convert(value)
+            values[self.name] = value
+        return value
+
+
+class Model:
+    """
+    A view of an object from the API. The raw content is kept as it is and each field is converted from its
+    string the first time it is read, so untouched prices cost nothing.
+    """
+    __slots__ = ('_raw', '_number', '_values')
+    # the names of the fields read from each top level key of the raw content
+    _keys = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        keys = {}
+        for klass in reversed(cls.__mro__):
+            for name, value in vars(klass).items():
+                if isinstance(value, Field):
+                    keys.setdefault(value.path[0], []).append(name)
+        cls._keys = {key: tuple(names) for key, names in keys.items()}
+
+    def __init__(self, raw: dict, number=float):
+        """
+
+        :param raw: the object, as in the response content
+        :param number: the type to convert decimal strings to, e.g. float or decimal.Decimal
+        """
+        self._raw = raw
+        self._number = number
+        self._values = None
+
+    @property
+    def raw(self):
+        return self._raw
+
+    def update(self, raw: dict):
+        """
+        Replace the raw content in place, e.g. with a newer version of the same trade
+        :param raw: the object, as in the response content
+        """
+        self._raw = raw
+        self._values = None
+
+    def merge(self, raw: dict):
+        """
+        Apply a partial update in place, e.g. the dynamic state of a trade. Only the fields it changes are
+        converted again.
+        :param raw: the changed keys and their new values
+        """
+        self._raw.update(raw)
+        values = self._values
+        if values:
+            for key in raw:
+                values.pop(key, None)
+                for name in self._keys.get(key, ()):
+                    values.pop(name, None)
+
+    def __getitem__(self, key):
+        return self._raw[key]
+
+    def get(self, key, default=None):
+        return self._raw.get(key, default)
+
+    def __contains__(self, key):
+        return key in self._raw
+
+    def __eq__(self, other):
+        if isinstance(other, Model):
+            return type(self) is type(other) and self._raw == other._raw
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self._raw!r})'
+
+
+class Order(Model):
+    __slots__ = ()
+    id = Field('id')
+    type = Field('type')
+    state = Field('state')
+    instrument = Field('instrument')
+    units = Field('units', number=True)
+    price = Field('price', number=True)
+    time_in_force = Field('timeInForce')
+    trade_id = Field('tradeID')
+    create_time = Field('createTime')
+
+
+class Trade(Model):
+    __slots__ = ()
+    id = Field('id')
+    state = Field('state')
+    instrument = Field('instrument')
+    price = Field('price', number=True)
+    open_time = Field('openTime')
+    initial_units = Field('initialUnits', number=True)
+    current_units = Field('currentUnits', number=True)
+    realized_pl = Field('realizedPL', number=True)
+    unrealized_pl = Field('unrealizedPL', number=True)
+    margin_used = Field('marginUsed', number=True)
+    financing = Field('financing', number=True)
+
+
+class Position(Model):
+    __slots__ = ()
+    instrument = Field('instrument')
+    pl = Field('pl', number=True)
+    unrealized_pl = Field('unrealizedPL', number=True)
+    margin_used = Field('marginUsed', number=True)
+    financing = Field('financing', number=True)
+    net_unrealized_pl = Field('netUnrealizedPL', number=True)
+    long_units = Field('long', 'units', number=True)
+    long_average_price = Field('long', 'averagePrice', number=True)
+    long_unrealized_pl = Field('long', 'unrealizedPL', number=True)
+    short_units = Field('short', 'units', number=True)
+    short_average_price = Field('short', 'averagePrice', number=True)
+    short_unrealized_pl = Field('short', 'unrealizedPL', number=True)
+
+    @property
+    def units(self):
+        """
+        The net units of the position, long less short
+        """
+        return (self.long_units or 0) + (self.short_units or 0)
+
+
+class AccountSummary(Model):
+    __slots__ = ()
+    id = Field('id')
+    alias = Field('alias')
+    currency = Field('currency')
+    balance = Field('balance', number=True)
+    nav = Field('NAV', number=True)
+    pl = Field('pl', number=True)
+    unrealized_pl = Field('unrealizedPL', number=True)
+    financing = Field('financing', number=True)
+    commission = Field('commission', number=True)
+    margin_rate = Field('marginRate', number=True)
+    margin_used = Field('marginUsed', number=True)
+    margin_available = Field('marginAvailable', number=True)
+    position_value = Field('positionValue', number=True)
+    open_trade_count = Field('openTradeCount', convert=int)
+    open_position_count = Field('openPositionCount', convert=int)
+    pending_order_count = Field('pendingOrderCount', convert=int)
+    last_transaction_id = Field('lastTransactionID')
+
+
+class Transaction(Model):
+    __slots__ = ()
+    id = Field('id')
+    time = Field('time')
+    type = Field('type')
+    batch_id = Field('batchID')
+    instrument = Field('instrument')
+    reason = Field('reason')
+    order_id = Field('orderID')
+    units = Field('units', number=True)
+    price = Field('price', number=True)
+    pl = Field('pl', number=True)
+    financing = Field('financing', number=True)
+    commission = Field('commission', number=True)
+    account_balance = Field('accountBalance', number=True)
+
+
+class Candle(Model):
+    __slots__ = ()
+    time = Field('time')
+    volume = Field('volume', convert=int)
+    complete = Field('complete', convert=bool)
+
+    def prices(self, component: str = None):
+        """
+        The open, high, low and close prices of the candle
+        :param component: 'mid', 'bid' or 'ask'. Defaults to the first of them in the candle
+        :returns: tuple of four numbers
+        """
+        if component is None:
+            component = next((c for c in ('mid', 'bid', 'ask') if c in self._raw), 'mid')
+        values = self._values
+        if values is None:
+            values = self._values = {}
+        prices = values.get(component)
+        if prices is None:
+            ohlc = self._raw[component]
+            prices = values[component] = tuple(self._number(ohlc[key]) for key in ('o', 'h', 'l', 'c'))
+        return prices
+
+    @property
+    def open(self):
+        return self.prices()[0]
+
+    @property
+    def high(self):
+        return self.prices()[1]
+
+    @property
+    def low(self):
+        return self.prices()[2]
+
+    @property
+    def close(self):
+        return self.prices()[3]
+
+
+# The response keys that hold a list of each model
+_LISTS = {'orders': Order, 'trades': Trade, 'positions': Position, 'transactions': Transaction, 'candles': Candle}
+# The response keys that hold one of each model
+_SINGLE = {'order': Order, 'trade': Trade, 'position': Position}
+
+
+def to_models(content: dict, number=float):
+    """
+    Wrap the orders, trades, positions, transactions and candles in response content in their models, in place.
+    Use as the hook of a decoder, e.g. `OandaSession(decoder=JsonDecoder(hook=to_models))`.
+    :param content: the response content
+    :param number: the type to convert decimal strings to, e.g. float or decimal.Decimal
+    :returns: dict, the same content
+    """
+    for key, value in content.items():
+        model = _LISTS.get(key)
+        if model is not None and isinstance(value, list):
+            content[key] = [model(item, number) for item in value]
+            continue
+        model = _SINGLE.get(key)
+        if model is None and key.endswith('Transaction'):
+            model = Transaction
+        if model is not None and isinstance(value, dict):
+            content[key] = model(value, number)
+    return content
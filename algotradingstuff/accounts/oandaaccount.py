@@ -1,7 +1,23 @@
 import requests
 import os
-import datetime as dt
 from algotradingstuff.accounts.errors import AccountError
+from algotradingstuff.sessions import OandaSession
+from algotradingstuff.sessions.metrics import timed_builder
+from algotradingstuff.data.timeutils import to_unix_string
+
+
+def _blank(time):
+    return time is None or (isinstance(time, str) and time == '')
+
+
+def _api_time(time):
+    """
+    Format a point in time for a request parameter, as an exact UNIX time
+    :param time: a datetime, which is taken to be UTC if it has no timezone, a numpy.datetime64, UNIX seconds,
+    or a date string in the format 'yyyy-mm-dd hh:mm:ss', which is read in local time
+    :returns: str
+    """
+    return to_unix_string(time, unit='s')
 
 
 class OandaAccount:
@@ -9,17 +25,66 @@ class OandaAccount:
     This class hold information about an OANDA account
     """
 
-    def __init__(self, api_key, base_url, **kwargs):
+    def __init__(self, api_key, base_url, session=None, risk=None, **kwargs):
         """
 
         :param api_key:
         :param base_url:
+        :param session: the `OandaSession` the account sends its own requests with. A new one is made if not given
+        :param risk: an optional `RiskEngine` every order is checked with before its request is made
         :param account_id:
         :param kwargs:
         """
         self.api_key = api_key
         self.base_url = base_url
-        self.__dict__.update(kwargs)
+        self.session = session if session is not None else OandaSession()
+        self.risk = risk
+        # the names of the attributes that came from the API, kept apart from the ones above
+        self._fields = set()
+        self._merge(kwargs)
+        # the parts every request shares are worked out once
+        self._url = f'{base_url}/accounts/{kwargs.get("id")}'
+        self._headers = {'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'}
+        self._unix_headers = {'Authorization': f'Bearer {api_key}', 'Accept-Datetime-Format': 'UNIX'}
+        self._templates = {}
+
+    def _merge(self, details: dict):
+        self.__dict__.update(**details)
+        self._fields.update(details)
+
+    @property
+    def details(self):
+        """
+        The account's details as returned by the API, with any state and changes merged in since
+        :returns: dict
+        """
+        return {key: self.__dict__[key] for key in self._fields}
+
+    def _template(self, method: str, path: str, *args):
+        """
+        Get a copy of a request with no body or parameters, preparing it only the first time. One template is
+        kept per route, so requests for an order, trade or instrument don't each add one.
+        :param method: the HTTP method
+        :param path: the path after the account's URL, with a `{}` for each of `args`
+        :param args: the values of the path's `{}` fields, e.g. an order ID
+        :returns: requests.PreparedRequest
+        """
+        template = self._templates.get((method, path))
+        if template is None:
+            template = requests.Request(url=f'{self._url}{path}', headers=self._headers, method=method).prepare()
+            self._templates[(method, path)] = template
+        req = template.copy()
+        if args:
+            req.prepare_url(f'{self._url}{path.format(*args)}', None)
+        return req
+
+    def _fetch_changes(self, last_transaction_id: str):
+        response = self.session.fetch(self.get_changes(last_transaction_id))
+        code = response.status_code
+        reason = response.reason
+        content = response.json()
+        response.close()
+        return content, reason, code
 
     def update_account_state(self, last_transaction_id: str):
         """
@@ -29,16 +94,10 @@ class OandaAccount:
         :returns: bool
         :raises: AccountError
         """
-        response = requests.get(f'{self.base_url}/accounts/{self.id}/changes',
-                                headers={'Authorization': f'Bearer {self.api_key}',
-                                         'Content-Type': 'application/json'},
-                                params={'sinceTransactionID': last_transaction_id})
-        code = response.status_code
-        reason = response.reason
-        state = response.json().get('state', {})
-        response.close()
+        content, reason, code = self._fetch_changes(last_transaction_id)
+        state = content.get('state', {})
         if state != {}:
-            self.__dict__.update(**state)
+            self._merge(state)
             return True
         else:
             raise AccountError(f'failed to update state of account with ID: {self.id}.' + os.linesep +
@@ -52,68 +111,104 @@ class OandaAccount:
         :returns: bool
         :raises: AccountError
         """
-        response = requests.get(f'{self.base_url}/accounts/{self.id}/changes',
-                                headers={'Authorization': f'Bearer {self.api_key}',
-                                         'Content-Type': 'application/json'},
-                                params={'sinceTransactionID': last_transaction_id})
-        code = response.status_code
-        reason = response.reason
-        changes = response.json().get('changes', {})
-        response.close()
+        content, reason, code = self._fetch_changes(last_transaction_id)
+        changes = content.get('changes', {})
         if changes != {}:
-            self.__dict__.update(**changes)
+            self._merge(changes)
             return True
         else:
             raise AccountError(f'failed to update changes of account with ID: {self.id}.' + os.linesep +
                                f'Reason {reason}' + os.linesep + f'Code {code}')
 
-    def create_order(self, data: dict):
+    def update_account(self, last_transaction_id: str):
+        """
+        Update the account's price dependent state and its changes since the most recent transaction
+        with a single request.
+        :param last_transaction_id: The ID of the most recent transaction
+        :returns: str, the ID of the most recent transaction after the update
+        :raises: AccountError
+        """
+        content, reason, code = self._fetch_changes(last_transaction_id)
+        state = content.get('state', {})
+        changes = content.get('changes', {})
+        if state != {} and changes != {}:
+            self._merge(changes)
+            self._merge(state)
+            return content.get('lastTransactionID', last_transaction_id)
+        else:
+            raise AccountError(f'failed to update account with ID: {self.id}.' + os.linesep +
+                               f'Reason {reason}' + os.linesep + f'Code {code}')
+
+    @timed_builder
+    def get_details(self):
+        """
+        This method creates a request to get the full details of the account, with its orders, trades and positions
+        :returns: requests.PreparedRequest
+        """
+        return self._template('GET', '')
+
+    @timed_builder
+    def get_summary(self):
+        """
+        This method creates a request to get the summary of the account, without its orders, trades and positions
+        :returns: requests.PreparedRequest
+        """
+        return self._template('GET', '/summary')
+
+    @timed_builder
+    def get_changes(self, last_transaction_id: str):
+        """
+        This method creates a request to get the account's changes and price dependent state since the
+        most recent transaction
+        :param last_transaction_id: The ID of the most recent transaction
+        :returns: requests.PreparedRequest
+        """
+        req = self._template('GET', '/changes')
+        req.prepare_url(req.url, {'sinceTransactionID': last_transaction_id})
+        return req
+
+    @timed_builder
+    def create_order(self, data: dict, check: bool = True):
         """
         This method creates a request for an order of the specified type and amount of units
         :param data: a dict with the parameters of the order to be created
+        :param check: if False the order isn't checked by the account's `RiskEngine`, e.g. when it was checked
+        as part of a batch already
         :returns: requests.PreparedRequest
+        :raises: RiskError, if the account has a `RiskEngine` and the order fails its checks
         """
-        req = requests.Request(url=f'{self.base_url}/accounts/{self.id}/orders',
-                               headers={'Authorization': f'Bearer {self.api_key}',
-                                        'Content-Type': 'application/json'},
-                               method='POST',
-                               json=data)
-        return req.prepare()
+        if check and self.risk is not None:
+            self.risk.check_order(data)
+        req = self._template('POST', '/orders')
+        req.prepare_body(None, None, json=data)
+        return req
 
+    @timed_builder
     def get_orders(self):
         """
         This method creates a request to get all orders for the account
         :returns: requests.PreparedRequest
         """
-        req = requests.Request(url=f'{self.base_url}/accounts/{self.id}/orders',
-                               headers={'Authorization': f'Bearer {self.api_key}',
-                                        'Content-Type': 'application/json'},
-                               method='GET')
-        return req.prepare()
+        return self._template('GET', '/orders')
 
+    @timed_builder
     def cancel_order(self, order_id: str):
         """
         This method makes a request to cancel the specified order
         :param order_id: the identifier of the order to be cancelled
         :returns: requests.PreparedRequest
         """
-        req = requests.Request(url=f'{self.base_url}/accounts/{self.id}/orders/{order_id}/cancel',
-                               headers={'Authorization': f'Bearer {self.api_key}',
-                                        'Content-Type': 'application/json'},
-                               method='PUT')
-        return req.prepare()
+        return self._template('PUT', '/orders/{}/cancel', order_id)
 
+    @timed_builder
     def get_open_positions(self):
         """
         This method makes a request to get all the open positions for the account
         :returns: requests.PreparedRequest
         """
-        req = requests.Request(url=f'{self.base_url}/accounts/{self.id}/openPositions',
-                               headers={'Authorization': f'Bearer {self.api_key}',
-                                        'Content-Type': 'application/json'},
-                               method='GET')
-        return req.prepare()
+        return self._template('GET', '/openPositions')
 
+    @timed_builder
     def close_position(self, instrument: str, long: bool):
         """
         This method makes a request to close the position for the provided instrument
@@ -125,158 +220,182 @@ class OandaAccount:
             data = {'longUnits': 'ALL'}
         else:
             data = {'shortUnits': 'ALL'}
-        req = requests.Request(url=f'{self.base_url}/accounts/{self.id}/positions/{instrument}/close',
-                               headers={'Authorization': f'Bearer {self.api_key}',
-                                        'Content-Type': 'application/json'},
-                               method='PUT',
-                               json=data)
-        return req.prepare()
+        req = self._template('PUT', '/positions/{}/close', instrument)
+        req.prepare_body(None, None, json=data)
+        return req
 
+    @timed_builder
     def get_open_trades(self):
         """
         This method makes a request to get all the open trades for the account
         :returns: requests.PreparedRequest
         """
-        req = requests.Request(url=f'{self.base_url}/accounts/{self.id}/openTrades',
-                               headers={'Authorization': f'Bearer {self.api_key}',
-                                        'Content-Type': 'application/json'},
-                               method='GET')
-        return req.prepare()
+        return self._template('GET', '/openTrades')
 
+    @timed_builder
     def close_trade(self, trade_specifier: str):
         """
         This method closes a trade with the provided trade specifier
         :param trade_specifier:
         :returns: requests.PreparedRequest
         """
-        req = requests.Request(url=f'{self.base_url}/accounts/{self.id}/trades/{trade_specifier}/close',
-                               headers={'Authorization': f'Bearer {self.api_key}',
-                                        'Content-Type': 'application/json'},
-                               method='PUT')
-        return req.prepare()
+        return self._template('PUT', '/trades/{}/close', trade_specifier)
 
-    def get_candles(self, instrument: str, start: str = '', end: str = '', price: str = 'M',
+    @timed_builder
+    def get_candles(self, instrument: str, start='', end='', price: str = 'M',
                     granularity: str = 'M1', count: int = 500):
         """
         Get the candle data for a given instrument
         :param instrument: the instrument you want the candles for
-        :param start: a date string, in the format 'yyyy-mm-dd hh:mm:ss', for the start point of your data range
-        :param end: a date string, in the format 'yyyy-mm-dd hh:mm:ss', for the end point of your data range
+        :param start: the start point of your data range. See `_api_time` for the accepted values
+        :param end: the end point of your data range. See `_api_time` for the accepted values
         :param price: the price point of the candles. 'M' midpoint candles, 'B' bid candles, 'A' ask candles
         :param granularity: interval of the candles, see http://developer.oanda.com/rest-live-v20/instrument-df/#CandlestickGranularity
-        :param count: how many rows of data to return
+        :param count: how many rows of data to return, if `start` or `end` is blank
         :return:
         """
-        if start != '' and end != '':
-            start = dt.datetime.strptime(start, '%Y-%m-%d %H:%M:%S').timestamp()
-            end = dt.datetime.strptime(end, '%Y-%m-%d %H:%M:%S').timestamp()
-            req = requests.Request(url=f'{self.base_url}/accounts/{self.id}/instruments/{instrument}/candles',
-                                   headers={'Authorization': f'Bearer {self.api_key}',
-                                            'Accept-Datetime-Format': 'UNIX'},
-                                   params={'granularity': granularity, 'price': price,
-                                           'from': start, 'to': end},
-                                   method='GET')
-        elif start == '' and end != '':
-            end = dt.datetime.strptime(end, '%Y-%m-%d %H:%M:%S').timestamp()
-            req = requests.Request(url=f'{self.base_url}/accounts/{self.id}/instruments/{instrument}/candles',
-                                   headers={'Authorization': f'Bearer {self.api_key}',
-                                            'Accept-Datetime-Format': 'UNIX'},
-                                   params={'granularity': granularity, 'price': price,
-                                           'to': end, 'count': count},
-                                   method='GET')
-        elif end == '' and start != '':
-            start = dt.datetime.strptime(start, '%Y-%m-%d %H:%M:%S').timestamp()
-            req = requests.Request(url=f'{self.base_url}/accounts/{self.id}/instruments/{instrument}/candles',
-                                   headers={'Authorization': f'Bearer {self.api_key}',
-                                            'Accept-Datetime-Format': 'UNIX'},
-                                   params={'granularity': granularity, 'price': price,
-                                           'from': start, 'count': count},
-                                   method='GET')
-        else:
-            req = requests.Request(url=f'{self.base_url}/accounts/{self.id}/instruments/{instrument}/candles',
-                                   headers={'Authorization': f'Bearer {self.api_key}',
-                                            'Accept-Datetime-Format': 'UNIX'},
-                                   params={'granularity': granularity, 'price': price,
-                                           'count': count},
-                                   method='GET')
+        params = {'granularity': granularity, 'price': price}
+        if not _blank(start):
+            params['from'] = _api_time(start)
+        if not _blank(end):
+            params['to'] = _api_time(end)
+        if _blank(start) or _blank(end):
+            params['count'] = count
+        req = requests.Request(url=f'{self._url}/instruments/{instrument}/candles',
+                               headers=self._unix_headers,
+                               params=params,
+                               method='GET')
         return req.prepare()
 
-    def get_transactions(self, start: str = '', end: str = ''):
+    @timed_builder
+    def get_transactions(self, start='', end=''):
         """
         Make a request to get the transactions for the account. If `start` and `end` are blank,
         it will request all transactions since the account creation to the most recent transaction.
-        :param start: a date string, in the format 'yyyy-mm-dd hh:mm:ss', for the start point of your search
-        :param end: a date string, in the format 'yyyy-mm-dd hh:mm:ss', for the end point of your search
+        :param start: the start point of your search. See `_api_time` for the accepted values
+        :param end: the end point of your search. See `_api_time` for the accepted values
         :returns: requests.PreparedRequest
         """
-        if start != '' and end != '':
-            start = dt.datetime.strptime(start, '%Y-%m-%d %H:%M:%S').timestamp()
-            end = dt.datetime.strptime(end, '%Y-%m-%d %H:%M:%S').timestamp()
-            req = requests.Request(url=f'{self.base_url}/accounts/{self.id}/transactions',
-                                   headers={'Authorization': f'Bearer {self.api_key}',
-                                            'Accept-Datetime-Format': 'UNIX'},
-                                   params={'from': start, 'to': end},
-                                   method='GET')
-        elif start == '' and end != '':
-            end = dt.datetime.strptime(end, '%Y-%m-%d %H:%M:%S').timestamp()
-            req = requests.Request(url=f'{self.base_url}/accounts/{self.id}/transactions',
-                                   headers={'Authorization': f'Bearer {self.api_key}',
-                                            'Accept-Datetime-Format': 'UNIX'},
-                                   params={'to': end},
-                                   method='GET')
-        elif end == '' and start != '':
-            start = dt.datetime.strptime(start, '%Y-%m-%d %H:%M:%S').timestamp()
-            req = requests.Request(url=f'{self.base_url}/accounts/{self.id}/transactions',
-                                   headers={'Authorization': f'Bearer {self.api_key}',
-                                            'Accept-Datetime-Format': 'UNIX'},
-                                   params={'from': start},
-                                   method='GET')
-        else:
-            req = requests.Request(url=f'{self.base_url}/accounts/{self.id}/transactions',
-                                   headers={'Authorization': f'Bearer {self.api_key}',
-                                            'Accept-Datetime-Format': 'UNIX'},
-                                   method='GET')
+        params = {}
+        if not _blank(start):
+            params['from'] = _api_time(start)
+        if not _blank(end):
+            params['to'] = _api_time(end)
+        req = requests.Request(url=f'{self._url}/transactions',
+                               headers=self._unix_headers,
+                               params=params,
+                               method='GET')
+        return req.prepare()
+
+    @timed_builder
+    def get_transactions_by_id(self, first: str, last: str, types: list = None):
+        """
+        Make a request to get the transactions with IDs from `first` to `last`, both included. The API
+        returns at most 1000 transactions per request.
+        :param first: the ID of the first transaction
+        :param last: the ID of the last transaction
+        :param types: only get transactions of these types, e.g. ['ORDER_FILL']. All types if not given
+        :returns: requests.PreparedRequest
+        """
+        params = {'from': first, 'to': last}
+        if types:
+            params['type'] = ','.join(types)
+        req = requests.Request(url=f'{self._url}/transactions/idrange',
+                               headers=self._unix_headers,
+                               params=params,
+                               method='GET')
+        return req.prepare()
+
+    @timed_builder
+    def get_transactions_since(self, transaction_id: str):
+        """
+        Make a request to get the transactions after the given one
+        :param transaction_id: the ID of the last transaction you already have
+        :returns: requests.PreparedRequest
+        """
+        req = requests.Request(url=f'{self._url}/transactions/sinceid',
+                               headers=self._unix_headers,
+                               params={'id': transaction_id},
+                               method='GET')
+        return req.prepare()
+
+    def get_pricing_stream(self, instruments: list, stream_url: str = '', snapshot: bool = True):
+        """
+        Make a request to stream the prices of the given instruments. Send it with `OandaStreamSession.messages`.
+        :param instruments: the instruments you want the prices for
+        :param stream_url: base URL for the OANDA streaming API. If blank, it is worked out from `base_url`
+        :param snapshot: if True, the current prices are sent as soon as the stream opens
+        :returns: requests.PreparedRequest
+        """
+        if stream_url == '':
+            stream_url = self.base_url.replace('://api-', '://stream-', 1)
+        req = requests.Request(url=f'{stream_url}/accounts/{self.id}/pricing/stream',
+                               headers=self._unix_headers,
+                               params={'instruments': ','.join(instruments),
+                                       'snapshot': 'true' if snapshot else 'false'},
+                               method='GET')
+        return req.prepare()
+
+    def get_transactions_stream(self, stream_url: str = ''):
+        """
+        Make a request to stream the account's transactions. Send it with `OandaStreamSession.messages`.
+        :param stream_url: base URL for the OANDA streaming API. If blank, it is worked out from `base_url`
+        :returns: requests.PreparedRequest
+        """
+        if stream_url == '':
+            stream_url = self.base_url.replace('://api-', '://stream-', 1)
+        req = requests.Request(url=f'{stream_url}/accounts/{self.id}/transactions/stream',
+                               headers=self._unix_headers,
+                               method='GET')
         return req.prepare()
 
 
-def get_accounts(api_key: str, base_url: str):
+def get_accounts(api_key: str, base_url: str, session: OandaSession = None):
     """
     Retrieve a list of account dicts if the request is successful
     :param base_url: base URL for the OANDA API
     :param api_key: The API key for your OANDA account
+    :param session: the session used for this request and shared by the accounts. A new one is made if not given
     :raises: AccountError
     :returns: list[OandaAccount]
     """
-    response = requests.get(f'{base_url}/accounts',
-                            headers={'Authorization': f'Bearer {api_key}'})
+    if session is None:
+        session = OandaSession()
+    response = session.fetch(requests.Request(url=f'{base_url}/accounts',
+                                              headers={'Authorization': f'Bearer {api_key}'},
+                                              method='GET').prepare())
     code = response.status_code
     reason = response.reason
     accounts = response.json().get('accounts', [])
     response.close()
     if accounts:
-        return [OandaAccount(api_key, base_url, **account) for account in accounts]
+        return [OandaAccount(api_key, base_url, session=session, **account) for account in accounts]
     else:
         raise AccountError(f'no accounts found.' + os.linesep + f'Reason {reason}' + os.linesep +
                            f'Code {code}')
 
 
-def get_account(account_id: str, api_key: str, base_url: str):
+def get_account(account_id: str, api_key: str, base_url: str, session: OandaSession = None):
     """
     Return the parameters for an individual primary_account
     :param account_id: The id for the primary_account to be retrieved
     :param api_key: the API for your OANDA primary_account
     :param base_url: base URL for the OANDA API
+    :param session: the session used for this request and by the account. A new one is made if not given
     :raises: AccountError
     :returns: OandaAccount
     """
-    response = requests.get(f'{base_url}/accounts/{account_id}',
-                            headers={'Authorization': f'Bearer {api_key}'})
+    if session is None:
+        session = OandaSession()
+    response = session.fetch(requests.Request(url=f'{base_url}/accounts/{account_id}',
+                                              headers={'Authorization': f'Bearer {api_key}'},
+                                              method='GET').prepare())
     code = response.status_code
     reason = response.reason
     account = response.json().get('account', {})
     response.close()
     if account != {}:
-        return OandaAccount(api_key, base_url, **account)
+        return OandaAccount(api_key, base_url, session=session, **account)
     else:
         raise AccountError(f'failed to get account with ID: {account_id}.' + os.linesep +
                            f'Reason {reason}' + os.linesep + f'Code {code}')
@@ -0,0 +1,191 @@
+import os
+from algotradingstuff.accounts.errors import AccountError
+from algotradingstuff.accounts.models import AccountSummary, Model, Order, Position, Trade
+
+# The fields of an account that aren't summary values
+_COLLECTIONS = ('orders', 'trades', 'positions')
+# Where the keys of a calculated position state go in a position, by key
+_POSITION_STATE = {'netUnrealizedPL': (None, 'unrealizedPL'), 'longUnrealizedPL': ('long', 'unrealizedPL'),
+                   'shortUnrealizedPL': ('short', 'unrealizedPL')}
+
+
+def _raw(item):
+    return item.raw if isinstance(item, Model) else item
+
+
+class AccountState:
+    """
+    This class keeps an account's orders, trades and positions as typed records indexed by ID and instrument,
+    and applies the deltas from the account changes endpoint to them in place
+    """
+    __slots__ = ('id', 'orders', 'trades', 'positions', 'summary', '_number', '_last_transaction_id',
+                 '_seen_transaction_id')
+
+    def __init__(self, account: dict, last_transaction_id: str, number=float):
+        """
+
+        :param account: the account details, as returned by the account endpoint
+        :param last_transaction_id: the ID of the most recent transaction reflected in `account`
+        :param number: the type numeric fields are converted to, e.g. float or decimal.Decimal
+        """
+        self.id = account.get('id')
+        self._number = number
+        self.orders = {}
+        self.trades = {}
+        self.positions = {}
+        for order in account.get('orders', []):
+            self._put(self.orders, 'id', Order, order)
+        for trade in account.get('trades', []):
+            self._put(self.trades, 'id', Trade, trade)
+        for position in account.get('positions', []):
+            self._put(self.positions, 'instrument', Position, position)
+        self.summary = AccountSummary({key: value for key, value in account.items() if key not in _COLLECTIONS},
+                                      number)
+        self._last_transaction_id = int(last_transaction_id)
+        self._seen_transaction_id = self._last_transaction_id
+
+    def _put(self, records: dict, key: str, model, item):
+        # replace the record in place, so references to it held elsewhere stay current
+        item = _raw(item)
+        record = records.get(item[key])
+        if record is None:
+            records[item[key]] = model(item, self._number)
+        else:
+            record.update(item)
+
+    @staticmethod
+    def _merge(records: dict, key: str, item):
+        item = _raw(item)
+        record = records.get(item[key])
+        if record is not None:
+            record.merge(item)
+
+    @staticmethod
+    def _merge_position(records: dict, item):
+        # the state endpoint names the unrealized P/L of a position differently to the position itself
+        item = _raw(item)
+        record = records.get(item['instrument'])
+        if record is None:
+            return
+        update = dict(item)
+        for key, (side, name) in _POSITION_STATE.items():
+            if key not in item:
+                continue
+            if side is None:
+                update[name] = item[key]
+            else:
+                update[side] = {**update.get(side, record.raw.get(side, {})), name: item[key]}
+        record.merge(update)
+
+    @classmethod
+    def from_account(cls, account, last_transaction_id: str = None, number=float):
+        """
+        Make the state of an `OandaAccount` made by `get_account`
+        :param account: the OandaAccount
+        :param last_transaction_id: the ID of the most recent transaction. Defaults to the account's own
+        :param number: the type numeric fields are converted to, e.g. float or decimal.Decimal
+        :returns: AccountState
+        """
+        details = account.details
+        if last_transaction_id is None:
+            last_transaction_id = details['lastTransactionID']
+        return cls(details, last_transaction_id, number)
+
+    @property
+    def last_transaction_id(self):
+        """
+        The ID of the most recent transaction applied to the state
+        :returns: str
+        """
+        return str(self._last_transaction_id)
+
+    @property
+    def pending(self):
+        """
+        Whether a newer transaction has been seen on the transactions stream than has been applied
+        :returns: bool
+        """
+        return self._seen_transaction_id > self._last_transaction_id
+
+    def apply_changes(self, content: dict, last_transaction_id: str):
+        """
+        Apply a response from the account changes endpoint
+        :param content: the response content, with `changes` and `state`
+        :param last_transaction_id: the ID of the most recent transaction the response covers
+        :returns: int, how many orders, trades and positions changed
+        """
+        changes = content.get('changes', {})
+        state = content.get('state', {})
+        count = 0
+        for order in changes.get('ordersCreated', []):
+            self._put(self.orders, 'id', Order, order)
+            count += 1
+        for key in ('ordersCancelled', 'ordersFilled', 'ordersTriggered'):
+            for order in changes.get(key, []):
+                self.orders.pop(order['id'], None)
+                count += 1
+        for key in ('tradesOpened', 'tradesReduced'):
+            for trade in changes.get(key, []):
+                self._put(self.trades, 'id', Trade, trade)
+                count += 1
+        for trade in changes.get('tradesClosed', []):
+            self.trades.pop(trade['id'], None)
+            count += 1
+        for position in changes.get('positions', []):
+            self._put(self.positions, 'instrument', Position, position)
+            count += 1
+
+        for order in state.get('orders', []):
+            self._merge(self.orders, 'id', order)
+        for trade in state.get('trades', []):
+            self._merge(self.trades, 'id', trade)
+        for position in state.get('positions', []):
+            self._merge_position(self.positions, position)
+        self.summary.merge({key: value for key, value in state.items() if key not in _COLLECTIONS})
+
+        if last_transaction_id is not None and int(last_transaction_id) > self._last_transaction_id:
+            self._last_transaction_id = int(last_transaction_id)
+            self.summary.merge({'lastTransactionID': last_transaction_id})
+        return count
+
+    def poll(self, session, account):
+        """
+        Bring the state up to date with one request to the account changes endpoint
+        :param session: the `OandaSession` used to send the request
+        :param account: the `OandaAccount` used to build the request
+        :returns: int, how many orders, trades and positions changed
+        :raises: AccountError
+        """
+        content, last_transaction_id = session.send(account.get_changes(self.last_transaction_id))
+        if 'changes' not in content:
+            raise AccountError(f'failed to get changes of account with ID: {self.id}.' + os.linesep +
+                               f'Reason {content.get("errorMessage", "")}')
+        return self.apply_changes(content, last_transaction_id)
+
+    def see(self, message: dict):
+        """
+        Note a message from the transactions stream. Both transactions and heartbeats carry the latest
+        transaction ID, so transactions missed while the stream was down are noticed too.
+        :param message: the decoded message
+        :returns: bool, whether the state is now behind the account
+        """
+        transaction_id = message.get('id') if message.get('type') != 'HEARTBEAT' else message.get('lastTransactionID')
+        if transaction_id is not None:
+            self._seen_transaction_id = max(self._seen_transaction_id, int(transaction_id))
+        return self.pending
+
+    def follow(self, messages, session, account):
+        """
+        Keep the state up to date from the transactions stream, polling the changes endpoint once for
+        each burst of new transactions
+        :param messages: an iterable of decoded messages, e.g. from `OandaStreamSession.messages` with heartbeats
+        :param session: the `OandaSession` used to poll for changes
+        :param account: the `OandaAccount` used to build the requests
+        :returns: generator of dict, each transaction after it has been applied
+        :raises: AccountError
+        """
+        for message in messages:
+            if self.see(message):
+                self.poll(session, account)
+            if message.get('type') != 'HEARTBEAT':
+                yield message
@@ -0,0 +1,10 @@
+from .simulator import SimulatedAccount
+from .engine import Backtester
+from .engine import BacktestResult
+from .engine import Bar
+from .vectorized import backtest_positions
+from .vectorized import VectorizedResult
+from .metrics import summarize
+from .sweep import sweep
+from .sweep import parameter_grid
+from .sweep import walk_forward
@@ -0,0 +1,101 @@
+import numpy as np
+from algotradingstuff.backtest.metrics import summarize
+from algotradingstuff.backtest.simulator import SimulatedAccount
+
+
+class Bar:
+    """
+    This class tells a strategy which candle has just closed
+    """
+
+    __slots__ = ('instrument', 'index', 'time', 'bid', 'ask')
+
+    def __init__(self, instrument: str, index: int, time: int, bid, ask):
+        """
+
+        :param instrument: the instrument of the candle
+        :param index: the position of the candle in the instrument's frames
+        :param time: the time of the candle, in nanoseconds since the epoch
+        :param bid: the instrument's bid `CandleFrame`
+        :param ask: the instrument's ask `CandleFrame`
+        """
+        self.instrument = instrument
+        self.index = index
+        self.time = time
+        self.bid = bid
+        self.ask = ask
+
+
+class BacktestResult:
+    """
+    This class holds the outcome of a `Backtester` run
+    """
+
+    def __init__(self, account: SimulatedAccount, time, equity):
+        """
+
+        :param account: the simulated account at the end of the run
+        :param time: the time of each candle, in nanoseconds since the epoch
+        :param equity: the account's NAV after each candle
+        """
+        self.account = account
+        self.time = time
+        self.equity = equity
+
+    def summary(self):
+        """
+        Work out the performance of the backtest
+        :returns: dict
+        """
+        fills = sum(1 for transaction in self.account.transactions if transaction['type'] == 'ORDER_FILL')
+        return {**summarize(self.equity), 'trades': fills}
+
+
+class Backtester:
+    """
+    This class replays bid and ask candles of one or more instruments through a strategy, in time order.
+    The strategy is called as `strategy(account, bar)` after each candle closes, with a `SimulatedAccount`
+    that takes the same orders as `OandaAccount`. Pending orders are filled against the following candles.
+    """
+
+    def __init__(self, bid: dict, ask: dict, strategy, account: SimulatedAccount = None):
+        """
+
+        :param bid: the bid `CandleFrame` of each instrument
+        :param ask: the ask `CandleFrame` of each instrument, with the same times as its bid frame
+        :param strategy: a callable taking the account and a `Bar`
+        :param account: the account to trade. A new `SimulatedAccount` is made if not given
+        """
+        if set(bid) != set(ask):
+            raise ValueError('bid and ask must have the same instruments')
+        for instrument in bid:
+            if not np.array_equal(bid[instrument].time, ask[instrument].time):
+                raise ValueError(f'bid and ask candles of {instrument} have different times')
+        self.bid = bid
+        self.ask = ask
+        self.strategy = strategy
+        self.account = account if account is not None else SimulatedAccount()
+
+    def run(self):
+        """
+        Replay every candle
+        :returns: BacktestResult
+        """
+        instruments = list(self.bid)
+        times = np.concatenate([self.bid[instrument].time for instrument in instruments])
+        owners = np.concatenate([np.full(len(self.bid[instrument]), n) for n, instrument in enumerate(instruments)])
+        indexes = np.concatenate([np.arange(len(self.bid[instrument])) for instrument in instruments])
+        order = np.argsort(times, kind='stable')
+        prices = [(list(zip(*(getattr(self.bid[i], c).tolist() for c in ('open', 'high', 'low', 'close')))),
+                   list(zip(*(getattr(self.ask[i], c).tolist() for c in ('open', 'high', 'low', 'close')))))
+                  for i in instruments]
+        equity = np.empty(len(order))
+        account = self.account
+        for n, (time, owner, index) in enumerate(zip(times[order].tolist(), owners[order].tolist(),
+                                                    indexes[order].tolist())):
+            instrument = instruments[owner]
+            bid, ask = prices[owner]
+            account.on_bar(instrument, time, bid[index], ask[index])
+            self.strategy(account, Bar(instrument, index, time, self.bid[instrument], self.ask[instrument]))
+            equity[n] = account.nav
+        return BacktestResult(account, times[order], equity)
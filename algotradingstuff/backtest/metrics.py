@@ -0,0 +1,18 @@
+import numpy as np
+
+
+def summarize(equity):
+    """
+    Work out the performance of an equity curve
+    :param equity: the account value after each bar, with time along the last axis
+    :returns: dict, the `pl`, `max_drawdown` and per bar `sharpe` ratio, as floats or arrays for a 2-D input
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    change = np.diff(equity, axis=-1)
+    drawdown = np.maximum.accumulate(equity, axis=-1) - equity
+    mean = change.mean(axis=-1) if change.shape[-1] else np.zeros(equity.shape[:-1])
+    std = change.std(axis=-1) if change.shape[-1] else np.zeros(equity.shape[:-1])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(std > 0.0, mean / std * np.sqrt(change.shape[-1]), 0.0)
+    result = {'pl': equity[..., -1] - equity[..., 0], 'max_drawdown': drawdown.max(axis=-1), 'sharpe': sharpe}
+    return {key: value.item() if np.ndim(value) == 0 else value for key, value in result.items()}
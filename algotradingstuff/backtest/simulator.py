@@ -0,0 +1,316 @@
+from algotradingstuff.data.timeutils import parse_time, to_unix_string
+
+_DAY = 86_400_000_000_000
+
+
+class SimulatedAccount:
+    """
+    This class simulates an OANDA account for backtesting. It accepts the same order payloads as
+    `OandaAccount.create_order` and answers like the API does, as `(content, last_transaction_id)`
+    tuples in the shape `OandaSession.send` returns. Profit and loss is in the quote currency.
+    """
+
+    def __init__(self, balance: float = 100000.0, margin_rate: float = 0.02, hedging: bool = False):
+        """
+
+        :param balance: the starting balance
+        :param margin_rate: the fraction of a position's value needed as margin
+        :param hedging: if True, the default position fill opens a new trade instead of reducing opposite ones
+        """
+        self.balance = balance
+        self.margin_rate = margin_rate
+        self.hedging = hedging
+        self.time = 0
+        self.orders = {}
+        self.trades = {}
+        self.transactions = []
+        self._prices = {}
+        self._last_id = 0
+
+    @property
+    def last_transaction_id(self):
+        return str(self._last_id)
+
+    def add_transaction(self, kind: str, **fields):
+        """
+        Record a transaction at the account's current time, with the next ID
+        :param kind: the type of the transaction, e.g. 'ORDER_FILL'
+        :param fields: the rest of the transaction's fields
+        :returns: dict, the transaction
+        """
+        self._last_id += 1
+        transaction = {'id': str(self._last_id), 'time': to_unix_string(self.time), 'type': kind, **fields}
+        self.transactions.append(transaction)
+        return transaction
+
+    def _reply(self, **content):
+        return content, self.last_transaction_id
+
+    def _reply_filled(self, created: dict, transaction: dict):
+        key = 'orderFillTransaction' if transaction['type'] == 'ORDER_FILL' else 'orderCancelTransaction'
+        return self._reply(orderCreateTransaction=created, **{key: transaction})
+
+    def set_price(self, instrument: str, bid: float, ask: float):
+        """
+        Set the current price of an instrument
+        :param instrument: the instrument
+        :param bid: the bid price
+        :param ask: the ask price
+        """
+        self._prices[instrument] = (bid, ask)
+
+    def unrealized_pl(self, trade: dict):
+        bid, ask = self._prices[trade['instrument']]
+        units = trade['currentUnits']
+        return units * ((bid if units > 0 else ask) - trade['price'])
+
+    @property
+    def nav(self):
+        return self.balance + sum(self.unrealized_pl(trade) for trade in self.trades.values())
+
+    @property
+    def margin_used(self):
+        return sum(abs(trade['currentUnits']) * sum(self._prices[trade['instrument']]) / 2 * self.margin_rate
+                   for trade in self.trades.values())
+
+    def _fill(self, order: dict, order_id: str, units: int, price: float, reason: str, trade_ids: list = None):
+        """
+        Fill units of an order, reducing existing trades first unless the position fill says otherwise
+        """
+        instrument = order['instrument']
+        position_fill = order.get('positionFill', 'DEFAULT')
+        if position_fill == 'DEFAULT':
+            position_fill = 'OPEN_ONLY' if self.hedging else 'REDUCE_FIRST'
+        closed, reduced, opened, pl = [], None, None, 0.0
+        remaining = units
+        if position_fill != 'OPEN_ONLY':
+            candidates = trade_ids if trade_ids is not None else list(self.trades)
+            for trade_id in candidates:
+                trade = self.trades[trade_id]
+                if remaining == 0:
+                    break
+                if trade['instrument'] != instrument or trade['currentUnits'] * remaining >= 0:
+                    continue
+                size = min(abs(remaining), abs(trade['currentUnits']))
+                signed = size if trade['currentUnits'] > 0 else -size
+                trade_pl = signed * (price - trade['price'])
+                pl += trade_pl
+                trade['currentUnits'] -= signed
+                trade['realizedPL'] += trade_pl
+                remaining += signed
+                entry = {'tradeID': trade_id, 'units': str(-signed), 'price': str(price), 'realizedPL': str(trade_pl)}
+                if trade['currentUnits'] == 0:
+                    closed.append(entry)
+                    del self.trades[trade_id]
+                else:
+                    reduced = entry
+        if remaining != 0 and position_fill != 'REDUCE_ONLY':
+            opened = self._last_id + 1
+        elif remaining != 0:
+            units -= remaining
+            remaining = 0
+            if units == 0:
+                return self._cancel(order_id, 'REDUCE_ONLY_ORDER_NO_POSITION')
+        self.balance += pl
+        fill = self.add_transaction('ORDER_FILL', orderID=order_id, instrument=instrument, units=str(units),
+                                 price=str(price), pl=str(pl), accountBalance=str(self.balance), reason=reason)
+        if opened is not None:
+            trade_id = fill['id']
+            self.trades[trade_id] = {'id': trade_id, 'instrument': instrument, 'price': price, 'openTime': fill['time'],
+                                     'initialUnits': remaining, 'currentUnits': remaining, 'realizedPL': 0.0}
+            fill['tradeOpened'] = {'tradeID': trade_id, 'units': str(remaining), 'price': str(price)}
+        if closed:
+            fill['tradesClosed'] = closed
+        if reduced is not None:
+            fill['tradeReduced'] = reduced
+        return fill
+
+    def _cancel(self, order_id: str, reason: str):
+        self.orders.pop(order_id, None)
+        return self.add_transaction('ORDER_CANCEL', orderID=order_id, reason=reason)
+
+    @staticmethod
+    def _marketable(order: dict, units: int, bid: float, ask: float):
+        price = float(order['price'])
+        if order['type'] == 'LIMIT':
+            return ask <= price if units > 0 else bid >= price
+        return ask >= price if units > 0 else bid <= price
+
+    def create_order(self, data: dict):
+        """
+        Create an order, as `OandaAccount.create_order`. MARKET orders and marketable LIMIT and STOP orders
+        fill at once at the current bid or ask.
+        :param data: a dict with the parameters of the order to be created
+        :returns: tuple[dict, str]
+        """
+        order = dict(data['order'])
+        kind = order.get('type', 'MARKET')
+        instrument = order.get('instrument')
+        units = int(float(order.get('units', 0)))
+        default_tif = 'FOK' if kind == 'MARKET' else 'GTC'
+        order.setdefault('timeInForce', default_tif)
+        order.setdefault('positionFill', 'DEFAULT')
+        reject = None
+        if kind not in ('MARKET', 'LIMIT', 'STOP'):
+            reject = 'UNSUPPORTED_ORDER_TYPE'
+        elif units == 0:
+            reject = 'UNITS_INVALID'
+        elif instrument not in self._prices:
+            reject = 'INSTRUMENT_PRICE_UNKNOWN'
+        elif kind != 'MARKET' and 'price' not in order:
+            reject = 'PRICE_MISSING'
+        if reject is not None:
+            rejected = self.add_transaction(f'{kind}_ORDER_REJECT', rejectReason=reject, **order)
+            return self._reply(orderRejectTransaction=rejected, errorCode=reject,
+                               errorMessage=f'order rejected: {reject}')
+        created = self.add_transaction(f'{kind}_ORDER', **order)
+        order_id = created['id']
+        bid, ask = self._prices[instrument]
+        price = ask if units > 0 else bid
+        if kind == 'MARKET':
+            bound = order.get('priceBound')
+            if bound is not None and (price > float(bound) if units > 0 else price < float(bound)):
+                return self._reply(orderCreateTransaction=created,
+                                   orderCancelTransaction=self._cancel(order_id, 'BOUNDS_VIOLATION'))
+            return self._reply_filled(created, self._fill(order, order_id, units, price, 'MARKET_ORDER'))
+        if self._marketable(order, units, bid, ask):
+            return self._reply_filled(created, self._fill(order, order_id, units, price, f'{kind}_ORDER'))
+        if order['timeInForce'] in ('FOK', 'IOC'):
+            return self._reply(orderCreateTransaction=created,
+                               orderCancelTransaction=self._cancel(order_id, 'TIME_IN_FORCE_EXPIRED'))
+        self.orders[order_id] = {**order, 'id': order_id, 'createTime': created['time'], 'state': 'PENDING',
+                                 '_units': units, '_created': self.time}
+        return self._reply(orderCreateTransaction=created)
+
+    def on_bar(self, instrument: str, time: int, bid: tuple, ask: tuple):
+        """
+        Move the simulation to a new candle of an instrument, filling or expiring its pending orders
+        :param instrument: the instrument of the candle
+        :param time: the time of the candle, in nanoseconds since the epoch
+        :param bid: the bid (open, high, low, close) of the candle
+        :param ask: the ask (open, high, low, close) of the candle
+        :returns: list[dict], the transactions the candle caused
+        """
+        self.time = time
+        first = len(self.transactions)
+        for order_id, order in list(self.orders.items()):
+            if order['instrument'] != instrument:
+                continue
+            tif = order['timeInForce']
+            if (tif == 'GTD' and 'gtdTime' in order and time >= parse_time(order['gtdTime'])) or \
+                    (tif == 'GFD' and time // _DAY != order['_created'] // _DAY):
+                self._cancel(order_id, 'TIME_IN_FORCE_EXPIRED')
+                continue
+            units = order['_units']
+            price = float(order['price'])
+            if order['type'] == 'LIMIT':
+                if units > 0 and ask[2] <= price:
+                    fill = min(price, ask[0])
+                elif units < 0 and bid[1] >= price:
+                    fill = max(price, bid[0])
+                else:
+                    continue
+            else:
+                if units > 0 and ask[1] >= price:
+                    fill = max(price, ask[0])
+                elif units < 0 and bid[2] <= price:
+                    fill = min(price, bid[0])
+                else:
+                    continue
+            del self.orders[order_id]
+            self._fill(order, order_id, units, fill, f'{order["type"]}_ORDER')
+        self._prices[instrument] = (bid[3], ask[3])
+        return self.transactions[first:]
+
+    def cancel_order(self, order_id: str):
+        """
+        Cancel a pending order, as `OandaAccount.cancel_order`
+        :param order_id: the identifier of the order to be cancelled
+        :returns: tuple[dict, str]
+        """
+        if order_id not in self.orders:
+            return self._reply(errorCode='ORDER_DOESNT_EXIST', errorMessage='The Order specified does not exist')
+        return self._reply(orderCancelTransaction=self._cancel(order_id, 'CLIENT_REQUEST'))
+
+    def _close(self, instrument: str, trade_ids: list, units: int):
+        order = {'type': 'MARKET', 'instrument': instrument, 'units': str(units), 'positionFill': 'REDUCE_ONLY'}
+        created = self.add_transaction('MARKET_ORDER', **order)
+        bid, ask = self._prices[instrument]
+        fill = self._fill(order, created['id'], units, ask if units > 0 else bid, 'MARKET_ORDER_TRADE_CLOSE', trade_ids)
+        return created, fill
+
+    def close_trade(self, trade_specifier: str):
+        """
+        Close a trade at the current price, as `OandaAccount.close_trade`
+        :param trade_specifier: the ID of the trade
+        :returns: tuple[dict, str]
+        """
+        trade = self.trades.get(trade_specifier)
+        if trade is None:
+            return self._reply(errorCode='TRADE_DOESNT_EXIST', errorMessage='The Trade specified does not exist')
+        created, fill = self._close(trade['instrument'], [trade_specifier], -trade['currentUnits'])
+        return self._reply(orderCreateTransaction=created, orderFillTransaction=fill)
+
+    def close_position(self, instrument: str, long: bool):
+        """
+        Close one side of an instrument's position at the current price, as `OandaAccount.close_position`
+        :param instrument: The instrument to close position
+        :param long: True to close longPosition, False to close shortPosition
+        :returns: tuple[dict, str]
+        """
+        trade_ids = [trade_id for trade_id, trade in self.trades.items()
+                     if trade['instrument'] == instrument and (trade['currentUnits'] > 0) == long]
+        if not trade_ids:
+            return self._reply(errorCode='CLOSEOUT_POSITION_DOESNT_EXIST',
+                               errorMessage='The Position requested to be closed out does not exist')
+        units = -sum(self.trades[trade_id]['currentUnits'] for trade_id in trade_ids)
+        created, fill = self._close(instrument, trade_ids, units)
+        side = 'long' if long else 'short'
+        return self._reply(**{f'{side}OrderCreateTransaction': created, f'{side}OrderFillTransaction': fill})
+
+    def get_orders(self):
+        """
+        Get the pending orders, as `OandaAccount.get_orders`
+        :returns: tuple[dict, str]
+        """
+        orders = [{key: value for key, value in order.items() if not key.startswith('_')}
+                  for order in self.orders.values()]
+        return self._reply(orders=orders)
+
+    def get_open_trades(self):
+        """
+        Get the open trades, as `OandaAccount.get_open_trades`
+        :returns: tuple[dict, str]
+        """
+        trades = [{'id': trade['id'], 'instrument': trade['instrument'], 'price': str(trade['price']),
+                   'openTime': trade['openTime'], 'initialUnits': str(trade['initialUnits']),
+                   'currentUnits': str(trade['currentUnits']), 'state': 'OPEN',
+                   'realizedPL': str(trade['realizedPL']), 'unrealizedPL': str(self.unrealized_pl(trade))}
+                  for trade in reversed(list(self.trades.values()))]
+        return self._reply(trades=trades)
+
+    def get_open_positions(self):
+        """
+        Get the open positions, as `OandaAccount.get_open_positions`
+        :returns: tuple[dict, str]
+        """
+        sides = {}
+        for trade in self.trades.values():
+            side = sides.setdefault(trade['instrument'], {'long': [], 'short': []})
+            side['long' if trade['currentUnits'] > 0 else 'short'].append(trade)
+        positions = []
+        for instrument, side in sides.items():
+            position = {'instrument': instrument}
+            total = 0.0
+            for name, trades in side.items():
+                units = sum(trade['currentUnits'] for trade in trades)
+                unrealized = sum(self.unrealized_pl(trade) for trade in trades)
+                total += unrealized
+                position[name] = {'units': str(units), 'tradeIDs': [trade['id'] for trade in trades],
+                                  'unrealizedPL': str(unrealized)}
+                if units:
+                    position[name]['averagePrice'] = str(
+                        sum(trade['price'] * trade['currentUnits'] for trade in trades) / units)
+            position['unrealizedPL'] = str(total)
+            positions.append(position)
+        return self._reply(positions=positions)
@@ -0,0 +1,112 @@
+import itertools
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from algotradingstuff.data.cache import RECORD
+from algotradingstuff.data.candleframe import CandleFrame
+from algotradingstuff.data.timeutils import to_ns
+
+
+def parameter_grid(grid: dict):
+    """
+    List every combination of the parameter values
+    :param grid: the values to try for each parameter, e.g. `{'fast': [5, 10], 'slow': [20, 50]}`
+    :returns: list[dict]
+    """
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def walk_forward(bars: int, folds: int, train: int):
+    """
+    Split bars into rolling walk-forward folds, each a training window followed by a test window
+    :param bars: the number of bars
+    :param folds: the number of folds
+    :param train: the number of bars in each training window
+    :returns: list[tuple[slice, slice]], the training and test bars of each fold
+    :raises: ValueError
+    """
+    test = (bars - train) // folds
+    if test < 1:
+        raise ValueError(f'{bars} bars are too few for {folds} folds with {train} training bars')
+    return [(slice(k * test, k * test + train), slice(k * test + train, (k + 1) * test + train))
+            for k in range(folds)]
+
+
+def _share(frames: dict, directory: str):
+    # write each frame to one file the workers memory map, so the arrays aren't pickled
+    shared = {}
+    for name, frame in frames.items():
+        path = os.path.join(directory, f'{name}.bin')
+        records = np.memmap(path, dtype=RECORD, mode='w+', shape=(max(len(frame), 1),))
+        for column in RECORD.names:
+            records[column][:len(frame)] = getattr(frame, column)
+        records.flush()
+        del records
+        shared[name] = (path, len(frame), frame.instrument, frame.granularity)
+    return shared
+
+
+def _open(shared: dict):
+    frames = {}
+    for name, (path, count, instrument, granularity) in shared.items():
+        records = np.memmap(path, dtype=RECORD, mode='r', shape=(max(count, 1),))[:count]
+        frames[name] = CandleFrame(*(records[column] for column in RECORD.names),
+                                   instrument=instrument, granularity=granularity)
+    return frames
+
+
+def _run_fold(strategy, shared: dict, params: dict, fold: int, train: slice, test: slice):
+    frames = _open(shared)
+    metrics = strategy({name: frame[train] for name, frame in frames.items()},
+                       {name: frame[test] for name, frame in frames.items()}, **params)
+    return params, fold, metrics
+
+
+def sweep(strategy, frames: dict, grid: dict, folds: int, train: int, start=None, end=None,
+          max_workers: int = None, rank_by: str = 'pl'):
+    """
+    Evaluate a strategy for every parameter combination on every walk-forward fold, in a process pool
+    :param strategy: a picklable function called as `strategy(train_frames, test_frames, **params)`, returning
+    a dict of metrics for the test frames
+    :param frames: the `CandleFrame`s the strategy needs, by name, e.g. `{'bid': ..., 'ask': ...}`, all with the
+    same times
+    :param grid: the values to try for each parameter
+    :param folds: the number of walk-forward folds
+    :param train: the number of bars in each training window
+    :param start: a datetime or nanoseconds since the epoch to start at. `None` starts at the first bar
+    :param end: a datetime or nanoseconds since the epoch to end before. `None` ends after the last bar
+    :param max_workers: the number of processes. Defaults to the number of CPUs
+    :param rank_by: the metric the table is sorted by, highest first
+    :returns: list[dict], one row for each parameter combination with its parameters and the mean of each metric
+    """
+    first = next(iter(frames.values()))
+    lo = 0 if start is None else int(np.searchsorted(first.time, to_ns(start)))
+    hi = len(first) if end is None else int(np.searchsorted(first.time, to_ns(end)))
+    frames = {name: frame[lo:hi] for name, frame in frames.items()}
+    splits = walk_forward(hi - lo, folds, train)
+    combinations = parameter_grid(grid)
+    directory = tempfile.mkdtemp(prefix='algotradingstuff-sweep-')
+    try:
+        shared = _share(frames, directory)
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(_run_fold, strategy, shared, params, fold, train_bars, test_bars)
+                       for params in combinations for fold, (train_bars, test_bars) in enumerate(splits)]
+            results = [future.result() for future in futures]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    by_params = {}
+    for params, fold, metrics in results:
+        by_params.setdefault(tuple(params.items()), []).append(metrics)
+    table = []
+    for key, fold_metrics in by_params.items():
+        row = dict(key)
+        row['folds'] = len(fold_metrics)
+        for metric in fold_metrics[0]:
+            row[metric] = float(np.mean([m[metric] for m in fold_metrics]))
+        table.append(row)
+    table.sort(key=lambda row: row.get(rank_by, float('-inf')), reverse=True)
+    return table
@@ -0,0 +1,51 @@
+import numpy as np
+from algotradingstuff.backtest.metrics import summarize
+
+
+class VectorizedResult:
+    """
+    This class holds the outcome of `backtest_positions`
+    """
+
+    __slots__ = ('equity', 'trades', 'volume')
+
+    def __init__(self, equity, trades, volume):
+        """
+
+        :param equity: the profit and loss after each bar, valued at the price the position could be closed at
+        :param trades: how many bars the position changed on
+        :param volume: the total units traded
+        """
+        self.equity = equity
+        self.trades = trades
+        self.volume = volume
+
+    def summary(self):
+        """
+        Work out the performance of the backtest
+        :returns: dict
+        """
+        return {**summarize(self.equity), 'trades': self.trades, 'volume': self.volume}
+
+
+def backtest_positions(position, bid, ask):
+    """
+    Backtest a strategy given as the position it wants to hold after each bar. The position changes at
+    the close of the bar, buying at the ask and selling at the bid, so the spread is paid on every trade.
+    :param position: the units held after each bar, with time along the last axis. A 2-D array backtests
+    many instruments or parameter sets at once
+    :param bid: the bid close of each bar
+    :param ask: the ask close of each bar
+    :returns: VectorizedResult
+    """
+    position = np.asarray(position, dtype=np.float64)
+    bid = np.asarray(bid, dtype=np.float64)
+    ask = np.asarray(ask, dtype=np.float64)
+    traded = np.diff(position, axis=-1, prepend=0.0)
+    cash = -np.cumsum(traded * np.where(traded > 0.0, ask, bid), axis=-1)
+    equity = cash + position * np.where(position > 0.0, bid, ask)
+    trades = np.count_nonzero(traded, axis=-1)
+    volume = np.abs(traded).sum(axis=-1)
+    if np.ndim(trades) == 0:
+        trades, volume = int(trades), float(volume)
+    return VectorizedResult(equity, trades, volume)
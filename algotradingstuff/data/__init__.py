@@ -0,0 +1,21 @@
+from .aggregate import CandleAggregator
+from .backfill import backfill_candles
+from .backfill import split_windows
+from .backfill import stitch_candles
+from .backfill import CandleSeries
+from .cache import CandleCache
+from .candleframe import CandleFrame
+from .resample import Alignment
+from .resample import OANDA_ALIGNMENT
+from .resample import Resampler
+from .resample import resample
+from .timeutils import parse_time
+from .timeutils import parse_times
+from .timeutils import to_ns
+from .timeutils import to_unix_string
+from .timeutils import align
+from .errors import BackfillError
+from .errors import TransactionSyncError
+from .granularity import granularity_seconds
+from .transactions import TransactionStore
+from .transactions import sync_transactions
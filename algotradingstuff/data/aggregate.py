@@ -0,0 +1,106 @@
+from algotradingstuff.data.candleframe import COMPONENTS
+from algotradingstuff.data.timeutils import parse_time, to_unix_string
+from algotradingstuff.data.granularity import granularity_seconds
+from algotradingstuff.data.resample import OANDA_ALIGNMENT, Alignment
+
+
+class CandleAggregator:
+    """
+    This class builds candles from streamed prices as they arrive. Each candle has the same shape
+    as one returned by the candles endpoint, with float prices.
+    """
+
+    def __init__(self, granularities: list, price: str = 'M', alignment: Alignment = None):
+        """
+
+        :param granularities: the intervals to build candles for. Only granularities shorter than a day are supported
+        :param price: the price points of the candles, any of 'M' midpoint, 'B' bid and 'A' ask, e.g. 'BA'
+        :param alignment: how candles are aligned. Defaults to `OANDA_ALIGNMENT`
+        :raises: ValueError
+        """
+        for granularity in granularities:
+            if granularity_seconds(granularity) >= 86400:
+                raise ValueError(f'cannot build {granularity} candles from prices')
+        self._granularities = list(granularities)
+        self._alignment = alignment or OANDA_ALIGNMENT
+        self._components = [COMPONENTS[p] for p in price]
+        self._current = dict.fromkeys(self._granularities)
+        self._ends = dict.fromkeys(self._granularities, 0)
+
+    def current(self, granularity: str):
+        """
+        Get the candle that is being built
+        :param granularity: interval of the candle
+        :returns: dict or None
+        """
+        return self._current[granularity]
+
+    def update(self, price: dict):
+        """
+        Add a `PRICE` message from the pricing stream
+        :param price: the decoded message
+        :returns: list[tuple[str, dict]], the granularity and candle of each candle this price completed
+        """
+        bid = float(price['bids'][0]['price']) if price.get('bids') else float(price['closeoutBid'])
+        ask = float(price['asks'][0]['price']) if price.get('asks') else float(price['closeoutAsk'])
+        return self.update_prices(parse_time(price['time']), {'bid': bid, 'ask': ask, 'mid': (bid + ask) / 2})
+
+    def update_prices(self, time: int, prices: dict):
+        """
+        Add a price at the given time
+        :param time: nanoseconds since the epoch
+        :param prices: the price for each of 'mid', 'bid' and 'ask' this aggregator builds
+        :returns: list[tuple[str, dict]], the granularity and candle of each candle this price completed
+        """
+        completed = []
+        for granularity in self._granularities:
+            candle = self._current[granularity]
+            if candle is not None and time >= self._ends[granularity]:
+                candle['complete'] = True
+                completed.append((granularity, candle))
+                candle = None
+            if candle is None:
+                start, self._ends[granularity] = self._alignment.bucket(time, granularity)
+                candle = {'time': to_unix_string(start), 'complete': False, 'volume': 0}
+                for component in self._components:
+                    p = prices[component]
+                    candle[component] = {'o': p, 'h': p, 'l': p, 'c': p}
+                self._current[granularity] = candle
+            else:
+                for component in self._components:
+                    p = prices[component]
+                    ohlc = candle[component]
+                    if p > ohlc['h']:
+                        ohlc['h'] = p
+                    elif p < ohlc['l']:
+                        ohlc['l'] = p
+                    ohlc['c'] = p
+            candle['volume'] += 1
+        return completed
+
+    def close(self, time: int):
+        """
+        Complete every candle whose interval ended before the given time, e.g. on a heartbeat
+        :param time: nanoseconds since the epoch
+        :returns: list[tuple[str, dict]], the granularity and candle of each completed candle
+        """
+        completed = []
+        for granularity, candle in self._current.items():
+            if candle is not None and time >= self._ends[granularity]:
+                candle['complete'] = True
+                completed.append((granularity, candle))
+                self._current[granularity] = None
+        return completed
+
+    def feed(self, messages):
+        """
+        Build candles from the messages of a pricing stream
+        :param messages: an iterable of decoded messages, e.g. from `OandaStreamSession.messages` with heartbeats
+        :returns: generator of tuple[str, dict], the granularity and candle of each completed candle
+        """
+        for message in messages:
+            kind = message.get('type')
+            if kind == 'PRICE':
+                yield from self.update(message)
+            elif kind == 'HEARTBEAT':
+                yield from self.close(parse_time(message['time']))
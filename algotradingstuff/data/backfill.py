@@ -0,0 +1,151 @@
+import os
+import numpy as np
+from algotradingstuff.sessions import OandaSession, TokenBucket, send_all
+from algotradingstuff.data.candleframe import CandleFrame, COMPONENTS
+from algotradingstuff.data.errors import BackfillError
+from algotradingstuff.data.granularity import MAX_CANDLES, granularity_seconds, is_fixed
+from algotradingstuff.data.resample import OANDA_ALIGNMENT
+from algotradingstuff.data.timeutils import NS_PER_SECOND, align, parse_times, to_ns
+
+
+class CandleSeries:
+    """
+    This class holds the stitched together candles of one instrument
+    """
+
+    def __init__(self, instrument: str, granularity: str, price: str, candles: list, gaps: list):
+        """
+
+        :param instrument: the instrument the candles are for
+        :param granularity: interval of the candles
+        :param price: the price point of the candles
+        :param candles: the de-duplicated candle dicts, sorted by time
+        :param gaps: a list of `(before, after)` UNIX times between which candles are missing
+        """
+        self.instrument = instrument
+        self.granularity = granularity
+        self.price = price
+        self.candles = candles
+        self.gaps = gaps
+
+    def __len__(self):
+        return len(self.candles)
+
+    def to_frame(self):
+        """
+        Convert the candles to a columnar frame
+        :returns: CandleFrame
+        """
+        return CandleFrame.from_candles(self.candles, COMPONENTS.get(self.price, 'mid'),
+                                        instrument=self.instrument, granularity=self.granularity)
+
+
+def split_windows(start: float, end: float, granularity: str, max_candles: int = MAX_CANDLES):
+    """
+    Split a time range into windows small enough for a single candles request. The first window starts
+    on a candle boundary, so every window does.
+    :param start: the UNIX time of the start of the range
+    :param end: the UNIX time of the end of the range
+    :param granularity: interval of the candles
+    :param max_candles: the most candles one window may hold
+    :returns: list[tuple[float, float]]
+    """
+    if end <= start:
+        raise ValueError('end must be after start')
+    start = align(to_ns(start, unit='s'), granularity) / NS_PER_SECOND
+    # `from` and `to` are both inclusive, so leave room for one extra candle
+    step = (max_candles - 1) * granularity_seconds(granularity)
+    windows = []
+    while start < end:
+        windows.append((start, min(start + step, end)))
+        start += step
+    return windows
+
+
+def _market_closed(first, last):
+    # the market closes from 17:00 on Friday to 17:00 on Sunday in New York, which is when OANDA's weekly
+    # candles start and the daily candle 36 hours later ends
+    week, _ = OANDA_ALIGNMENT.bounds(first, 'W')
+    _, reopen = OANDA_ALIGNMENT.bounds(week + 36 * 3600 * NS_PER_SECOND, 'D')
+    return last <= reopen
+
+
+def stitch_candles(chunks: list, granularity: str):
+    """
+    Merge lists of candles into one series, dropping duplicates and finding gaps. Candles missing only
+    while the market is closed for the weekend aren't a gap.
+    :param chunks: a list of candle lists, as returned in the `candles` field of the API response
+    :param granularity: interval of the candles
+    :returns: tuple[list, list], the sorted candles and the gaps between them
+    """
+    by_time = {}
+    for chunk in chunks:
+        for candle in chunk:
+            seen = by_time.get(candle['time'])
+            # an incomplete candle may show up again, complete, in the next window
+            if seen is None or not seen.get('complete', True):
+                by_time[candle['time']] = candle
+    candles = list(by_time.values())
+    times = parse_times([candle['time'] for candle in candles])
+    order = np.argsort(times, kind='stable')
+    candles = [candles[i] for i in order.tolist()]
+    times = times[order]
+    gaps = []
+    if is_fixed(granularity):
+        length = granularity_seconds(granularity) * NS_PER_SECOND
+        after = np.flatnonzero(np.diff(times) > length) + 1
+        if len(after):
+            after = after[~_market_closed(times[after - 1] + length, times[after])]
+        gaps = [(times[i - 1] / NS_PER_SECOND, times[i] / NS_PER_SECOND) for i in after.tolist()]
+    return candles, gaps
+
+
+def backfill_candles(account, instruments: list, start, end, granularity: str = 'M1',
+                     price: str = 'M', session: OandaSession = None, max_workers: int = 4, rate: float = 100.0,
+                     burst: float = None):
+    """
+    Get all the candles between `start` and `end` for many instruments. The range is split into windows
+    the API can serve in one request and the windows are fetched concurrently.
+    :param account: the `OandaAccount` used to build the candle requests
+    :param instruments: the instruments you want the candles for
+    :param start: the start point of your data range, a datetime, which is UTC if it has no timezone,
+    numpy.datetime64 or nanoseconds since the epoch
+    :param end: the end point of your data range, as `start`
+    :param granularity: interval of the candles
+    :param price: the price point of the candles. 'M' midpoint candles, 'B' bid candles, 'A' ask candles
+    :param session: the session used to send the requests. A new one is made, and closed, if not given
+    :param max_workers: the most requests in flight at once
+    :param rate: the most requests sent per second, or `None` to not limit the rate
+    :param burst: how many requests may be sent at once before `rate` applies. Defaults to `rate`
+    :returns: dict[str, CandleSeries]
+    :raises: BackfillError
+    """
+    windows = split_windows(to_ns(start) / NS_PER_SECOND, to_ns(end) / NS_PER_SECOND, granularity)
+    jobs = [(instrument, window) for instrument in instruments for window in windows]
+    requests = [account.get_candles(instrument, start=window[0], end=window[1], price=price, granularity=granularity)
+                for instrument, window in jobs]
+    own_session = session is None
+    if own_session:
+        session = OandaSession(pool_size=max_workers)
+    limiter = TokenBucket(rate, burst) if rate else None
+    try:
+        results = send_all(session, requests, max_workers=max_workers, limiter=limiter)
+    finally:
+        if own_session:
+            session.close()
+
+    chunks = {instrument: [] for instrument in instruments}
+    for (instrument, window), result in zip(jobs, results):
+        if isinstance(result, Exception):
+            raise BackfillError(f'failed to get candles for {instrument} from {window[0]} to {window[1]}') from result
+        content, _ = result
+        if 'candles' not in content:
+            raise BackfillError(f'failed to get candles for {instrument} from {window[0]} to {window[1]}.' +
+                                os.linesep + f'Reason {content.get("errorMessage", "")}')
+        chunks[instrument].append(content['candles'])
+
+    series = {}
+    for instrument, instrument_chunks in chunks.items():
+        candles, gaps = stitch_candles(instrument_chunks, granularity)
+        series[instrument] = CandleSeries(instrument, granularity, price, candles, gaps)
+    return series
@@ -0,0 +1,297 @@
+import contextlib
+import datetime as dt
+import json
+import os
+import numpy as np
+from algotradingstuff.data.backfill import backfill_candles
+from algotradingstuff.data.candleframe import CandleFrame
+from algotradingstuff.data.resample import OANDA_ALIGNMENT, Alignment, resample
+from algotradingstuff.data.timeutils import to_ns
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no flock, so the cache is only safe for one process there
+    fcntl = None
+
+# The layout of one candle in a cache file
+RECORD = np.dtype([('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+                   ('volume', '<i8'), ('complete', '?')])
+
+
+@contextlib.contextmanager
+def locked(path: str, exclusive: bool, blocking: bool = True):
+    """
+    Hold a lock on a file while the block runs, shared by readers and exclusive for writers
+    :param path: the path of the lock file, made if it doesn't exist
+    :param exclusive: if True no one else may hold the lock, otherwise only other shared holders may
+    :param blocking: if False don't wait for the lock
+    :returns: context manager giving bool, whether the lock is held
+    """
+    while True:
+        with open(path, 'a+b') as fh:
+            if fcntl is not None:
+                flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+                try:
+                    fcntl.flock(fh, flags if blocking else flags | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    yield False
+                    return
+                # `evict` removes the lock file of the files it removes while holding it, so a lock taken on a
+                # file that is no longer at `path` is let go and taken again on the new one
+                try:
+                    current = os.stat(path).st_ino == os.fstat(fh.fileno()).st_ino
+                except FileNotFoundError:
+                    current = False
+                if not current:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+                    continue
+            try:
+                yield True
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+            return
+
+
+def _merge_ranges(ranges: list):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class CandleCache:
+    """
+    This class stores candles on disk so they only have to be downloaded once. Each instrument, granularity
+    and price point has its own append-only file of fixed size records, sorted by time, which is read
+    through a memory map.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = None):
+        """
+
+        :param directory: where the cache files are kept. It is made if it doesn't exist
+        :param max_bytes: the most bytes of candles to keep. The least recently used files are
+        removed first. `None` for no limit
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, instrument: str, granularity: str, price: str):
+        return os.path.join(self.directory, f'{instrument}.{granularity}.{price}')
+
+    @staticmethod
+    def _read_meta(path: str):
+        try:
+            with open(f'{path}.json', 'r') as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return {'count': 0, 'ranges': []}
+
+    @staticmethod
+    def _write_meta(path: str, meta: dict):
+        with open(f'{path}.json.tmp', 'w') as fh:
+            json.dump(meta, fh)
+        os.replace(f'{path}.json.tmp', f'{path}.json')
+
+    @staticmethod
+    def _map(path: str, count: int):
+        if count == 0:
+            return np.empty(0, dtype=RECORD)
+        return np.memmap(f'{path}.bin', dtype=RECORD, mode='r', shape=(count,))
+
+    def coverage(self, instrument: str, granularity: str, price: str = 'M'):
+        """
+        Get the time ranges the cache holds every candle for
+        :param instrument: the instrument of the candles
+        :param granularity: interval of the candles
+        :param price: the price point of the candles
+        :returns: list[list[int]], `[start, end)` pairs in nanoseconds since the epoch
+        """
+        path = self._path(instrument, granularity, price)
+        with locked(f'{path}.lock', exclusive=False):
+            return self._read_meta(path)['ranges']
+
+    def missing(self, instrument: str, granularity: str, price: str, start, end):
+        """
+        Get the parts of a time range the cache doesn't hold
+        :param instrument: the instrument of the candles
+        :param granularity: interval of the candles
+        :param price: the price point of the candles
+        :param start: a datetime or nanoseconds since the epoch
+        :param end: a datetime or nanoseconds since the epoch
+        :returns: list[tuple[int, int]], `[start, end)` pairs in nanoseconds since the epoch
+        """
+        start, end = to_ns(start), to_ns(end)
+        gaps = []
+        for covered_start, covered_end in self.coverage(instrument, granularity, price):
+            if covered_end <= start:
+                continue
+            if covered_start >= end:
+                break
+            if covered_start > start:
+                gaps.append((start, covered_start))
+            start = max(start, covered_end)
+        if start < end:
+            gaps.append((start, end))
+        return gaps
+
+    def read(self, instrument: str, granularity: str, price: str = 'M', start=None, end=None):
+        """
+        Get cached candles. The arrays of the returned frame are views of the memory mapped file.
+        :param instrument: the instrument of the candles
+        :param granularity: interval of the candles
+        :param price: the price point of the candles
+        :param start: a datetime or nanoseconds since the epoch. `None` starts at the first candle
+        :param end: a datetime or nanoseconds since the epoch. `None` ends after the last candle
+        :returns: CandleFrame
+        """
+        path = self._path(instrument, granularity, price)
+        with locked(f'{path}.lock', exclusive=False):
+            records = self._map(path, self._read_meta(path)['count'])
+        self._touch(path)
+        frame = CandleFrame(*(records[name] for name in RECORD.names), instrument=instrument, granularity=granularity)
+        return frame.between(start, end)
+
+    def write(self, frame: CandleFrame, instrument: str, granularity: str, price: str, start, end):
+        """
+        Add candles to the cache and mark `[start, end)` as covered. Candles later than every cached
+        one are appended, anything else rewrites the file.
+        :param frame: the candles to add, which must all be complete
+        :param instrument: the instrument of the candles
+        :param granularity: interval of the candles
+        :param price: the price point of the candles
+        :param start: a datetime or nanoseconds since the epoch
+        :param end: a datetime or nanoseconds since the epoch
+        """
+        path = self._path(instrument, granularity, price)
+        frame = frame.between(start, end)
+        records = np.empty(len(frame), dtype=RECORD)
+        for name in RECORD.names:
+            records[name] = getattr(frame, name)
+        with locked(f'{path}.lock', exclusive=True):
+            meta = self._read_meta(path)
+            existing = self._map(path, meta['count'])
+            if len(records) and meta['count'] and records['time'][0] <= existing['time'][-1]:
+                merged = CandleFrame.concat([
+                    CandleFrame(*(existing[name] for name in RECORD.names)),
+                    CandleFrame(*(records[name] for name in RECORD.names))])
+                records = np.empty(len(merged), dtype=RECORD)
+                for name in RECORD.names:
+                    records[name] = getattr(merged, name)
+                # readers keep their map of the old file until they next read
+                with open(f'{path}.bin.tmp', 'wb') as fh:
+                    fh.write(records.tobytes())
+                os.replace(f'{path}.bin.tmp', f'{path}.bin')
+                meta['count'] = len(records)
+            elif len(records):
+                with open(f'{path}.bin', 'ab') as fh:
+                    fh.seek(meta['count'] * RECORD.itemsize)
+                    fh.truncate()
+                    fh.write(records.tobytes())
+                meta['count'] += len(records)
+            meta['ranges'] = _merge_ranges(meta['ranges'] + [[to_ns(start), to_ns(end)]])
+            self._write_meta(path, meta)
+        self._touch(path)
+        self.evict(keep=path)
+
+    def get_candles(self, account, instrument: str, start: dt.datetime, end: dt.datetime, price: str = 'M',
+                    granularity: str = 'M1', session=None, **kwargs):
+        """
+        Get candles through the cache, only downloading the parts of the range it doesn't hold yet
+        :param account: the `OandaAccount` used to build the candle requests
+        :param instrument: the instrument you want the candles for
+        :param start: the start point of your data range
+        :param end: the end point of your data range
+        :param price: the price point of the candles. 'M' midpoint candles, 'B' bid candles, 'A' ask candles
+        :param granularity: interval of the candles
+        :param session: the session used to send the requests
+        :param kwargs: passed on to `backfill_candles`
+        :returns: CandleFrame
+        :raises: BackfillError
+        """
+        for gap_start, gap_end in self.missing(instrument, granularity, price, start, end):
+            series = backfill_candles(account, [instrument], gap_start, gap_end, granularity=granularity, price=price,
+                                      session=session, **kwargs)
+            frame = series[instrument].to_frame()
+            incomplete = np.flatnonzero(~frame.complete)
+            if len(incomplete):
+                # only complete candles are cached, the rest of the range is fetched again next time
+                gap_end = min(gap_end, int(frame.time[incomplete[0]]))
+                frame = frame[:incomplete[0]]
+            if gap_end > gap_start:
+                self.write(frame, instrument, granularity, price, gap_start, gap_end)
+        return self.read(instrument, granularity, price, start, end)
+
+    def get_resampled(self, account, instrument: str, start, end, granularity: str, source: str = 'M1',
+                      price: str = 'M', alignment: Alignment = None, session=None, **kwargs):
+        """
+        Get candles built from cached candles of a finer granularity, so only that one granularity
+        is downloaded and stored for each instrument
+        :param account: the `OandaAccount` used to build the candle requests
+        :param instrument: the instrument you want the candles for
+        :param start: the start point of your data range. The candle it falls in is built in full
+        :param end: the end point of your data range
+        :param granularity: interval of the candles to build
+        :param source: interval of the candles that are downloaded and cached
+        :param price: the price point of the candles. 'M' midpoint candles, 'B' bid candles, 'A' ask candles
+        :param alignment: how candles are aligned. Defaults to `OANDA_ALIGNMENT`
+        :param session: the session used to send the requests
+        :param kwargs: passed on to `backfill_candles`
+        :returns: CandleFrame
+        :raises: BackfillError, ValueError
+        """
+        alignment = alignment or OANDA_ALIGNMENT
+        first, _ = alignment.bucket(to_ns(start), granularity)
+        frame = self.get_candles(account, instrument, first, end, price=price, granularity=source, session=session,
+                                 **kwargs)
+        return resample(frame, granularity, alignment)
+
+    @staticmethod
+    def _touch(path: str):
+        try:
+            os.utime(f'{path}.lock')
+        except FileNotFoundError:
+            pass
+
+    def size(self):
+        """
+        Get the total size of the cached candles
+        :returns: int
+        """
+        return sum(entry.stat().st_size for entry in os.scandir(self.directory) if entry.name.endswith('.bin'))
+
+    def evict(self, keep: str = None):
+        """
+        Remove the least recently used files, and their lock files, until the cache fits in `max_bytes`.
+        Files locked by another process are skipped.
+        :param keep: the path of a file that mustn't be removed
+        """
+        if self.max_bytes is None:
+            return
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.bin'):
+                path = entry.path[:-len('.bin')]
+                try:
+                    used = os.stat(f'{path}.lock').st_mtime
+                except FileNotFoundError:
+                    used = 0
+                files.append((used, path, entry.stat().st_size))
+        total = sum(size for _, _, size in files)
+        for _, path, size in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            with locked(f'{path}.lock', exclusive=True, blocking=False) as acquired:
+                if not acquired:
+                    continue
+                for suffix in ('.json', '.bin', '.lock'):
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(f'{path}{suffix}')
+            total -= size
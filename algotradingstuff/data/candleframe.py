@@ -0,0 +1,139 @@
+import numpy as np
+from algotradingstuff.data.timeutils import parse_times, to_ns
+
+# The candle field holding the prices for each price point of `OandaAccount.get_candles`
+COMPONENTS = {'M': 'mid', 'B': 'bid', 'A': 'ask'}
+
+_COLUMNS = ('time', 'open', 'high', 'low', 'close', 'volume', 'complete')
+
+
+class CandleFrame:
+    """
+    This class holds candles as parallel NumPy arrays, one per field
+    """
+
+    __slots__ = _COLUMNS + ('instrument', 'granularity')
+
+    def __init__(self, time, open, high, low, close, volume, complete, instrument: str = None,
+                 granularity: str = None):
+        """
+
+        :param time: the start of each candle, in nanoseconds since the epoch
+        :param open: the open price of each candle
+        :param high: the high price of each candle
+        :param low: the low price of each candle
+        :param close: the close price of each candle
+        :param volume: the volume of each candle
+        :param complete: whether each candle is complete
+        :param instrument: the instrument the candles are for
+        :param granularity: interval of the candles
+        """
+        self.time = np.asarray(time, dtype=np.int64)
+        self.open = np.asarray(open, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.volume = np.asarray(volume, dtype=np.int64)
+        self.complete = np.asarray(complete, dtype=np.bool_)
+        self.instrument = instrument
+        self.granularity = granularity
+        if any(len(getattr(self, column)) != len(self.time) for column in _COLUMNS):
+            raise ValueError('every column must have the same length')
+
+    @classmethod
+    def empty(cls, instrument: str = None, granularity: str = None):
+        """
+        Make a frame with no candles
+        :param instrument: the instrument the candles are for
+        :param granularity: interval of the candles
+        :returns: CandleFrame
+        """
+        return cls(*(np.empty(0) for _ in _COLUMNS), instrument=instrument, granularity=granularity)
+
+    @classmethod
+    def from_candles(cls, candles: list, component: str = 'mid', instrument: str = None, granularity: str = None):
+        """
+        Make a frame from the `candles` list of a candles response
+        :param candles: a list of candle dicts
+        :param component: the price field to read, 'mid', 'bid' or 'ask'
+        :param instrument: the instrument the candles are for
+        :param granularity: interval of the candles
+        :returns: CandleFrame
+        """
+        n = len(candles)
+        prices = np.array([candle[component][key] for candle in candles for key in 'ohlc'],
+                          dtype=np.float64).reshape(n, 4)
+        return cls(parse_times([candle['time'] for candle in candles]),
+                   prices[:, 0], prices[:, 1], prices[:, 2], prices[:, 3],
+                   np.fromiter((candle['volume'] for candle in candles), dtype=np.int64, count=n),
+                   np.fromiter((candle['complete'] for candle in candles), dtype=np.bool_, count=n),
+                   instrument=instrument, granularity=granularity)
+
+    @classmethod
+    def from_payload(cls, payload: dict, component: str = None):
+        """
+        Make a frame from the content of a candles response
+        :param payload: the decoded JSON returned by `OandaSession.send` for a `get_candles` request
+        :param component: the price field to read, 'mid', 'bid' or 'ask'. Defaults to the first one
+        in the candles
+        :returns: CandleFrame
+        """
+        candles = payload.get('candles', [])
+        if component is None:
+            component = next((c for c in ('mid', 'bid', 'ask') if candles and c in candles[0]), 'mid')
+        return cls.from_candles(candles, component, instrument=payload.get('instrument'),
+                                granularity=payload.get('granularity'))
+
+    @classmethod
+    def concat(cls, frames: list):
+        """
+        Join frames into one, sorted by time. Where frames overlap the candle from the later frame is kept.
+        :param frames: a list of CandleFrame
+        :returns: CandleFrame
+        """
+        frames = [frame for frame in frames if len(frame)]
+        if not frames:
+            return cls.empty()
+        columns = [np.concatenate([getattr(frame, column) for frame in frames]) for column in _COLUMNS]
+        ordered = all(a.time[-1] < b.time[0] for a, b in zip(frames, frames[1:])) and \
+            all(np.all(frame.time[1:] > frame.time[:-1]) for frame in frames)
+        if not ordered:
+            # a stable sort of the reversed columns puts the latest copy of each time first
+            order = np.argsort(columns[0][::-1], kind='stable')
+            keep = np.ones(len(order), dtype=np.bool_)
+            times = columns[0][::-1][order]
+            keep[1:] = times[1:] != times[:-1]
+            columns = [column[::-1][order][keep] for column in columns]
+        return cls(*columns, instrument=frames[0].instrument, granularity=frames[0].granularity)
+
+    def __len__(self):
+        return len(self.time)
+
+    def __getitem__(self, item):
+        """
+        Index the frame by position. Slices return views of the arrays, not copies.
+        :param item: a slice, an index array or a boolean mask
+        :returns: CandleFrame
+        """
+        if isinstance(item, (int, np.integer)):
+            item = slice(item, item + 1 or None)
+        return CandleFrame(*(getattr(self, column)[item] for column in _COLUMNS),
+                           instrument=self.instrument, granularity=self.granularity)
+
+    def between(self, start=None, end=None):
+        """
+        Get the candles with a time in `[start, end)` without copying them
+        :param start: a datetime or nanoseconds since the epoch. `None` starts at the first candle
+        :param end: a datetime or nanoseconds since the epoch. `None` ends after the last candle
+        :returns: CandleFrame
+        """
+        lo = 0 if start is None else int(np.searchsorted(self.time, to_ns(start), side='left'))
+        hi = len(self) if end is None else int(np.searchsorted(self.time, to_ns(end), side='left'))
+        return self[lo:hi]
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, column).nbytes for column in _COLUMNS)
+
+    def __repr__(self):
+        return f'CandleFrame(instrument={self.instrument!r}, granularity={self.granularity!r}, candles={len(self)})'
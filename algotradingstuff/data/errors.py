@@ -0,0 +1,12 @@
+class BackfillError(Exception):
+    """
+    Raised when a window of candles can't be retrieved during a backfill
+    """
+    pass
+
+
+class TransactionSyncError(Exception):
+    """
+    Raised when a page of transactions can't be retrieved while syncing a transaction store
+    """
+    pass
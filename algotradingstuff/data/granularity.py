@@ -0,0 +1,35 @@
+# Length in seconds of each OANDA candlestick granularity, see
+# http://developer.oanda.com/rest-live-v20/instrument-df/#CandlestickGranularity
+GRANULARITY_SECONDS = {
+    'S5': 5, 'S10': 10, 'S15': 15, 'S30': 30,
+    'M1': 60, 'M2': 120, 'M4': 240, 'M5': 300, 'M10': 600, 'M15': 900, 'M30': 1800,
+    'H1': 3600, 'H2': 7200, 'H3': 10800, 'H4': 14400, 'H6': 21600, 'H8': 28800, 'H12': 43200,
+    'D': 86400, 'W': 604800,
+    # months vary in length, so use the longest one
+    'M': 2678400,
+}
+
+# The most candles the API will return for a single request
+MAX_CANDLES = 5000
+
+
+def granularity_seconds(granularity: str):
+    """
+    Get the length of a candle of the given granularity
+    :param granularity: an OANDA candlestick granularity, e.g. 'M1'
+    :returns: int
+    :raises: ValueError
+    """
+    try:
+        return GRANULARITY_SECONDS[granularity]
+    except KeyError:
+        raise ValueError(f'unknown granularity: {granularity}')
+
+
+def is_fixed(granularity: str):
+    """
+    Check if every candle of the given granularity has the same length
+    :param granularity: an OANDA candlestick granularity, e.g. 'M1'
+    :returns: bool
+    """
+    return granularity != 'M'
@@ -0,0 +1,261 @@
+import datetime as dt
+import numpy as np
+from algotradingstuff.data.candleframe import CandleFrame
+from algotradingstuff.data.granularity import granularity_seconds, is_fixed
+from algotradingstuff.data.timeutils import NS_PER_SECOND, to_ns
+
+try:
+    import zoneinfo
+except ImportError:  # pragma: no cover - Python 3.8 and older
+    try:
+        from backports import zoneinfo
+    except ImportError:
+        zoneinfo = None
+
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+_DAY = 86400 * NS_PER_SECOND
+# How many days either side of a time the day starts are looked up for, enough to find the start and end
+# of the candle it falls in
+_MARGINS = {'W': 9, 'M': 33}
+
+
+class Alignment:
+    """
+    This class finds the candle a time falls in the way OANDA does. Candles of an hour or less start on
+    multiples of their length since the epoch. Longer candles start at `daily_alignment` o'clock in
+    `timezone`, so they follow its daylight saving, weekly candles start on `weekly_alignment`, and
+    monthly candles start with the daily candle holding midnight at the start of the month.
+    """
+
+    def __init__(self, daily_alignment: int = 17, timezone: str = 'America/New_York',
+                 weekly_alignment: str = 'Friday'):
+        """
+
+        :param daily_alignment: the hour of the day, in `timezone`, daily candles start at
+        :param timezone: the timezone of `daily_alignment`, e.g. 'Europe/London'
+        :param weekly_alignment: the day of the week weekly candles start on, e.g. 'Monday'
+        :raises: ValueError
+        """
+        if not 0 <= daily_alignment <= 23:
+            raise ValueError('daily_alignment must be between 0 and 23')
+        if weekly_alignment not in WEEKDAYS:
+            raise ValueError(f'unknown weekday: {weekly_alignment}')
+        self.daily_alignment = daily_alignment
+        self.timezone = timezone
+        self.weekly_alignment = weekly_alignment
+        self._zone = None
+        # the start of the daily candle of each day, by days since the epoch
+        self._day_starts = {}
+
+    def _day_start(self, day: int):
+        start = self._day_starts.get(day)
+        if start is None:
+            if self._zone is None:
+                if zoneinfo is None:
+                    raise ImportError('candles longer than an hour need zoneinfo, or backports.zoneinfo before Python 3.9')
+                self._zone = zoneinfo.ZoneInfo(self.timezone)
+            date = dt.date(1970, 1, 1) + dt.timedelta(days=day)
+            start = self._day_starts[day] = to_ns(dt.datetime(date.year, date.month, date.day, self.daily_alignment,
+                                                              tzinfo=self._zone))
+        return start
+
+    def _starts(self, first: int, last: int, granularity: str):
+        margin = _MARGINS.get(granularity, 2)
+        days = np.arange(first // _DAY - margin, last // _DAY + margin + 1)
+        if granularity == 'W':
+            # 1970-01-01 was a Thursday
+            days = days[(days + 3) % 7 == WEEKDAYS.index(self.weekly_alignment)]
+        elif granularity == 'M':
+            # the candle holding midnight starts the day before, unless candles start at midnight
+            dates = (days + (self.daily_alignment > 0)).astype('datetime64[D]')
+            days = days[dates == dates.astype('datetime64[M]')]
+        return np.fromiter(map(self._day_start, days.tolist()), dtype=np.int64, count=len(days))
+
+    def bounds(self, times, granularity: str):
+        """
+        Find the candle each time falls in
+        :param times: nanoseconds since the epoch
+        :param granularity: interval of the candles
+        :returns: tuple[numpy.ndarray, numpy.ndarray], the start and end of each time's candle
+        :raises: ValueError
+        """
+        times = np.asarray(times, dtype=np.int64)
+        length = granularity_seconds(granularity) * NS_PER_SECOND
+        if length <= 3600 * NS_PER_SECOND:
+            starts = times - times % length
+            return starts, starts + length
+        if len(times) == 0:
+            return times.copy(), times.copy()
+        day_starts = self._starts(int(times.min()), int(times.max()), granularity if granularity in _MARGINS else 'D')
+        position = np.searchsorted(day_starts, times, side='right') - 1
+        starts, ends = day_starts[position], day_starts[position + 1]
+        if length < _DAY:
+            # the last candle of a day cut short by daylight saving ends early
+            starts = starts + (times - starts) // length * length
+            ends = np.minimum(starts + length, ends)
+        return starts, ends
+
+    def bucket(self, time: int, granularity: str):
+        """
+        Find the candle one time falls in
+        :param time: nanoseconds since the epoch
+        :param granularity: interval of the candle
+        :returns: tuple[int, int], the start and end of the candle
+        """
+        length = granularity_seconds(granularity) * NS_PER_SECOND
+        if length <= 3600 * NS_PER_SECOND:
+            start = time - time % length
+            return start, start + length
+        starts, ends = self.bounds([time], granularity)
+        return int(starts[0]), int(ends[0])
+
+
+# The alignment of OANDA's candles when none is asked for
+OANDA_ALIGNMENT = Alignment()
+
+
+def _check(source: str, granularity: str):
+    length = granularity_seconds(granularity)
+    if source is None:
+        return
+    source_length = granularity_seconds(source)
+    # weekly and monthly candles start with a daily candle, shorter ones on a multiple of the source
+    whole = 86400 if granularity in ('W', 'M') else length
+    if not is_fixed(source) or source_length > length or whole % source_length:
+        raise ValueError(f'cannot resample {source} candles to {granularity}')
+
+
+def _groups(frame: CandleFrame, granularity: str, alignment: Alignment):
+    starts, ends = alignment.bounds(frame.time, granularity)
+    first = np.flatnonzero(starts[1:] != starts[:-1]) + 1
+    first = np.concatenate(([0], first))
+    return first, starts[first], ends[first]
+
+
+def resample(frame: CandleFrame, granularity: str, alignment: Alignment = None):
+    """
+    Build coarser candles from finer ones, e.g. H1 candles from M1 candles. A candle is complete when
+    every candle it was built from is, and the last one reaches its end, or a later candle exists.
+    :param frame: the candles to build from, sorted by time
+    :param granularity: interval of the candles to build
+    :param alignment: how candles are aligned. Defaults to `OANDA_ALIGNMENT`
+    :returns: CandleFrame
+    :raises: ValueError
+    """
+    _check(frame.granularity, granularity)
+    if len(frame) == 0:
+        return CandleFrame.empty(instrument=frame.instrument, granularity=granularity)
+    first, starts, ends = _groups(frame, granularity, alignment or OANDA_ALIGNMENT)
+    last = np.append(first[1:] - 1, len(frame) - 1)
+    complete = np.logical_and.reduceat(frame.complete, first)
+    if frame.granularity is None or \
+            frame.time[-1] + granularity_seconds(frame.granularity) * NS_PER_SECOND < ends[-1]:
+        complete[-1] = False
+    return CandleFrame(starts, frame.open[first], np.maximum.reduceat(frame.high, first),
+                       np.minimum.reduceat(frame.low, first), frame.close[last],
+                       np.add.reduceat(frame.volume, first), complete, instrument=frame.instrument,
+                       granularity=granularity)
+
+
+class Resampler:
+    """
+    This class builds coarser candles from finer ones as they arrive, e.g. to keep M5, H1 and D candles
+    of an instrument up to date from its M1 candles.
+    """
+
+    def __init__(self, source: str, granularities: list, alignment: Alignment = None):
+        """
+
+        :param source: interval of the candles that are added
+        :param granularities: the intervals to build candles for
+        :param alignment: how candles are aligned. Defaults to `OANDA_ALIGNMENT`
+        :raises: ValueError
+        """
+        for granularity in granularities:
+            _check(source, granularity)
+        self.source = source
+        self.alignment = alignment or OANDA_ALIGNMENT
+        self._length = granularity_seconds(source) * NS_PER_SECOND
+        # the candle being built for each granularity, as [time, open, high, low, close, volume, end]
+        self._current = dict.fromkeys(granularities)
+        self._last = None
+
+    def current(self, granularity: str):
+        """
+        Get the candle that is being built
+        :param granularity: interval of the candle
+        :returns: CandleFrame of one incomplete candle, or of none
+        """
+        return self._frame([self._current[granularity]] if self._current[granularity] else [], False,
+                           granularity)
+
+    def _frame(self, rows: list, complete: bool, granularity: str):
+        if not rows:
+            return CandleFrame.empty(granularity=granularity)
+        columns = list(zip(*rows))
+        return CandleFrame(*columns[:6], [complete] * len(rows), granularity=granularity)
+
+    def update(self, frame: CandleFrame):
+        """
+        Add complete candles, newer than any added before
+        :param frame: candles of the source granularity, sorted by time
+        :returns: dict[str, CandleFrame], the candles these completed, for each granularity that completed any
+        :raises: ValueError
+        """
+        if len(frame) == 0:
+            return {}
+        if self._last is not None and frame.time[0] <= self._last:
+            raise ValueError('candles must be newer than the ones already added')
+        self._last = int(frame.time[-1])
+        reached = self._last + self._length
+        completed = {}
+        for granularity, current in self._current.items():
+            if current is not None and self._last < current[6]:
+                # the common case of a few candles inside the one being built needs no alignment
+                current[2] = max(current[2], float(frame.high.max()))
+                current[3] = min(current[3], float(frame.low.min()))
+                current[4] = float(frame.close[-1])
+                current[5] += int(frame.volume.sum())
+                rows = []
+            else:
+                rows = self._fold(frame, granularity, current)
+            current = rows.pop() if rows else self._current[granularity]
+            if current is not None and reached >= current[6]:
+                rows.append(current)
+                current = None
+            self._current[granularity] = current
+            if rows:
+                completed[granularity] = self._frame(rows, True, granularity)
+        return completed
+
+    def _fold(self, frame: CandleFrame, granularity: str, current: list):
+        first, starts, ends = _groups(frame, granularity, self.alignment)
+        last = np.append(first[1:] - 1, len(frame) - 1)
+        rows = [list(row) for row in zip(starts.tolist(), frame.open[first].tolist(),
+                                          np.maximum.reduceat(frame.high, first).tolist(),
+                                          np.minimum.reduceat(frame.low, first).tolist(),
+                                          frame.close[last].tolist(),
+                                          np.add.reduceat(frame.volume, first).tolist(), ends.tolist())]
+        if current is not None:
+            if rows[0][0] == current[0]:
+                rows[0] = [current[0], current[1], max(current[2], rows[0][2]), min(current[3], rows[0][3]),
+                           rows[0][4], current[5] + rows[0][5], current[6]]
+            else:
+                rows.insert(0, current)
+        return rows
+
+    def close(self, time):
+        """
+        Complete every candle whose interval ended before the given time, e.g. when no candles are
+        made over a weekend
+        :param time: a datetime or nanoseconds since the epoch
+        :returns: dict[str, CandleFrame], the candles completed, for each granularity that completed any
+        """
+        time = to_ns(time)
+        completed = {}
+        for granularity, current in self._current.items():
+            if current is not None and time >= current[6]:
+                completed[granularity] = self._frame([current], True, granularity)
+                self._current[granularity] = None
+        return completed
@@ -0,0 +1,105 @@
+import datetime as dt
+import math
+import numbers
+import numpy as np
+from algotradingstuff.data.granularity import granularity_seconds
+
+NS_PER_SECOND = 1_000_000_000
+# The date string format `OandaAccount` has always accepted, read in local time
+LEGACY_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_EPOCH = dt.datetime(1970, 1, 1, tzinfo=dt.timezone.utc)
+_UNITS = {'s': NS_PER_SECOND, 'ms': 1_000_000, 'us': 1_000, 'ns': 1}
+
+
+def parse_times(times: list):
+    """
+    Convert times, in either the UNIX or RFC3339 format, to nanoseconds since the epoch
+    :param times: a list of time strings as sent by the API
+    :returns: numpy.ndarray of int64
+    """
+    if len(times) == 0:
+        return np.empty(0, dtype=np.int64)
+    if not isinstance(times[0], str):
+        return np.round(np.asarray(times, dtype=np.float64) * 1e9).astype(np.int64)
+    if 'T' in times[0]:
+        return np.array([t.rstrip('Z') for t in times], dtype='datetime64[ns]').view(np.int64)
+    if all(t[-10:-9] == '.' for t in times):
+        # the API sends exactly 9 fractional digits, so dropping the point leaves nanoseconds
+        return np.fromiter(map(int, (t.replace('.', '') for t in times)), dtype=np.int64, count=len(times))
+    return np.fromiter(map(_unix_ns, times), dtype=np.int64, count=len(times))
+
+
+def parse_time(time: str):
+    """
+    Convert one time, in either the UNIX or RFC3339 format, to nanoseconds since the epoch
+    :param time: a time string as sent by the API
+    :returns: int
+    """
+    if 'T' in time:
+        return int(parse_times([time])[0])
+    return _unix_ns(time)
+
+
+def _unix_ns(time: str):
+    seconds, _, fraction = time.partition('.')
+    return int(seconds) * NS_PER_SECOND + int(fraction[:9].ljust(9, '0'))
+
+
+def to_ns(time, unit: str = 'ns'):
+    """
+    Convert a point in time to nanoseconds since the epoch. Datetimes without a timezone are taken to be UTC.
+    :param time: a datetime, date, numpy.datetime64, number since the epoch in `unit`, or string. Strings
+    may be RFC3339 or UNIX times as sent by the API, or 'yyyy-mm-dd hh:mm:ss', which is read in local time
+    as it always has been
+    :param unit: the unit of numbers, 's', 'ms', 'us' or 'ns'
+    :returns: int
+    """
+    if isinstance(time, dt.datetime):
+        if time.tzinfo is None:
+            time = time.replace(tzinfo=dt.timezone.utc)
+        delta = time - _EPOCH
+        return (delta.days * 86400 + delta.seconds) * NS_PER_SECOND + delta.microseconds * 1000
+    if isinstance(time, dt.date):
+        return to_ns(dt.datetime(time.year, time.month, time.day))
+    if isinstance(time, np.datetime64):
+        return int(time.astype('datetime64[ns]').astype(np.int64))
+    if isinstance(time, str):
+        if 'T' in time or (time[:1].isdigit() and '-' not in time):
+            return parse_time(time)
+        return to_ns(dt.datetime.strptime(time, LEGACY_FORMAT).astimezone())
+    if isinstance(time, numbers.Integral):
+        return int(time) * _UNITS[unit]
+    if isinstance(time, numbers.Real):
+        # scaling the whole float would round away the nanoseconds of present day times
+        whole = math.floor(time)
+        return whole * _UNITS[unit] + round((time - whole) * _UNITS[unit])
+    raise TypeError(f'cannot convert {type(time).__name__} to a time')
+
+
+def to_unix_string(time, unit: str = 'ns'):
+    """
+    Format a point in time as the API's UNIX time, exactly, e.g. '1500000000.000000000'
+    :param time: anything `to_ns` accepts
+    :param unit: the unit of numbers, see `to_ns`
+    :returns: str
+    """
+    ns = to_ns(time, unit)
+    return f'{ns // NS_PER_SECOND}.{ns % NS_PER_SECOND:09d}'
+
+
+def align(ns: int, granularity: str, ceil: bool = False):
+    """
+    Move a time onto the start of the candle of `granularity` it falls in, or the next one. Candles longer
+    than an hour start at the account's daily alignment, which moves with daylight saving in New York,
+    so times are left alone for them.
+    :param ns: nanoseconds since the epoch
+    :param granularity: interval of the candles
+    :param ceil: if True move forward to the next candle start, unless `ns` is one already
+    :returns: int
+    """
+    length = granularity_seconds(granularity)
+    if length > 3600:
+        return ns
+    length *= NS_PER_SECOND
+    return -(-ns // length) * length if ceil else ns // length * length
@@ -0,0 +1,208 @@
+import json
+import mmap
+import os
+import numpy as np
+from algotradingstuff.sessions import OandaSession, TokenBucket, send_all
+from algotradingstuff.data.cache import locked
+from algotradingstuff.data.timeutils import parse_time, to_ns
+from algotradingstuff.data.errors import TransactionSyncError
+
+# The index entry of one stored transaction. Instruments and types are stored as codes into the lists kept
+# with the index, -1 when the transaction has none.
+INDEX = np.dtype([('id', '<i8'), ('time', '<i8'), ('offset', '<i8'), ('length', '<i4'), ('instrument', '<i4'),
+                  ('type', '<i2')])
+# The most transactions the API returns for one ID range
+PAGE_SIZE = 1000
+
+
+class TransactionStore:
+    """
+    This class keeps an account's transaction history on disk. Transactions are appended, in ID order, to a
+    file of JSON lines, and a fixed size index of their ID, time, instrument and type is kept beside it,
+    so queries only parse the transactions they return.
+    """
+
+    def __init__(self, directory: str, account_id: str):
+        """
+
+        :param directory: where the store files are kept. It is made if it doesn't exist
+        :param account_id: the ID of the account the transactions belong to
+        """
+        self.directory = directory
+        self.account_id = account_id
+        self._path = os.path.join(directory, account_id)
+        os.makedirs(directory, exist_ok=True)
+
+    def _read_meta(self):
+        try:
+            with open(f'{self._path}.json', 'r') as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return {'count': 0, 'bytes': 0, 'last_id': 0, 'instruments': [], 'types': []}
+
+    def _write_meta(self, meta: dict):
+        with open(f'{self._path}.json.tmp', 'w') as fh:
+            json.dump(meta, fh)
+        os.replace(f'{self._path}.json.tmp', f'{self._path}.json')
+
+    def _index(self):
+        with locked(f'{self._path}.lock', exclusive=False):
+            meta = self._read_meta()
+            if meta['count'] == 0:
+                return np.empty(0, dtype=INDEX), meta
+            return np.memmap(f'{self._path}.idx', dtype=INDEX, mode='r', shape=(meta['count'],)), meta
+
+    @property
+    def last_id(self):
+        """
+        The ID of the most recent transaction in the store, 0 if it is empty
+        :returns: int
+        """
+        return self._index()[1]['last_id']
+
+    def __len__(self):
+        return self._index()[1]['count']
+
+    def append(self, transactions: list):
+        """
+        Add transactions to the store. Transactions it already holds are skipped.
+        :param transactions: transaction dicts, as returned by the API
+        :returns: int, how many transactions were added
+        """
+        with locked(f'{self._path}.lock', exclusive=True):
+            meta = self._read_meta()
+            transactions = sorted((t for t in transactions if int(t['id']) > meta['last_id']), key=lambda t: int(t['id']))
+            if not transactions:
+                return 0
+            codes = {name: {value: code for code, value in enumerate(meta[name])} for name in ('instruments', 'types')}
+            index = np.empty(len(transactions), dtype=INDEX)
+            lines = []
+            offset = meta['bytes']
+            for i, transaction in enumerate(transactions):
+                line = json.dumps(transaction, separators=(',', ':')).encode() + b'\n'
+                instrument = transaction.get('instrument')
+                if instrument is not None and instrument not in codes['instruments']:
+                    codes['instruments'][instrument] = len(meta['instruments'])
+                    meta['instruments'].append(instrument)
+                kind = transaction.get('type')
+                if kind is not None and kind not in codes['types']:
+                    codes['types'][kind] = len(meta['types'])
+                    meta['types'].append(kind)
+                index[i] = (int(transaction['id']), parse_time(transaction['time']) if 'time' in transaction else 0,
+                            offset, len(line) - 1, codes['instruments'].get(instrument, -1),
+                            codes['types'].get(kind, -1))
+                lines.append(line)
+                offset += len(line)
+            # anything past the recorded sizes is from a write that didn't finish, so it is overwritten
+            with open(f'{self._path}.jsonl', 'ab') as fh:
+                fh.seek(meta['bytes'])
+                fh.truncate()
+                fh.write(b''.join(lines))
+            with open(f'{self._path}.idx', 'ab') as fh:
+                fh.seek(meta['count'] * INDEX.itemsize)
+                fh.truncate()
+                fh.write(index.tobytes())
+            meta['count'] += len(transactions)
+            meta['bytes'] = offset
+            meta['last_id'] = int(index['id'][-1])
+            self._write_meta(meta)
+        return len(transactions)
+
+    def _load(self, entries):
+        if len(entries) == 0:
+            return []
+        with open(f'{self._path}.jsonl', 'rb') as fh:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return [json.loads(data[offset:offset + length])
+                        for offset, length in zip(entries['offset'].tolist(), entries['length'].tolist())]
+
+    def get(self, transaction_id: str):
+        """
+        Get one transaction
+        :param transaction_id: the ID of the transaction
+        :returns: dict, or None if the store doesn't hold it
+        """
+        index, _ = self._index()
+        position = np.searchsorted(index['id'], int(transaction_id))
+        if position == len(index) or index['id'][position] != int(transaction_id):
+            return None
+        return self._load(index[position:position + 1])[0]
+
+    def query(self, instrument: str = None, types=None, start=None, end=None, since_id: str = None):
+        """
+        Find stored transactions, e.g. `store.query('EUR_USD', 'ORDER_FILL', start=dt.datetime(2020, 1, 1))`
+        :param instrument: only transactions for this instrument
+        :param types: only transactions of this type, or of any of these types
+        :param start: a datetime or nanoseconds since the epoch. Only transactions at or after it
+        :param end: a datetime or nanoseconds since the epoch. Only transactions before it
+        :param since_id: only transactions after the one with this ID
+        :returns: list[dict], in ID order
+        """
+        index, meta = self._index()
+        mask = np.ones(len(index), dtype=bool)
+        if since_id is not None:
+            mask[:np.searchsorted(index['id'], int(since_id), side='right')] = False
+        if start is not None:
+            mask &= index['time'] >= to_ns(start)
+        if end is not None:
+            mask &= index['time'] < to_ns(end)
+        if instrument is not None:
+            if instrument not in meta['instruments']:
+                return []
+            mask &= index['instrument'] == meta['instruments'].index(instrument)
+        if types is not None:
+            types = [types] if isinstance(types, str) else types
+            mask &= np.isin(index['type'], [meta['types'].index(kind) for kind in types if kind in meta['types']])
+        return self._load(index[mask])
+
+
+def sync_transactions(account, store: TransactionStore, session: OandaSession = None, max_workers: int = 4,
+                      page_size: int = PAGE_SIZE, rate: float = 100.0, burst: float = None):
+    """
+    Download the transactions made since the store was last synced. The first page is asked for with the ID
+    of the last transaction in the store, or, for an empty store, the ID of the account's last transaction is
+    read from its summary. Any further missing IDs are split into pages, which are fetched concurrently.
+    :param account: the `OandaAccount` used to build the transaction requests
+    :param store: where the transactions are kept
+    :param session: the session used to send the requests. A new one is made, and closed, if not given
+    :param max_workers: the most requests in flight at once
+    :param page_size: the most transactions asked for in one request, at most 1000
+    :param rate: the most requests sent per second, or `None` to not limit the rate
+    :param burst: how many requests may be sent at once before `rate` applies. Defaults to `rate`
+    :returns: int, how many transactions were added to the store
+    :raises: TransactionSyncError
+    """
+    own_session = session is None
+    if own_session:
+        session = OandaSession(pool_size=max_workers)
+    limiter = TokenBucket(rate, burst) if rate else None
+    added = 0
+    try:
+        last_id = store.last_id
+        if last_id:
+            content, last_transaction_id = session.send(account.get_transactions_since(str(last_id)))
+        else:
+            content, last_transaction_id = session.send(account.get_summary())
+        if last_transaction_id is None or (last_id and 'transactions' not in content):
+            raise TransactionSyncError(f'failed to get the last transaction of account with ID: {account.id}.' +
+                                       os.linesep + f'Reason {content.get("errorMessage", "")}')
+        if last_id:
+            added += store.append(content['transactions'])
+        pages = [(first, min(first + page_size - 1, int(last_transaction_id)))
+                 for first in range(store.last_id + 1, int(last_transaction_id) + 1, page_size)]
+        requests = [account.get_transactions_by_id(str(first), str(last)) for first, last in pages]
+        results = send_all(session, requests, max_workers=max_workers, limiter=limiter)
+    finally:
+        if own_session:
+            session.close()
+
+    for (first, last), result in zip(pages, results):
+        # pages are stored in order, so a failed page leaves the store at a point the next sync can resume from
+        if isinstance(result, Exception):
+            raise TransactionSyncError(f'failed to get transactions {first} to {last}') from result
+        content, _ = result
+        if 'transactions' not in content:
+            raise TransactionSyncError(f'failed to get transactions {first} to {last}.' + os.linesep +
+                                       f'Reason {content.get("errorMessage", "")}')
+        added += store.append(content['transactions'])
+    return added
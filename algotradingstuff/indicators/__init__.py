@@ -0,0 +1,17 @@
+from .vectorized import sma
+from .vectorized import ema
+from .vectorized import rsi
+from .vectorized import true_range
+from .vectorized import atr
+from .vectorized import bollinger
+from .vectorized import macd
+from .vectorized import zscore
+from .vectorized import vwap
+from .incremental import SMA
+from .incremental import EMA
+from .incremental import RSI
+from .incremental import ATR
+from .incremental import Bollinger
+from .incremental import MACD
+from .incremental import ZScore
+from .incremental import VWAP
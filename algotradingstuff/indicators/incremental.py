@@ -0,0 +1,242 @@
+import math
+from collections import deque
+
+NAN = float('nan')
+
+
+class SMA:
+    """
+    Simple moving average updated one value at a time
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self._values = deque()
+        self._total = 0.0
+
+    def update(self, value: float):
+        """
+        Add a value
+        :param value: the newest value
+        :returns: float, the average, NaN until `window` values have been seen
+        """
+        self._values.append(value)
+        self._total += value
+        if len(self._values) > self.window:
+            self._total -= self._values.popleft()
+        return self._total / self.window if len(self._values) == self.window else NAN
+
+
+class EMA:
+    """
+    Exponential moving average updated one value at a time, seeded with the first value
+    """
+
+    def __init__(self, span: int = None, alpha: float = None):
+        """
+
+        :param span: the span of the average, alpha = 2 / (span + 1)
+        :param alpha: the smoothing factor, instead of `span`
+        """
+        self.alpha = alpha if alpha is not None else 2.0 / (span + 1)
+        self.value = NAN
+
+    def update(self, value: float):
+        """
+        Add a value
+        :param value: the newest value
+        :returns: float, the average
+        """
+        if self.value != self.value:
+            self.value = value
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+
+class _Wilder:
+    # Wilder's smoothing, seeded with the mean of the first `window` values
+
+    def __init__(self, window: int):
+        self.window = window
+        self.count = 0
+        self.value = 0.0
+
+    def update(self, value: float):
+        if self.count < self.window:
+            self.count += 1
+            self.value += (value - self.value) / self.count
+            return self.value if self.count == self.window else NAN
+        self.value += (value - self.value) / self.window
+        return self.value
+
+
+class RSI:
+    """
+    Relative strength index with Wilder's smoothing, updated one close at a time
+    """
+
+    def __init__(self, window: int = 14):
+        self._gain = _Wilder(window)
+        self._loss = _Wilder(window)
+        self._prev = None
+
+    def update(self, close: float):
+        """
+        Add a close price
+        :param close: the newest close price
+        :returns: float, the RSI, NaN for the first `window` closes
+        """
+        prev, self._prev = self._prev, close
+        if prev is None:
+            return NAN
+        change = close - prev
+        gain = self._gain.update(max(change, 0.0))
+        loss = self._loss.update(max(-change, 0.0))
+        if gain != gain:
+            return NAN
+        return 100.0 if loss == 0.0 else 100.0 - 100.0 / (1.0 + gain / loss)
+
+
+class ATR:
+    """
+    Average true range with Wilder's smoothing, updated one candle at a time
+    """
+
+    def __init__(self, window: int = 14):
+        self._average = _Wilder(window)
+        self._prev_close = None
+
+    def update(self, high: float, low: float, close: float):
+        """
+        Add a candle
+        :param high: the high price
+        :param low: the low price
+        :param close: the close price
+        :returns: float, the ATR, NaN until `window` candles have been seen
+        """
+        tr = high - low
+        if self._prev_close is not None:
+            tr = max(tr, abs(high - self._prev_close), abs(low - self._prev_close))
+        self._prev_close = close
+        return self._average.update(tr)
+
+
+class _RollingStats:
+    # Rolling mean and population standard deviation, shifted by the first value for accuracy
+
+    def __init__(self, window: int):
+        self.window = window
+        self._values = deque()
+        self._shift = None
+        self._total = 0.0
+        self._squares = 0.0
+
+    def update(self, value: float):
+        if self._shift is None:
+            self._shift = value
+        value -= self._shift
+        self._values.append(value)
+        self._total += value
+        self._squares += value * value
+        if len(self._values) > self.window:
+            old = self._values.popleft()
+            self._total -= old
+            self._squares -= old * old
+        if len(self._values) < self.window:
+            return NAN, NAN
+        mean = self._total / self.window
+        return mean + self._shift, math.sqrt(max(self._squares / self.window - mean * mean, 0.0))
+
+
+class Bollinger:
+    """
+    Bollinger bands updated one close at a time
+    """
+
+    def __init__(self, window: int = 20, k: float = 2.0):
+        self.k = k
+        self._stats = _RollingStats(window)
+
+    def update(self, close: float):
+        """
+        Add a close price
+        :param close: the newest close price
+        :returns: tuple[float, float, float], the middle, upper and lower bands
+        """
+        mean, std = self._stats.update(close)
+        return mean, mean + self.k * std, mean - self.k * std
+
+
+class MACD:
+    """
+    Moving average convergence divergence updated one close at a time
+    """
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self._fast = EMA(fast)
+        self._slow = EMA(slow)
+        self._signal = EMA(signal)
+
+    def update(self, close: float):
+        """
+        Add a close price
+        :param close: the newest close price
+        :returns: tuple[float, float, float], the MACD line, signal line and histogram
+        """
+        line = self._fast.update(close) - self._slow.update(close)
+        signal = self._signal.update(line)
+        return line, signal, line - signal
+
+
+class ZScore:
+    """
+    Rolling z-score updated one value at a time
+    """
+
+    def __init__(self, window: int):
+        self._stats = _RollingStats(window)
+
+    def update(self, value: float):
+        """
+        Add a value
+        :param value: the newest value
+        :returns: float, the z-score, NaN until `window` values have been seen or where the deviation is 0
+        """
+        mean, std = self._stats.update(value)
+        return (value - mean) / std if std > 0.0 else NAN
+
+
+class VWAP:
+    """
+    Volume weighted average price updated one value at a time
+    """
+
+    def __init__(self, window: int = None):
+        """
+
+        :param window: the number of values averaged. `None` averages everything so far
+        """
+        self.window = window
+        self._values = deque()
+        self._weighted = 0.0
+        self._volume = 0.0
+
+    def update(self, price: float, volume: float):
+        """
+        Add a price and its volume
+        :param price: the price, e.g. the typical price of a candle
+        :param volume: the volume
+        :returns: float, the VWAP
+        """
+        self._weighted += price * volume
+        self._volume += volume
+        if self.window is not None:
+            self._values.append((price * volume, volume))
+            if len(self._values) > self.window:
+                weighted, volume = self._values.popleft()
+                self._weighted -= weighted
+                self._volume -= volume
+            if len(self._values) < self.window:
+                return NAN
+        return self._weighted / self._volume if self._volume else NAN
@@ -0,0 +1,185 @@
+import numpy as np
+
+# The smallest weight used inside one block of `_ewm`, so the scaled values stay well inside float64's range
+_MIN_WEIGHT_LOG = -230.0
+
+
+def _ewm(x, alpha: float, start: int = 0, initial=None):
+    """
+    Exponentially weighted mean along the last axis, y[t] = alpha * x[t] + (1 - alpha) * y[t - 1].
+    The recursion is solved in blocks with a cumulative sum, so it is vectorized over time as well as rows.
+    :param x: the values
+    :param alpha: the smoothing factor
+    :param start: the index of the first output, earlier outputs are NaN
+    :param initial: the output at `start`. Defaults to `x[..., start]`
+    :returns: numpy.ndarray
+    """
+    x = np.asarray(x, dtype=np.float64)
+    out = np.full(x.shape, np.nan)
+    n = x.shape[-1]
+    if start >= n:
+        return out
+    decay = 1.0 - alpha
+    prev = np.array(x[..., start] if initial is None else initial, dtype=np.float64)
+    out[..., start] = prev
+    if decay == 0.0:
+        out[..., start + 1:] = x[..., start + 1:]
+        return out
+    block = max(1, int(_MIN_WEIGHT_LOG / np.log(decay)))
+    i = start + 1
+    while i < n:
+        j = min(n, i + block)
+        weights = decay ** np.arange(1, j - i + 1)
+        out[..., i:j] = weights * (prev[..., None] + np.cumsum(x[..., i:j] * (alpha / weights), axis=-1))
+        prev = out[..., j - 1]
+        i = j
+    return out
+
+
+def _rolling_sum(x, window: int):
+    x = np.asarray(x, dtype=np.float64)
+    out = np.full(x.shape, np.nan)
+    if window > x.shape[-1]:
+        return out
+    total = np.cumsum(x, axis=-1)
+    out[..., window - 1] = total[..., window - 1]
+    out[..., window:] = total[..., window:] - total[..., :-window]
+    return out
+
+
+def _rolling_mean_std(x, window: int):
+    x = np.asarray(x, dtype=np.float64)
+    # shifting by the first value keeps the sum of squares from cancelling catastrophically
+    shifted = x - x[..., :1]
+    mean = _rolling_sum(shifted, window) / window
+    var = np.maximum(_rolling_sum(shifted * shifted, window) / window - mean * mean, 0.0)
+    return mean + x[..., :1], np.sqrt(var)
+
+
+def sma(x, window: int):
+    """
+    Simple moving average
+    :param x: the values, with time along the last axis
+    :param window: the number of values averaged
+    :returns: numpy.ndarray, NaN until `window` values have been seen
+    """
+    return _rolling_sum(x, window) / window
+
+
+def ema(x, span: int):
+    """
+    Exponential moving average, seeded with the first value
+    :param x: the values, with time along the last axis
+    :param span: the span of the average, alpha = 2 / (span + 1)
+    :returns: numpy.ndarray
+    """
+    return _ewm(x, 2.0 / (span + 1))
+
+
+def rsi(close, window: int = 14):
+    """
+    Relative strength index with Wilder's smoothing
+    :param close: the close prices, with time along the last axis
+    :param window: the smoothing window
+    :returns: numpy.ndarray, NaN for the first `window` values
+    """
+    close = np.asarray(close, dtype=np.float64)
+    change = np.diff(close, axis=-1)
+    gain = np.maximum(change, 0.0)
+    loss = np.maximum(-change, 0.0)
+    out = np.full(close.shape, np.nan)
+    if window > change.shape[-1]:
+        return out
+    avg_gain = _ewm(gain, 1.0 / window, window - 1, gain[..., :window].mean(axis=-1))
+    avg_loss = _ewm(loss, 1.0 / window, window - 1, loss[..., :window].mean(axis=-1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[..., 1:] = np.where(avg_loss == 0.0, 100.0, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+    return out
+
+
+def true_range(high, low, close):
+    """
+    True range, the first value is high - low
+    :param high: the high prices, with time along the last axis
+    :param low: the low prices
+    :param close: the close prices
+    :returns: numpy.ndarray
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    tr = high - low
+    prev = close[..., :-1]
+    tr[..., 1:] = np.maximum(tr[..., 1:], np.maximum(np.abs(high[..., 1:] - prev), np.abs(low[..., 1:] - prev)))
+    return tr
+
+
+def atr(high, low, close, window: int = 14):
+    """
+    Average true range with Wilder's smoothing, seeded with the mean of the first `window` true ranges
+    :param high: the high prices, with time along the last axis
+    :param low: the low prices
+    :param close: the close prices
+    :param window: the smoothing window
+    :returns: numpy.ndarray, NaN until `window` values have been seen
+    """
+    tr = true_range(high, low, close)
+    if window > tr.shape[-1]:
+        return np.full(tr.shape, np.nan)
+    return _ewm(tr, 1.0 / window, window - 1, tr[..., :window].mean(axis=-1))
+
+
+def bollinger(close, window: int = 20, k: float = 2.0):
+    """
+    Bollinger bands, using the population standard deviation
+    :param close: the close prices, with time along the last axis
+    :param window: the number of values in the moving average
+    :param k: how many standard deviations the bands are from the average
+    :returns: tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray], the middle, upper and lower bands
+    """
+    mean, std = _rolling_mean_std(close, window)
+    return mean, mean + k * std, mean - k * std
+
+
+def macd(close, fast: int = 12, slow: int = 26, signal: int = 9):
+    """
+    Moving average convergence divergence
+    :param close: the close prices, with time along the last axis
+    :param fast: the span of the fast EMA
+    :param slow: the span of the slow EMA
+    :param signal: the span of the EMA of the MACD line
+    :returns: tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray], the MACD line, signal line and histogram
+    """
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+
+def zscore(x, window: int):
+    """
+    Rolling z-score, the distance from the moving average in standard deviations
+    :param x: the values, with time along the last axis
+    :param window: the number of values in the moving average
+    :returns: numpy.ndarray, NaN until `window` values have been seen or where the deviation is 0
+    """
+    mean, std = _rolling_mean_std(x, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(std > 0.0, (np.asarray(x, dtype=np.float64) - mean) / std, np.nan)
+
+
+def vwap(price, volume, window: int = None):
+    """
+    Volume weighted average price
+    :param price: the prices, e.g. the typical price (high + low + close) / 3, with time along the last axis
+    :param volume: the volumes
+    :param window: the number of values averaged. `None` averages everything so far
+    :returns: numpy.ndarray
+    """
+    price = np.asarray(price, dtype=np.float64)
+    volume = np.asarray(volume, dtype=np.float64)
+    if window is None:
+        weighted, total = np.cumsum(price * volume, axis=-1), np.cumsum(volume, axis=-1)
+    else:
+        weighted, total = _rolling_sum(price * volume, window), _rolling_sum(volume, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return weighted / total
@@ -0,0 +1,2 @@
+from .engine import RiskEngine
+from .errors import RiskError
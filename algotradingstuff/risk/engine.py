@@ -0,0 +1,310 @@
+import math
+import os
+import numpy as np
+from algotradingstuff.risk.errors import RiskError
+
+# The per-instrument arrays, one row per instrument
+_COLUMNS = ('long_units', 'long_price', 'short_units', 'short_price', 'bid', 'ask', 'positive_factor',
+            'negative_factor', 'margin_rate', 'pl', 'margin')
+
+
+def _limit(limit, instrument: str):
+    if isinstance(limit, dict):
+        return limit.get(instrument, math.inf)
+    return math.inf if limit is None else limit
+
+
+def _number(value, default=0.0):
+    return default if value is None else float(value)
+
+
+class RiskEngine:
+    """
+    This class keeps an account's exposure, unrealized profit and loss and margin as NumPy arrays with one
+    row per instrument. A price tick revalues only its instrument's row and adjusts the totals by the
+    difference, so the totals are always current and checking an order before it is sent takes a few
+    microseconds. Amounts are in the account's home currency when prices carry their
+    `quoteHomeConversionFactors`, and in the quote currency otherwise.
+    """
+
+    def __init__(self, balance: float = 0.0, margin_rate: float = 0.02, margin_rates: dict = None,
+                 hedging: bool = False, max_order_units=None, max_position_units=None,
+                 max_margin_ratio: float = None):
+        """
+
+        :param balance: the account balance
+        :param margin_rate: the fraction of a position's value needed as margin
+        :param margin_rates: the margin rate of instruments that don't use `margin_rate`
+        :param hedging: if True, orders open new trades instead of reducing opposite ones
+        :param max_order_units: the most units one order may be for, for every instrument or as a dict
+        by instrument
+        :param max_position_units: the most net units that may be held, for every instrument or as a dict
+        by instrument
+        :param max_margin_ratio: the largest fraction of the NAV that may be used as margin after an order
+        """
+        self.balance = balance
+        self.margin_rate = margin_rate
+        self.margin_rates = margin_rates if margin_rates is not None else {}
+        self.hedging = hedging
+        self.max_order_units = max_order_units
+        self.max_position_units = max_position_units
+        self.max_margin_ratio = max_margin_ratio
+        self.instruments = []
+        self._rows = {}
+        self._size = 0
+        for column in _COLUMNS:
+            setattr(self, f'_{column}', np.zeros(8))
+        self._unrealized_pl = 0.0
+        self._margin_used = 0.0
+
+    def _row(self, instrument: str):
+        row = self._rows.get(instrument)
+        if row is None:
+            if self._size == len(self._bid):
+                for column in _COLUMNS:
+                    values = getattr(self, f'_{column}')
+                    setattr(self, f'_{column}', np.concatenate((values, np.zeros(len(values)))))
+            row = self._rows[instrument] = self._size
+            self._size += 1
+            self.instruments.append(instrument)
+            self._bid[row] = self._ask[row] = math.nan
+            self._positive_factor[row] = self._negative_factor[row] = 1.0
+            self._margin_rate[row] = self.margin_rates.get(instrument, self.margin_rate)
+        return row
+
+    def _revalue(self, row: int):
+        long_units, short_units = self._long_units[row], self._short_units[row]
+        bid, ask = self._bid[row], self._ask[row]
+        if bid != bid or (long_units == 0 and short_units == 0):
+            # a position without a price yet counts for nothing until one arrives
+            pl = margin = 0.0
+        else:
+            pl = long_units * (bid - self._long_price[row]) * self._positive_factor[row] + \
+                 short_units * (ask - self._short_price[row]) * self._negative_factor[row]
+            mid = (bid + ask) / 2
+            margin = max(long_units * self._positive_factor[row], -short_units * self._negative_factor[row]) * \
+                mid * self._margin_rate[row]
+        self._unrealized_pl += pl - self._pl[row]
+        self._margin_used += margin - self._margin[row]
+        self._pl[row] = pl
+        self._margin[row] = margin
+
+    def _revalue_rows(self, rows=None):
+        # with no rows every row is revalued and the totals are summed again, so the differences added up
+        # tick by tick don't drift
+        rows = slice(0, self._size) if rows is None else rows
+        bid, ask = self._bid[rows], self._ask[rows]
+        long_units, short_units = self._long_units[rows], self._short_units[rows]
+        positive, negative = self._positive_factor[rows], self._negative_factor[rows]
+        priced = ~np.isnan(bid)
+        pl = np.where(priced, long_units * (bid - self._long_price[rows]) * positive +
+                      short_units * (ask - self._short_price[rows]) * negative, 0.0)
+        margin = np.where(priced, np.maximum(long_units * positive, -short_units * negative) * (bid + ask) / 2 *
+                          self._margin_rate[rows], 0.0)
+        if isinstance(rows, slice):
+            self._unrealized_pl = float(pl.sum())
+            self._margin_used = float(margin.sum())
+        else:
+            self._unrealized_pl += float(pl.sum() - self._pl[rows].sum())
+            self._margin_used += float(margin.sum() - self._margin[rows].sum())
+        self._pl[rows] = pl
+        self._margin[rows] = margin
+
+    def update_position(self, position):
+        """
+        Set the position held in an instrument
+        :param position: a `Position`, or a position dict as returned by the API
+        """
+        raw = position.raw if hasattr(position, 'raw') else position
+        row = self._row(raw['instrument'])
+        long, short = raw.get('long', {}), raw.get('short', {})
+        self._long_units[row] = _number(long.get('units'))
+        self._long_price[row] = _number(long.get('averagePrice'))
+        self._short_units[row] = _number(short.get('units'))
+        self._short_price[row] = _number(short.get('averagePrice'))
+        self._revalue(row)
+
+    def sync(self, state):
+        """
+        Take the balance, margin rate and positions of an account
+        :param state: the account's `AccountState`, e.g. after `AccountState.poll`
+        """
+        summary = state.summary
+        if summary.balance is not None:
+            self.balance = float(summary.balance)
+        if summary.margin_rate is not None:
+            self.margin_rate = float(summary.margin_rate)
+            for instrument, row in self._rows.items():
+                self._margin_rate[row] = self.margin_rates.get(instrument, self.margin_rate)
+        held = set()
+        for position in state.positions.values():
+            self.update_position(position)
+            held.add(position.instrument)
+        for instrument, row in self._rows.items():
+            if instrument not in held:
+                self._long_units[row] = self._short_units[row] = 0.0
+        self._revalue_rows()
+
+    def update_price(self, message: dict):
+        """
+        Revalue an instrument at a new price
+        :param message: a `PRICE` message from the pricing stream
+        """
+        row = self._row(message['instrument'])
+        bids, asks = message.get('bids'), message.get('asks')
+        self._bid[row] = float(bids[0]['price']) if bids else float(message['closeoutBid'])
+        self._ask[row] = float(asks[0]['price']) if asks else float(message['closeoutAsk'])
+        factors = message.get('quoteHomeConversionFactors')
+        if factors:
+            self._positive_factor[row] = float(factors['positiveUnits'])
+            self._negative_factor[row] = float(factors['negativeUnits'])
+        self._revalue(row)
+
+    def update_prices(self, instruments: list, bids, asks):
+        """
+        Revalue many instruments at new prices at once
+        :param instruments: the instruments
+        :param bids: the bid price of each instrument
+        :param asks: the ask price of each instrument
+        """
+        rows = np.fromiter(map(self._row, instruments), dtype=np.intp, count=len(instruments))
+        self._bid[rows] = bids
+        self._ask[rows] = asks
+        self._revalue_rows(np.unique(rows))
+
+    def feed(self, messages):
+        """
+        Keep the engine's prices current from the messages of a pricing stream
+        :param messages: an iterable of decoded messages, e.g. from `OandaStreamSession.messages`
+        :returns: generator of dict, each price after it has been applied
+        """
+        for message in messages:
+            if message.get('type') == 'PRICE':
+                self.update_price(message)
+                yield message
+
+    @property
+    def unrealized_pl(self):
+        return self._unrealized_pl
+
+    @property
+    def margin_used(self):
+        return self._margin_used
+
+    @property
+    def nav(self):
+        """
+        The net asset value, the balance plus the unrealized profit and loss
+        """
+        return self.balance + self._unrealized_pl
+
+    @property
+    def margin_available(self):
+        return self.nav - self._margin_used
+
+    @property
+    def closeout_distance(self):
+        """
+        How far the NAV can fall before positions are closed out, which happens once it is below half
+        the margin used
+        """
+        return self.nav - self._margin_used / 2
+
+    @property
+    def units(self):
+        """
+        The net units held of each instrument, in the order of `instruments`
+        :returns: numpy.ndarray
+        """
+        return self._long_units[:self._size] + self._short_units[:self._size]
+
+    @property
+    def pl(self):
+        """
+        The unrealized profit and loss of each instrument, in the order of `instruments`
+        :returns: numpy.ndarray
+        """
+        return self._pl[:self._size].copy()
+
+    @property
+    def margin(self):
+        """
+        The margin used by each instrument, in the order of `instruments`
+        :returns: numpy.ndarray
+        """
+        return self._margin[:self._size].copy()
+
+    def exposure(self):
+        """
+        The net units held of each instrument
+        :returns: dict[str, float]
+        """
+        return {instrument: units for instrument, units in zip(self.instruments, self.units.tolist()) if units}
+
+    def _reject(self, units: float, instrument: str, reason: str):
+        raise RiskError(f'order for {units:g} units of {instrument} rejected.' + os.linesep + f'Reason {reason}')
+
+    def _held(self, instrument: str):
+        # the units held and margin used of an instrument, without adding a row for one not seen before
+        row = self._rows.get(instrument)
+        if row is None:
+            return 0.0, 0.0, 0.0
+        return self._long_units[row], self._short_units[row], self._margin[row]
+
+    def _check(self, data: dict, held: dict, margin_used: float):
+        order = data.get('order', data)
+        instrument, units = order.get('instrument'), order.get('units')
+        if instrument is None or units is None:
+            return margin_used
+        units = float(units)
+        order_limit = _limit(self.max_order_units, instrument)
+        if abs(units) > order_limit:
+            self._reject(units, instrument, f'the most units one order may be for is {order_limit:g}')
+        long_units, short_units, current = held.get(instrument) or self._held(instrument)
+        if self.hedging:
+            long_after, short_after = long_units + max(units, 0.0), short_units + min(units, 0.0)
+            net = long_after + short_after
+        else:
+            net = long_units + short_units + units
+            long_after, short_after = max(net, 0.0), min(net, 0.0)
+        position_limit = _limit(self.max_position_units, instrument)
+        if abs(net) > position_limit:
+            self._reject(units, instrument, f'the position would be {net:g} units, over the limit of '
+                                            f'{position_limit:g}')
+        if self.max_margin_ratio is None:
+            held[instrument] = (long_after, short_after, current)
+            return margin_used
+        row = self._rows.get(instrument)
+        if row is None or self._bid[row] != self._bid[row]:
+            self._reject(units, instrument, 'there is no price to work out its margin with')
+        margin = max(long_after * self._positive_factor[row], -short_after * self._negative_factor[row]) * \
+            (self._bid[row] + self._ask[row]) / 2 * self._margin_rate[row]
+        margin_used = margin_used - current + margin
+        nav = self.nav
+        # orders that reduce the margin used are always allowed, so positions can still be closed
+        if margin > current and (nav <= 0 or margin_used / nav > self.max_margin_ratio):
+            self._reject(units, instrument, f'the margin used would be {margin_used:g} of a NAV of {nav:g}, '
+                                            f'over the limit of {self.max_margin_ratio:g}')
+        held[instrument] = (long_after, short_after, margin)
+        return margin_used
+
+    def check_order(self, data: dict):
+        """
+        Check an order against the limits before it is sent. Orders without an instrument and units,
+        e.g. ones that only close trades, aren't checked.
+        :param data: a dict with the parameters of the order, as passed to `OandaAccount.create_order`
+        :raises: RiskError
+        """
+        self._check(data, {}, self._margin_used)
+
+    def check_orders(self, orders: list):
+        """
+        Check a batch of orders against the limits before any is sent. Each order is checked as if the ones
+        before it had filled, so together they can't go over a limit each one is within alone.
+        :param orders: a list of dicts, each as passed to `OandaAccount.create_order`
+        :raises: RiskError
+        """
+        held = {}
+        margin_used = self._margin_used
+        for data in orders:
+            margin_used = self._check(data, held, margin_used)
@@ -0,0 +1,5 @@
+class RiskError(Exception):
+    """
+    Raised when an order fails a pre-trade risk check
+    """
+    pass
@@ -1 +1,13 @@
 from algotradingstuff.sessions.session import OandaSession
+from algotradingstuff.sessions.stream import OandaStreamSession
+from algotradingstuff.sessions.asyncsession import AsyncOandaSession
+from algotradingstuff.sessions.ratelimit import TokenBucket
+from algotradingstuff.sessions.dispatch import send_all
+from algotradingstuff.sessions.scheduler import Scheduler
+from algotradingstuff.sessions.metrics import Metrics
+from algotradingstuff.sessions.errors import StreamError
+from algotradingstuff.sessions.errors import SchedulerError
+from algotradingstuff.sessions.decoders import JsonDecoder
+from algotradingstuff.sessions.decoders import OrjsonDecoder
+from algotradingstuff.sessions.decoders import LazyDecoder
+from algotradingstuff.sessions.decoders import LazyContent
@@ -0,0 +1,66 @@
+try:
+    import aiohttp
+    from yarl import URL
+except ImportError:  # pragma: no cover - aiohttp is an optional dependency
+    aiohttp = None
+
+
+class AsyncOandaSession:
+    """
+    An asyncio session that sends the requests made by `OandaAccount` over a pool of keep-alive connections
+    """
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 0, keepalive_timeout: float = 30.0,
+                 decoder=None):
+        """
+
+        :param limit: the most connections open at once
+        :param limit_per_host: the most connections open at once to one host, 0 for no limit
+        :param keepalive_timeout: the seconds an idle connection is kept open for reuse
+        :param decoder: decodes response bodies, e.g. an `OrjsonDecoder` or `LazyDecoder`, by default
+        `ClientResponse.json`
+        """
+        if aiohttp is None:
+            raise ImportError('AsyncOandaSession needs aiohttp, install it with `pip install algotradingstuff[async]`')
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.decoder = decoder
+        self._session = None
+
+    def _client(self):
+        # aiohttp sessions belong to the running event loop, so make it on first use
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host,
+                                             keepalive_timeout=self.keepalive_timeout)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def send(self, request, **kwargs):
+        """
+        Send a prepared request
+        :param request: a requests.PreparedRequest, e.g. from an `OandaAccount` method
+        :param kwargs: passed on to `aiohttp.ClientSession.request`
+        :returns: tuple[dict, str], the response content and the ID of the most recent transaction, if any
+        """
+        async with self._client().request(request.method, URL(request.url, encoded=True),
+                                          headers=dict(request.headers), data=request.body, **kwargs) as res:
+            if self.decoder is not None:
+                return self.decoder.decode(await res.read())
+            res_json = await res.json(content_type=None)
+        if 'lastTransactionID' in res_json:
+            last_transaction_id = res_json.pop('lastTransactionID')
+        else:
+            last_transaction_id = None
+        return res_json, last_transaction_id
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
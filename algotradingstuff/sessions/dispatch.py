@@ -0,0 +1,28 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+def send_all(session, requests: list, max_workers: int = 4, limiter=None):
+    """
+    Send many prepared requests concurrently over one session
+    :param session: the `OandaSession` used to send every request
+    :param requests: a list of requests.PreparedRequest
+    :param max_workers: the most requests in flight at once
+    :param limiter: an optional `TokenBucket` each request takes a token from before it is sent
+    :returns: list, the `(content, last_transaction_id)` tuple or the raised exception for
+    each request, in the same order as `requests`
+    """
+    if max_workers < 1:
+        raise ValueError('max_workers must be at least 1')
+
+    def send(request):
+        if limiter is not None:
+            limiter.acquire()
+        return session.send(request)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(send, request) for request in requests]
+    results = []
+    for future in futures:
+        exc = future.exception()
+        results.append(exc if exc is not None else future.result())
+    return results
@@ -0,0 +1,12 @@
+class StreamError(Exception):
+    """
+    Raised when a stream can't be opened or has failed too many times in a row
+    """
+    pass
+
+
+class SchedulerError(Exception):
+    """
+    Raised when a request still gets a 429 or 5xx response after the scheduler's last retry
+    """
+    pass
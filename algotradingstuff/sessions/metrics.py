@@ -0,0 +1,327 @@
+import functools
+import json
+import re
+import threading
+from bisect import bisect_left
+from time import perf_counter_ns
+from urllib.parse import urlsplit
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Histogram bounds of the timed stages, in nanoseconds: 1us to about 67s, doubling
+TIME_BOUNDS = [1000 * 2 ** i for i in range(27)]
+# Histogram bounds of the sizes, in bytes: 64B to 64MB, quadrupling
+BYTE_BOUNDS = [64 * 4 ** i for i in range(11)]
+# The stages each request is timed in, in the order they happen
+TIME_STAGES = ('prepare', 'queue', 'pool_wait', 'connect', 'ttfb', 'download', 'decode')
+BYTE_STAGES = ('request_bytes', 'response_bytes')
+
+_IDS = re.compile(r'/(accounts|orders|trades|positions|instruments)/([^/]+)')
+_TRANSACTION_ID = re.compile(r'/transactions/\d+')
+_NAMES = {'accounts': '{accountID}', 'orders': '{orderSpecifier}', 'trades': '{tradeSpecifier}',
+          'positions': '{instrument}', 'instruments': '{instrument}'}
+_endpoints = {}
+
+
+def endpoint(request):
+    """
+    Name the endpoint a request is for, with the IDs in its path replaced, e.g. 'PUT /v3/accounts/{accountID}/
+    orders/{orderSpecifier}/cancel'
+    :param request: a requests.PreparedRequest
+    :returns: str
+    """
+    key = (request.method, request.url.partition('?')[0])
+    name = _endpoints.get(key)
+    if name is None:
+        path = _IDS.sub(lambda match: f'/{match.group(1)}/{_NAMES[match.group(1)]}', urlsplit(key[1]).path)
+        name = f'{key[0]} {_TRANSACTION_ID.sub("/transactions/{transactionID}", path)}'
+        if len(_endpoints) > 4096:
+            _endpoints.clear()
+        _endpoints[key] = name
+    return name
+
+
+class Histogram:
+    """
+    Counts observations into fixed buckets. It isn't thread-safe: `Metrics` gives each thread its own.
+    """
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds: list):
+        """
+
+        :param bounds: the sorted upper bounds of the buckets. Larger values are counted in an extra bucket
+        """
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def merge(self, other):
+        """
+        Add the observations of another histogram with the same bounds
+        :param other: Histogram
+        """
+        for i, count in enumerate(list(other.counts)):
+            self.counts[i] += count
+        self.sum += other.sum
+
+    def quantile(self, q: float):
+        """
+        Estimate a quantile from the buckets, as the upper bound of the bucket it falls in
+        :param q: between 0 and 1
+        :returns: the bound, or None if there are no observations
+        """
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * total
+        seen = 0
+        for bound, count in zip(self.bounds + [float('inf')], self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+# The times of the current request measured below requests, per thread
+_timing = threading.local()
+
+
+class _TimedPoolMixin:
+
+    def _get_conn(self, timeout=None):
+        start = perf_counter_ns()
+        conn = super()._get_conn(timeout)
+        _timing.pool_wait = getattr(_timing, 'pool_wait', 0) + perf_counter_ns() - start
+        return conn
+
+
+class _TimedConnectionMixin:
+
+    def connect(self):
+        start = perf_counter_ns()
+        super().connect()
+        _timing.connect = getattr(_timing, 'connect', 0) + perf_counter_ns() - start
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(_TimedPoolMixin, HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(_TimedPoolMixin, HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+def instrument_adapter(adapter):
+    """
+    Make an `HTTPAdapter` measure the time spent waiting for a pooled connection and opening new ones
+    :param adapter: a requests.adapters.HTTPAdapter
+    """
+    adapter.poolmanager.pool_classes_by_scheme = {'http': _TimedHTTPConnectionPool,
+                                                  'https': _TimedHTTPSConnectionPool}
+
+
+def reset_timing():
+    _timing.pool_wait = 0
+    _timing.connect = 0
+
+
+def read_timing():
+    """
+    Get the time spent waiting for and opening connections since `reset_timing` on this thread
+    :returns: tuple[int, int], the pool wait and connect times in nanoseconds
+    """
+    return getattr(_timing, 'pool_wait', 0), getattr(_timing, 'connect', 0)
+
+
+class Metrics:
+    """
+    This class collects the timings, sizes and retries of a session's requests, per endpoint. Each thread
+    records into histograms of its own, so recording takes no locks, and they are added together when
+    the metrics are read.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        # only taken the first time a thread records
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = ({}, {})
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def observe(self, name: str, stage: str, value: int):
+        """
+        Record one observation
+        :param name: the endpoint, see `endpoint`
+        :param stage: one of `TIME_STAGES`, in nanoseconds, or of `BYTE_STAGES`, in bytes
+        :param value: the observed value
+        """
+        # this is on every request's path, so Histogram.observe is inlined
+        try:
+            histograms = self._local.shard[0]
+        except AttributeError:
+            histograms = self._shard()[0]
+        histogram = histograms.get((name, stage))
+        if histogram is None:
+            histogram = histograms[(name, stage)] = Histogram(BYTE_BOUNDS if stage in BYTE_STAGES else TIME_BOUNDS)
+        histogram.counts[bisect_left(histogram.bounds, value)] += 1
+        histogram.sum += value
+
+    def count(self, name: str, counter: str, value: int = 1):
+        """
+        Add to a counter
+        :param name: the endpoint, see `endpoint`
+        :param counter: e.g. 'requests', 'retries' or 'errors'
+        :param value: how much to add
+        """
+        counters = self._shard()[1]
+        key = (name, counter)
+        counters[key] = counters.get(key, 0) + value
+
+    def _merged(self):
+        histograms = {}
+        counters = {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard_histograms, shard_counters in shards:
+            for key, histogram in list(shard_histograms.items()):
+                if key not in histograms:
+                    histograms[key] = Histogram(histogram.bounds)
+                histograms[key].merge(histogram)
+            for key, value in list(shard_counters.items()):
+                counters[key] = counters.get(key, 0) + value
+        return histograms, counters
+
+    def histogram(self, name: str, stage: str):
+        """
+        Get the histogram of one stage of one endpoint, across all threads
+        :returns: Histogram, or None if nothing has been recorded
+        """
+        return self._merged()[0].get((name, stage))
+
+    def reset(self):
+        """
+        Forget everything recorded so far
+        """
+        with self._lock:
+            for histograms, counters in self._shards:
+                histograms.clear()
+                counters.clear()
+
+    def snapshot(self):
+        """
+        Get everything recorded so far. Times are in seconds.
+        :returns: dict, endpoint to its counters and, for each stage, the count, sum, p50, p99 and cumulative
+        bucket counts
+        """
+        histograms, counters = self._merged()
+        snapshot = {}
+        for (name, counter), value in counters.items():
+            snapshot.setdefault(name, {})[counter] = value
+        for (name, stage), histogram in sorted(histograms.items()):
+            scale = 1 if stage in BYTE_STAGES else 1e-9
+            cumulative = 0
+            buckets = []
+            for bound, count in zip(histogram.bounds, histogram.counts):
+                cumulative += count
+                buckets.append([bound * scale, cumulative])
+            p50, p99 = histogram.quantile(0.5), histogram.quantile(0.99)
+            snapshot.setdefault(name, {})[stage] = {
+                'count': histogram.count, 'sum': histogram.sum * scale, 'p50': p50 * scale, 'p99': p99 * scale,
+                'buckets': buckets}
+        return snapshot
+
+    def to_json(self, **kwargs):
+        """
+        :param kwargs: passed on to `json.dumps`
+        :returns: str, the snapshot as JSON
+        """
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def to_prometheus(self, prefix: str = 'algotradingstuff_client'):
+        """
+        Format everything recorded so far in the Prometheus text exposition format
+        :param prefix: the start of every metric name
+        :returns: str
+        """
+        histograms, counters = self._merged()
+        lines = []
+        for metric, stages, scale in ((f'{prefix}_duration_seconds', TIME_STAGES, 1e-9),
+                                      (f'{prefix}_size_bytes', BYTE_STAGES, 1)):
+            lines.append(f'# TYPE {metric} histogram')
+            for (name, stage), histogram in sorted(histograms.items()):
+                if stage not in stages:
+                    continue
+                labels = f'endpoint="{name}",stage="{stage}"'
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{{labels},le="{bound * scale:g}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f'{metric}_sum{{{labels}}} {histogram.sum * scale:g}')
+                lines.append(f'{metric}_count{{{labels}}} {histogram.count}')
+        for counter in sorted({counter for _, counter in counters}):
+            lines.append(f'# TYPE {prefix}_{counter}_total counter')
+            for (name, key), value in sorted(counters.items()):
+                if key == counter:
+                    lines.append(f'{prefix}_{counter}_total{{endpoint="{name}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+class timed_builder:
+    """
+    Record how long a request builder of `OandaAccount` takes, under the 'prepare' stage, when the
+    account's session has metrics. This is decided the first time the builder is looked up on an account,
+    which keeps the method it gets from then on, so with metrics off it is the plain builder.
+    """
+
+    def __init__(self, builder):
+        functools.update_wrapper(self, builder)
+        self.builder = builder
+        self.name = builder.__name__
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, account, owner=None):
+        if account is None:
+            return self
+        metrics = getattr(account.session, 'metrics', None)
+        if metrics is None:
+            method = self.builder.__get__(account, owner)
+        else:
+            builder = self.builder
+
+            @functools.wraps(builder)
+            def method(*args, **kwargs):
+                start = perf_counter_ns()
+                request = builder(account, *args, **kwargs)
+                metrics.observe(endpoint(request), 'prepare', perf_counter_ns() - start)
+                return request
+        # a subclass overriding the builder, e.g. AsyncOandaAccount, reaches it through super() and keeps its own
+        if getattr(type(account), self.name, None) is self:
+            account.__dict__[self.name] = method
+        return method
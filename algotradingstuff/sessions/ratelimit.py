@@ -0,0 +1,64 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket used to keep the request rate under the API's limits
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        """
+
+        :param rate: how many tokens are added to the bucket per second
+        :param capacity: the most tokens the bucket can hold, i.e. the allowed burst. Defaults to `rate`
+        """
+        if rate <= 0:
+            raise ValueError('rate must be greater than 0')
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self, tokens: float = 1):
+        """
+        Take `tokens` from the bucket without waiting
+        :param tokens: the number of tokens to take
+        :returns: bool
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1, timeout: float = None):
+        """
+        Take `tokens` from the bucket, waiting until enough have been added
+        :param tokens: the number of tokens to take
+        :param timeout: the most seconds to wait. `None` waits forever
+        :returns: bool
+        """
+        if tokens > self.capacity:
+            raise ValueError('cannot acquire more tokens than the bucket capacity')
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
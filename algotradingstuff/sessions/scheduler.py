@@ -0,0 +1,147 @@
+import email.utils
+import os
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+from requests.exceptions import ConnectionError, Timeout
+from algotradingstuff.sessions.errors import SchedulerError
+from algotradingstuff.sessions.ratelimit import TokenBucket
+
+# Responses worth sending the request again for
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+# Methods that can be sent again without doing anything twice
+IDEMPOTENT_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+_TRADING_PATH = re.compile(r'/(orders|trades|positions|openTrades|openPositions|pendingOrders)(/|$)')
+
+
+def is_trading(request):
+    """
+    Whether a request is order flow rather than data, i.e. it changes the account or reads its orders,
+    trades or positions
+    :param request: a requests.PreparedRequest
+    :returns: bool
+    """
+    return request.method != 'GET' or _TRADING_PATH.search(urlsplit(request.url).path) is not None
+
+
+def retry_after(response):
+    """
+    Get how long a response asks to wait before the next request
+    :param response: a requests.Response
+    :returns: float, the seconds to wait, or None if the response doesn't say
+    """
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class Scheduler:
+    """
+    This class decides when the requests of an `OandaSession` are sent. The request rate is split between
+    order flow and data: data requests only use their own share, while order flow uses its share and
+    whatever data leaves unused, so a backfill running flat out can't hold up an order. 429 and 5xx responses
+    are retried with exponential backoff, and a 429 pauses every request for as long as its Retry-After asks.
+    """
+
+    def __init__(self, rate: float = 100.0, trading_share: float = 0.2, retries: int = 3,
+                 backoff_factor: float = 0.5, max_backoff: float = 30.0, classify=is_trading):
+        """
+
+        :param rate: the most requests sent per second, or `None` to not limit the rate
+        :param trading_share: the fraction of `rate` kept for order flow
+        :param retries: how many times to send a request again after a 429 or 5xx response. Only 429
+        responses, which the API rejects before acting on, are retried for requests that aren't idempotent
+        :param backoff_factor: the base, in seconds, of the exponential wait between retries
+        :param max_backoff: the most seconds to wait between retries
+        :param classify: called with each request, returns whether it is order flow
+        """
+        if not 0 < trading_share < 1:
+            raise ValueError('trading_share must be between 0 and 1')
+        self.rate = rate
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.classify = classify
+        if rate is None:
+            self.trading = self.data = None
+        else:
+            self.trading = TokenBucket(rate * trading_share, max(rate * trading_share, 1))
+            self.data = TokenBucket(rate * (1 - trading_share), max(rate * (1 - trading_share), 1))
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def _acquire(self, trading: bool):
+        if self.trading is None:
+            return
+        if not trading:
+            self.data.acquire()
+            return
+        while not (self.trading.try_acquire() or self.data.try_acquire()):
+            time.sleep(1 / self.rate)
+
+    def _wait(self):
+        while True:
+            with self._lock:
+                delay = self._resume_at - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def _pause(self, delay: float):
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+
+    def backoff(self, attempt: int):
+        """
+        The seconds to wait before sending a request again
+        :param attempt: how many times the request has been retried already
+        :returns: float
+        """
+        return min(self.backoff_factor * 2 ** attempt, self.max_backoff)
+
+    def submit(self, request, send):
+        """
+        Send a request when the limits allow it, retrying it if it fails
+        :param request: a requests.PreparedRequest
+        :param send: called with no arguments to send the request, returns a requests.Response
+        :returns: requests.Response
+        :raises: SchedulerError, if a retried request still gets a 429 or 5xx response on its last attempt
+        """
+        trading = self.classify(request)
+        idempotent = request.method in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            self._wait()
+            self._acquire(trading)
+            try:
+                res = send()
+            except (ConnectionError, Timeout):
+                if not idempotent or attempt >= self.retries:
+                    raise
+                delay = self.backoff(attempt)
+            else:
+                if res.status_code not in RETRY_STATUSES or (res.status_code != 429 and not idempotent):
+                    return res
+                delay = retry_after(res)
+                if delay is None:
+                    delay = self.backoff(attempt)
+                if res.status_code == 429:
+                    # the limit is on the whole token, so every request waits
+                    self._pause(delay)
+                if attempt >= self.retries:
+                    res.close()
+                    raise SchedulerError(f'gave up on {request.method} {request.url} after {attempt + 1} attempts.' +
+                                         os.linesep + f'Reason {res.reason}' + os.linesep +
+                                         f'Code {res.status_code}')
+                res.close()
+            time.sleep(delay)
+            attempt += 1
@@ -1,13 +1,110 @@
+from time import perf_counter_ns
 from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from algotradingstuff.sessions.metrics import endpoint, instrument_adapter, read_timing, reset_timing
 
 
 class OandaSession(Session):
 
-    def send(self, request, **kwargs):
-        res = super().send(request)
+    def __init__(self, pool_size: int = 10, retries: int = 0, backoff_factor: float = 0.5,
+                 decoder=None, scheduler=None, metrics=None):
+        """
+
+        :param pool_size: the most kept-alive connections per host
+        :param retries: how many times to retry a GET that failed to connect or got a 429 or 5xx response
+        :param backoff_factor: the base, in seconds, of the exponential wait between retries
+        :param decoder: decodes response bodies in `send`, e.g. an `OrjsonDecoder` or `LazyDecoder`,
+        by default `Response.json`
+        :param scheduler: a `Scheduler` that rate limits, prioritises and retries the requests. Without one,
+        requests are sent straight away
+        :param metrics: a `Metrics` the timings, sizes and retries of every request are recorded in.
+        `None` records nothing
+        """
+        super().__init__()
+        self.decoder = decoder
+        self.scheduler = scheduler
+        self.metrics = metrics
+        retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset(['GET']), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        if metrics is not None:
+            instrument_adapter(adapter)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def fetch(self, request, **kwargs):
+        """
+        Send a prepared request and return the response as it is
+        :param request: a requests.PreparedRequest
+        :returns: requests.Response
+        :raises: SchedulerError
+        """
+        if self.metrics is not None:
+            return self._fetch_measured(request, **kwargs)
+        if self.scheduler is not None:
+            return self.scheduler.submit(request, lambda: Session.send(self, request, **kwargs))
+        return super().send(request, **kwargs)
+
+    def _fetch_measured(self, request, stream: bool = False, **kwargs):
+        name = endpoint(request)
+        attempts = []
+        metrics = self.metrics
+
+        def send():
+            reset_timing()
+            start = perf_counter_ns()
+            try:
+                res = Session.send(self, request, stream=True, **kwargs)
+            except Exception:
+                # attempts that fail to get a response, e.g. on a ConnectionError, are counted as errors
+                attempts.append((start, None))
+                metrics.count(name, 'errors')
+                raise
+            attempts.append((start, perf_counter_ns()))
+            return res
+
+        queued = perf_counter_ns()
+        try:
+            res = self.scheduler.submit(request, send) if self.scheduler is not None else send()
+        except Exception:
+            metrics.count(name, 'requests')
+            if len(attempts) > 1:
+                metrics.count(name, 'retries', len(attempts) - 1)
+            raise
+        start, headers = attempts[-1]
+        pool_wait, connect = read_timing()
+        metrics.count(name, 'requests')
+        retries = len(attempts) - 1 + len(getattr(getattr(res.raw, 'retries', None), 'history', ()))
+        if retries:
+            metrics.count(name, 'retries', retries)
+        metrics.observe(name, 'queue', start - queued)
+        metrics.observe(name, 'pool_wait', pool_wait)
+        metrics.observe(name, 'connect', connect)
+        metrics.observe(name, 'ttfb', headers - start - pool_wait - connect)
+        body = request.body
+        metrics.observe(name, 'request_bytes', len(body) if body else 0)
+        if not stream:
+            size = len(res.content)
+            metrics.observe(name, 'download', perf_counter_ns() - headers)
+            metrics.observe(name, 'response_bytes', size)
+        return res
+
+    def _decode(self, res):
+        if self.decoder is not None:
+            return self.decoder.decode(res.content)
         res_json = res.json()
         if 'lastTransactionID' in res_json:
             last_transaction_id = res_json.pop('lastTransactionID')
         else:
             last_transaction_id = None
         return res_json, last_transaction_id
+
+    def send(self, request, **kwargs):
+        res = self.fetch(request, **kwargs)
+        if self.metrics is None:
+            return self._decode(res)
+        start = perf_counter_ns()
+        result = self._decode(res)
+        self.metrics.observe(endpoint(request), 'decode', perf_counter_ns() - start)
+        return result
@@ -0,0 +1,61 @@
+import json
+import os
+import time
+from requests import Session
+from requests.exceptions import ConnectionError, ChunkedEncodingError, Timeout
+from algotradingstuff.sessions.errors import StreamError
+from algotradingstuff.sessions.scheduler import RETRY_STATUSES, retry_after
+
+
+class OandaStreamSession(Session):
+    """
+    A session for OANDA's streaming endpoints, which send one JSON object per line
+    """
+
+    def messages(self, request, heartbeats: bool = False, timeout: float = 10.0, backoff: float = 1.0,
+               max_backoff: float = 30.0, max_retries: int = None):
+        """
+        Iterate over the messages of a stream as they arrive, reconnecting if the connection drops or the
+        stream answers with a 429 or 5xx status. Other error statuses, e.g. 401, raise at once.
+        :param request: a requests.PreparedRequest for a streaming endpoint
+        :param heartbeats: if True, heartbeat messages are yielded too
+        :param timeout: the most seconds to wait for a line. OANDA sends a heartbeat every 5 seconds
+        :param backoff: the seconds to wait before the first reconnection, doubled after each failure
+        :param max_backoff: the most seconds to wait between reconnections
+        :param max_retries: the most reconnections in a row without receiving a message. `None` for no limit
+        :returns: generator of dict
+        :raises: StreamError
+        """
+        retries = 0
+        delay = backoff
+        while True:
+            res = None
+            wait = None
+            try:
+                res = self.send(request, stream=True, timeout=timeout)
+                if res.status_code in RETRY_STATUSES:
+                    # throttled or unavailable, so the stream is opened again after the backoff
+                    wait = retry_after(res)
+                elif res.status_code != 200:
+                    raise StreamError(f'failed to open stream {request.url}.' + os.linesep +
+                                      f'Reason {res.reason}' + os.linesep + f'Code {res.status_code}')
+                else:
+                    for line in res.iter_lines():
+                        if not line:
+                            continue
+                        message = json.loads(line)
+                        retries = 0
+                        delay = backoff
+                        if message.get('type') == 'HEARTBEAT' and not heartbeats:
+                            continue
+                        yield message
+            except (ConnectionError, ChunkedEncodingError, Timeout, ValueError):
+                pass
+            finally:
+                if res is not None:
+                    res.close()
+            if max_retries is not None and retries >= max_retries:
+                raise StreamError(f'stream {request.url} failed {retries} times in a row')
+            retries += 1
+            time.sleep(delay if wait is None else max(delay, wait))
+            delay = min(delay * 2, max_backoff)
@@ -0,0 +1,5 @@
+from .server import BackgroundServer
+from .stubserver import StubServer
+from .stubserver import stub_prices
+from .replay import RecordingProxy
+from .replay import ReplayServer
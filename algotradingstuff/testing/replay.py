@@ -0,0 +1,98 @@
+import base64
+import json
+import threading
+import requests
+from algotradingstuff.testing.server import BackgroundServer
+
+# Headers that describe one connection rather than the response, so aren't recorded
+_HOP_HEADERS = {'connection', 'keep-alive', 'transfer-encoding', 'content-length', 'content-encoding'}
+
+
+class RecordingProxy(BackgroundServer):
+    """
+    This class forwards every request to the real API and appends each exchange to a JSON lines file,
+    which `ReplayServer` can then serve offline. Streaming endpoints aren't supported.
+    """
+
+    def __init__(self, upstream: str, path: str, host: str = '127.0.0.1', port: int = 0):
+        """
+
+        :param upstream: the scheme and host of the API, e.g. 'https://api-fxpractice.oanda.com'
+        :param path: the file the exchanges are appended to
+        :param host: the address to listen on
+        :param port: the port to listen on, 0 picks a free one
+        """
+        super().__init__(host, port)
+        self.upstream = upstream.rstrip('/')
+        self.path = path
+        self._session = requests.Session()
+        self._lock = threading.Lock()
+
+    def handle(self, handler):
+        body = self.read_body(handler)
+        headers = {key: value for key, value in handler.headers.items()
+                   if key.lower() not in _HOP_HEADERS and key.lower() != 'host'}
+        # ask for the body as it is, so it can be replayed byte for byte
+        headers['Accept-Encoding'] = 'identity'
+        res = self._session.request(handler.command, f'{self.upstream}{handler.path}', headers=headers,
+                                    data=body or None)
+        res_headers = {key: value for key, value in res.headers.items() if key.lower() not in _HOP_HEADERS}
+        exchange = {'method': handler.command, 'path': handler.path, 'body': base64.b64encode(body).decode(),
+                    'status': res.status_code, 'headers': res_headers,
+                    'response': base64.b64encode(res.content).decode()}
+        with self._lock:
+            with open(self.path, 'a') as fh:
+                fh.write(json.dumps(exchange) + '\n')
+        self.send_bytes(handler, res.status_code, res.content, res_headers)
+
+    def stop(self):
+        super().stop()
+        self._session.close()
+
+
+class ReplayServer(BackgroundServer):
+    """
+    This class answers requests with the exchanges recorded by `RecordingProxy`. Requests are matched on
+    method, path with query and body, and repeated requests get the recorded responses in order.
+    """
+
+    def __init__(self, path: str, host: str = '127.0.0.1', port: int = 0, match_body: bool = True,
+                 loop: bool = True):
+        """
+
+        :param path: the file of recorded exchanges
+        :param host: the address to listen on
+        :param port: the port to listen on, 0 picks a free one
+        :param match_body: if False, requests are matched on method and path only
+        :param loop: if True, a request asked more times than it was recorded gets its last response again
+        """
+        super().__init__(host, port)
+        self.match_body = match_body
+        self.loop = loop
+        self._exchanges = {}
+        self._served = {}
+        self._lock = threading.Lock()
+        with open(path, 'r') as fh:
+            for line in fh:
+                if line.strip():
+                    exchange = json.loads(line)
+                    self._exchanges.setdefault(self._key(exchange['method'], exchange['path'], exchange['body']),
+                                               []).append(exchange)
+
+    def _key(self, method: str, path: str, body: str):
+        return (method, path, body) if self.match_body else (method, path)
+
+    def handle(self, handler):
+        key = self._key(handler.command, handler.path, base64.b64encode(self.read_body(handler)).decode())
+        with self._lock:
+            exchanges = self._exchanges.get(key, [])
+            served = self._served.get(key, 0)
+            if served >= len(exchanges) and (not self.loop or not exchanges):
+                exchange = None
+            else:
+                exchange = exchanges[min(served, len(exchanges) - 1)]
+                self._served[key] = served + 1
+        if exchange is None:
+            return self.send_json(handler, 404, {'errorMessage': f'no recorded response for {handler.command} '
+                                                                 f'{handler.path}'})
+        self.send_bytes(handler, exchange['status'], base64.b64decode(exchange['response']), exchange['headers'])
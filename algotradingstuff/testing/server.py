@@ -0,0 +1,100 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # keep-alive, so clients can be measured with a warm connection pool
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately, so Nagle would stall each response on a delayed ACK
+    disable_nagle_algorithm = True
+
+    def _dispatch(self):
+        self.server.owner.handle(self)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _dispatch
+
+    def log_message(self, format, *args):
+        pass
+
+
+class BackgroundServer:
+    """
+    This class runs an HTTP server on a background thread. Subclasses answer requests in `handle`.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        """
+
+        :param host: the address to listen on
+        :param port: the port to listen on, 0 picks a free one
+        """
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        """
+        The base URL of the server, e.g. to pass as `base_url`
+        :returns: str
+        """
+        return f'http://{self.host}:{self.port}/v3'
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._server.daemon_threads = True
+        self._server.owner = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.05},
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def serve_forever(self):
+        """
+        Run the server on the calling thread until interrupted
+        """
+        self.start()
+        try:
+            self._thread.join()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def handle(self, handler: BaseHTTPRequestHandler):
+        raise NotImplementedError
+
+    @staticmethod
+    def read_body(handler: BaseHTTPRequestHandler):
+        length = int(handler.headers.get('Content-Length') or 0)
+        return handler.rfile.read(length) if length else b''
+
+    @staticmethod
+    def send_bytes(handler: BaseHTTPRequestHandler, status: int, body: bytes, headers: dict = None):
+        handler.send_response(status)
+        for key, value in (headers or {}).items():
+            handler.send_header(key, value)
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    @classmethod
+    def send_json(cls, handler: BaseHTTPRequestHandler, status: int, content: dict, headers: dict = None):
+        cls.send_bytes(handler, status, json.dumps(content).encode(),
+                       {'Content-Type': 'application/json', **(headers or {})})
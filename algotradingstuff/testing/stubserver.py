@@ -0,0 +1,377 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+from algotradingstuff.backtest.simulator import SimulatedAccount
+from algotradingstuff.data.granularity import MAX_CANDLES, granularity_seconds
+from algotradingstuff.data.timeutils import to_unix_string
+from algotradingstuff.sessions.ratelimit import TokenBucket
+from algotradingstuff.testing.server import BackgroundServer
+
+_ROUTES = []
+
+
+def _route(method: str, pattern: str):
+    def register(func):
+        _ROUTES.append((method, re.compile(f'^/v3{pattern}$'), func))
+        return func
+    return register
+
+
+def stub_prices(instrument: str, seconds, spread: float = 0.0002):
+    """
+    Make up deterministic bid and ask prices for an instrument
+    :param instrument: the instrument
+    :param seconds: UNIX times, as a number or an array
+    :param spread: the difference between the ask and bid
+    :returns: tuple, the bid and ask prices
+    """
+    base = 1.0 + sum(map(ord, instrument)) % 100 / 100
+    seconds = np.asarray(seconds, dtype=np.float64)
+    noise = (np.floor(seconds) * 2654435761 % 1000) / 1e6
+    mid = base * (1 + 0.01 * np.sin(seconds / 3600)) + noise
+    return mid - spread / 2, mid + spread / 2
+
+
+class StubServer(BackgroundServer):
+    """
+    This class serves the OANDA v20 endpoints `OandaAccount` uses from memory, for offline tests and
+    benchmarks. Orders are simulated with `SimulatedAccount` against made up prices. Latency, server
+    errors and 429 throttling can be added.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, api_key: str = None, accounts: list = None,
+                 latency: float = 0.0, error_rate: float = 0.0, rate: float = None, stream_interval: float = 0.25,
+                 stream_messages: int = None, seed: int = 0):
+        """
+
+        :param host: the address to listen on
+        :param port: the port to listen on, 0 picks a free one
+        :param api_key: the only API key accepted. `None` accepts any
+        :param accounts: the IDs of the accounts to serve
+        :param latency: the seconds to wait before answering each request
+        :param error_rate: the fraction of requests answered with a 500 error
+        :param rate: the most requests answered per second before answering 429. `None` for no limit
+        :param stream_interval: the seconds between prices on the pricing stream
+        :param stream_messages: the most messages sent on a stream before closing it. `None` for no limit
+        :param seed: the seed of the random errors
+        """
+        super().__init__(host, port)
+        self.api_key = api_key
+        self.accounts = {account_id: SimulatedAccount() for account_id in (accounts or ['101-001-0000000-001'])}
+        for account_id, account in self.accounts.items():
+            # like a real account, the history starts with the account being made
+            account.add_transaction('CREATE', accountID=account_id, homeCurrency='USD')
+        self.latency = latency
+        self.error_rate = error_rate
+        self.limiter = TokenBucket(rate) if rate else None
+        self.stream_interval = stream_interval
+        self.stream_messages = stream_messages
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def handle(self, handler):
+        with self._lock:
+            self.requests += 1
+            fail = self.error_rate and self._random.random() < self.error_rate
+        body = self.read_body(handler)
+        if self.latency:
+            time.sleep(self.latency)
+        if self.api_key is not None and handler.headers.get('Authorization') != f'Bearer {self.api_key}':
+            return self.send_json(handler, 401, {'errorMessage': 'Insufficient authorization to perform request.'})
+        if self.limiter is not None and not self.limiter.try_acquire():
+            return self.send_json(handler, 429, {'errorMessage': 'Rate limit violation of newly established '
+                                                                 'connections or requests'},
+                                  {'Retry-After': '1'})
+        if fail:
+            return self.send_json(handler, 500, {'errorMessage': 'Internal Server Error'})
+        url = urlparse(handler.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        for method, pattern, func in _ROUTES:
+            match = pattern.match(url.path)
+            if match and method == handler.command:
+                groups = match.groupdict()
+                if 'account' in groups and groups['account'] not in self.accounts:
+                    return self.send_json(handler, 400, {'errorMessage': 'Invalid value specified for accountID'})
+                data = json.loads(body) if body else {}
+                result = func(self, handler, query, data, **groups)
+                if result is not None:
+                    status, content = result
+                    self.send_json(handler, status, content)
+                return
+        self.send_json(handler, 404, {'errorMessage': f'no route for {handler.command} {url.path}'})
+
+    def _account(self, account_id: str, now: float = None):
+        account = self.accounts[account_id]
+        now = time.time() if now is None else now
+        account.time = int(now * 1e9)
+        for instrument in {trade['instrument'] for trade in account.trades.values()} | \
+                {order['instrument'] for order in account.orders.values()}:
+            account.set_price(instrument, *map(float, stub_prices(instrument, now)))
+        return account
+
+    @staticmethod
+    def _summary(account_id: str, account: SimulatedAccount):
+        unrealized = account.nav - account.balance
+        return {'id': account_id, 'alias': 'stub', 'currency': 'USD', 'balance': str(account.balance),
+                'NAV': str(account.nav), 'unrealizedPL': str(unrealized), 'marginUsed': str(account.margin_used),
+                'marginAvailable': str(account.nav - account.margin_used),
+                'openTradeCount': len(account.trades), 'openPositionCount': len({t['instrument'] for t in
+                                                                                  account.trades.values()}),
+                'pendingOrderCount': len(account.orders), 'lastTransactionID': account.last_transaction_id}
+
+    @_route('GET', '/accounts')
+    def _accounts(self, handler, query, data):
+        return 200, {'accounts': [{'id': account_id, 'tags': []} for account_id in self.accounts]}
+
+    @_route('GET', '/accounts/(?P<account>[^/]+)')
+    def _get_account(self, handler, query, data, account):
+        with self._lock:
+            simulated = self._account(account)
+            details = self._summary(account, simulated)
+            details['orders'] = simulated.get_orders()[0]['orders']
+            details['trades'] = simulated.get_open_trades()[0]['trades']
+            details['positions'] = simulated.get_open_positions()[0]['positions']
+        return 200, {'account': details, 'lastTransactionID': simulated.last_transaction_id}
+
+    @_route('GET', '/accounts/(?P<account>[^/]+)/summary')
+    def _get_summary(self, handler, query, data, account):
+        with self._lock:
+            simulated = self._account(account)
+            return 200, {'account': self._summary(account, simulated),
+                         'lastTransactionID': simulated.last_transaction_id}
+
+    @_route('GET', '/accounts/(?P<account>[^/]+)/changes')
+    def _get_changes(self, handler, query, data, account):
+        since = query.get('sinceTransactionID', '')
+        with self._lock:
+            simulated = self._account(account)
+            if not since.isdigit() or not 0 < int(since) <= int(simulated.last_transaction_id):
+                return 400, {'errorMessage': 'Invalid value specified for sinceTransactionID'}
+            since = int(since)
+            transactions = [t for t in simulated.transactions if int(t['id']) > since]
+            orders = simulated.get_orders()[0]['orders']
+            trades = simulated.get_open_trades()[0]['trades']
+            open_ids = {trade['id'] for trade in trades}
+            closed, reduced = [], []
+            for transaction in transactions:
+                for entry in transaction.get('tradesClosed', []):
+                    closed.append({'id': entry['tradeID'], 'state': 'CLOSED'})
+                if 'tradeReduced' in transaction and transaction['tradeReduced']['tradeID'] in open_ids:
+                    reduced.append(transaction['tradeReduced']['tradeID'])
+            touched = {t['instrument'] for t in transactions if 'instrument' in t}
+            positions = [p for p in simulated.get_open_positions()[0]['positions'] if p['instrument'] in touched]
+            changes = {
+                'ordersCreated': [order for order in orders if int(order['id']) > since],
+                'ordersFilled': [{'id': t['orderID']} for t in transactions if t['type'] == 'ORDER_FILL'],
+                'ordersCancelled': [{'id': t['orderID']} for t in transactions if t['type'] == 'ORDER_CANCEL'],
+                'ordersTriggered': [],
+                'tradesOpened': [trade for trade in trades if int(trade['id']) > since],
+                'tradesReduced': [trade for trade in trades if trade['id'] in reduced],
+                'tradesClosed': closed,
+                'positions': positions,
+                'transactions': transactions,
+            }
+            summary = self._summary(account, simulated)
+            state = {key: summary[key] for key in ('NAV', 'unrealizedPL', 'marginUsed', 'marginAvailable')}
+            state['orders'] = []
+            state['trades'] = [{'id': trade['id'], 'unrealizedPL': trade['unrealizedPL']} for trade in trades]
+            state['positions'] = [{'instrument': p['instrument'], 'netUnrealizedPL': p['unrealizedPL']}
+                                  for p in simulated.get_open_positions()[0]['positions']]
+            return 200, {'changes': changes, 'state': state, 'lastTransactionID': simulated.last_transaction_id}
+
+    @_route('POST', '/accounts/(?P<account>[^/]+)/orders')
+    def _create_order(self, handler, query, data, account):
+        with self._lock:
+            simulated = self._account(account)
+            order = data.get('order', {})
+            instrument = order.get('instrument')
+            if instrument:
+                simulated.set_price(instrument, *map(float, stub_prices(instrument, time.time())))
+            content, last_transaction_id = simulated.create_order({'order': order})
+        return (400 if 'orderRejectTransaction' in content else 201), {**content,
+                                                                      'lastTransactionID': last_transaction_id}
+
+    @_route('GET', '/accounts/(?P<account>[^/]+)/orders')
+    def _get_orders(self, handler, query, data, account):
+        with self._lock:
+            content, last_transaction_id = self._account(account).get_orders()
+        return 200, {**content, 'lastTransactionID': last_transaction_id}
+
+    @_route('PUT', '/accounts/(?P<account>[^/]+)/orders/(?P<order_id>[^/]+)/cancel')
+    def _cancel_order(self, handler, query, data, account, order_id):
+        with self._lock:
+            content, last_transaction_id = self._account(account).cancel_order(order_id)
+        return (404 if 'errorMessage' in content else 200), {**content, 'lastTransactionID': last_transaction_id}
+
+    @_route('GET', '/accounts/(?P<account>[^/]+)/openPositions')
+    def _get_open_positions(self, handler, query, data, account):
+        with self._lock:
+            content, last_transaction_id = self._account(account).get_open_positions()
+        return 200, {**content, 'lastTransactionID': last_transaction_id}
+
+    @_route('PUT', '/accounts/(?P<account>[^/]+)/positions/(?P<instrument>[^/]+)/close')
+    def _close_position(self, handler, query, data, account, instrument):
+        with self._lock:
+            content, last_transaction_id = self._account(account).close_position(instrument, 'longUnits' in data)
+        return (404 if 'errorMessage' in content else 200), {**content, 'lastTransactionID': last_transaction_id}
+
+    @_route('GET', '/accounts/(?P<account>[^/]+)/openTrades')
+    def _get_open_trades(self, handler, query, data, account):
+        with self._lock:
+            content, last_transaction_id = self._account(account).get_open_trades()
+        return 200, {**content, 'lastTransactionID': last_transaction_id}
+
+    @_route('PUT', '/accounts/(?P<account>[^/]+)/trades/(?P<trade>[^/]+)/close')
+    def _close_trade(self, handler, query, data, account, trade):
+        with self._lock:
+            content, last_transaction_id = self._account(account).close_trade(trade)
+        return (404 if 'errorMessage' in content else 200), {**content, 'lastTransactionID': last_transaction_id}
+
+    @_route('GET', '/accounts/(?P<account>[^/]+)/transactions')
+    def _get_transactions(self, handler, query, data, account):
+        with self._lock:
+            transactions = self.accounts[account].transactions
+            start = float(query.get('from', 0))
+            end = float(query.get('to', time.time()))
+            ids = [int(t['id']) for t in transactions if start <= float(t['time']) <= end]
+            last = self.accounts[account].last_transaction_id
+        pages = [f'{self.url}/accounts/{account}/transactions/idrange?from={first}&to={min(first + 999, ids[-1])}'
+                 for first in range(ids[0], ids[-1] + 1, 1000)] if ids else []
+        return 200, {'from': to_unix_string(start, unit='s'), 'to': to_unix_string(end, unit='s'), 'pageSize': 1000,
+                     'count': len(ids), 'pages': pages, 'lastTransactionID': last}
+
+    @_route('GET', '/accounts/(?P<account>[^/]+)/transactions/idrange')
+    def _get_transactions_idrange(self, handler, query, data, account):
+        first, last = int(query.get('from', 1)), int(query.get('to', 0))
+        with self._lock:
+            simulated = self.accounts[account]
+            transactions = [t for t in simulated.transactions if first <= int(t['id']) <= last]
+            return 200, {'transactions': transactions, 'lastTransactionID': simulated.last_transaction_id}
+
+    @_route('GET', '/accounts/(?P<account>[^/]+)/transactions/sinceid')
+    def _get_transactions_since(self, handler, query, data, account):
+        since = int(query.get('id', 0))
+        with self._lock:
+            simulated = self.accounts[account]
+            transactions = [t for t in simulated.transactions if int(t['id']) > since]
+            return 200, {'transactions': transactions, 'lastTransactionID': simulated.last_transaction_id}
+
+    @_route('GET', '/instruments/(?P<instrument>[^/]+)/candles')
+    @_route('GET', '/accounts/(?P<account>[^/]+)/instruments/(?P<instrument>[^/]+)/candles')
+    def _get_candles(self, handler, query, data, instrument, account=None):
+        granularity = query.get('granularity', 'S5')
+        try:
+            length = granularity_seconds(granularity)
+        except ValueError:
+            return 400, {'errorMessage': f'Invalid value specified for granularity: {granularity}'}
+        count = int(query.get('count', 500))
+        if 'from' in query:
+            first = -(-float(query['from']) // length) * length
+            end = float(query['to']) if 'to' in query else first + (count - 1) * length
+        else:
+            end = float(query.get('to', time.time()))
+            first = (end // length - count + 1) * length
+        end = min(end, time.time())
+        times = np.arange(first, end + 1e-9, length)
+        if len(times) > MAX_CANDLES:
+            return 400, {'errorMessage': 'Maximum value for \'count\' exceeded'}
+        bid_close, ask_close = stub_prices(instrument, times + length)
+        bid_open, ask_open = stub_prices(instrument, times)
+        components = {'B': ('bid', bid_open, bid_close), 'A': ('ask', ask_open, ask_close),
+                      'M': ('mid', (bid_open + ask_open) / 2, (bid_close + ask_close) / 2)}
+        now = time.time()
+        candles = []
+        for n, start in enumerate(times.tolist()):
+            candle = {'complete': start + length <= now, 'volume': 1 + int(start) % 97,
+                      'time': to_unix_string(start, unit='s')}
+            for letter in query.get('price', 'M'):
+                name, opens, closes = components[letter]
+                o, c = float(opens[n]), float(closes[n])
+                candle[name] = {'o': f'{o:.5f}', 'h': f'{max(o, c) + 0.0001:.5f}',
+                                'l': f'{min(o, c) - 0.0001:.5f}', 'c': f'{c:.5f}'}
+            candles.append(candle)
+        return 200, {'instrument': instrument, 'granularity': granularity, 'candles': candles}
+
+    def _stream(self, handler, messages):
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'application/octet-stream')
+        handler.send_header('Transfer-Encoding', 'chunked')
+        handler.end_headers()
+        sent = 0
+        try:
+            for message in messages:
+                line = json.dumps(message).encode() + b'\n'
+                handler.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+                handler.wfile.flush()
+                sent += 1
+                if self.stream_messages is not None and sent >= self.stream_messages:
+                    break
+            handler.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        handler.close_connection = True
+
+    @_route('GET', '/accounts/(?P<account>[^/]+)/pricing/stream')
+    def _pricing_stream(self, handler, query, data, account):
+        instruments = query.get('instruments', '').split(',')
+
+        def messages():
+            last_heartbeat = time.time()
+            while self._server is not None:
+                now = time.time()
+                for instrument in instruments:
+                    bid, ask = map(float, stub_prices(instrument, now))
+                    yield {'type': 'PRICE', 'instrument': instrument, 'time': to_unix_string(now, unit='s'),
+                           'tradeable': True,
+                           'bids': [{'price': f'{bid:.5f}', 'liquidity': 10000000}],
+                           'asks': [{'price': f'{ask:.5f}', 'liquidity': 10000000}],
+                           'closeoutBid': f'{bid:.5f}', 'closeoutAsk': f'{ask:.5f}'}
+                if now - last_heartbeat >= 5:
+                    last_heartbeat = now
+                    yield {'type': 'HEARTBEAT', 'time': to_unix_string(now, unit='s')}
+                time.sleep(self.stream_interval)
+
+        self._stream(handler, messages())
+
+    @_route('GET', '/accounts/(?P<account>[^/]+)/transactions/stream')
+    def _transactions_stream(self, handler, query, data, account):
+        simulated = self.accounts[account]
+
+        def messages():
+            seen = len(simulated.transactions)
+            while self._server is not None:
+                with self._lock:
+                    new = simulated.transactions[seen:]
+                    last = simulated.last_transaction_id
+                seen += len(new)
+                yield from new
+                yield {'type': 'HEARTBEAT', 'time': to_unix_string(time.time(), unit='s'), 'lastTransactionID': last}
+                time.sleep(self.stream_interval)
+
+        self._stream(handler, messages())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a local stub of the OANDA v20 API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--api-key', default=None, help='the only API key accepted')
+    parser.add_argument('--account', action='append', dest='accounts', help='an account ID to serve')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds to wait before each answer')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 500')
+    parser.add_argument('--rate', type=float, default=None, help='requests per second before answering 429')
+    args = parser.parse_args()
+    server = StubServer(args.host, args.port, api_key=args.api_key, accounts=args.accounts, latency=args.latency,
+                        error_rate=args.error_rate, rate=args.rate)
+    print(f'serving the OANDA stub on http://{args.host}:{args.port}/v3')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""
+Benchmark the hot paths of the client stack against a local stub of the API.
+
+    python -m benchmarks.bench_client --output results.json
+    python -m benchmarks.bench_client --compare results.json
+
+Request building and decoding are measured without the network. Session throughput is measured
+against `StubServer`, or against `--base-url` if given.
+"""
+import argparse
+import datetime as dt
+import gc
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+from algotradingstuff.accounts import AccountState, OandaAccount, get_account
+from algotradingstuff.data import CandleFrame
+from algotradingstuff.risk import RiskEngine
+from algotradingstuff.sessions import JsonDecoder, LazyDecoder, Metrics, OandaSession, OrjsonDecoder, send_all
+from algotradingstuff.testing import StubServer
+
+ACCOUNT_ID = '101-001-0000000-001'
+API_KEY = 'bench'
+
+
+def timed(func, iterations):
+    """
+    Call `func` `iterations` times, timing each call
+    :returns: dict with ops per second and p50/p99 latency in microseconds
+    """
+    latencies = np.empty(iterations)
+    for i in range(iterations):
+        start = time.perf_counter_ns()
+        func()
+        latencies[i] = time.perf_counter_ns() - start
+    return {'ops_per_sec': 1e9 / latencies.mean(), 'p50_us': np.percentile(latencies, 50) / 1e3,
+            'p99_us': np.percentile(latencies, 99) / 1e3}
+
+
+def allocations(func, iterations=1000):
+    """
+    Measure the memory `func` allocates
+    :returns: dict with the blocks each call leaves allocated and the peak bytes of one call
+    """
+    gc.collect()
+    kept = []
+    before = sys.getallocatedblocks()
+    for _ in range(iterations):
+        kept.append(func())
+    blocks = (sys.getallocatedblocks() - before) / iterations
+    del kept
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'blocks_per_op': blocks, 'peak_bytes_per_op': peak}
+
+
+def candles_payload(count):
+    candles = [{'complete': True, 'volume': 10 + i % 50, 'time': f'{1600000000 + 60 * i}.000000000',
+                'mid': {'o': f'{1.1 + i * 1e-6:.5f}', 'h': f'{1.1002 + i * 1e-6:.5f}',
+                        'l': f'{1.0998 + i * 1e-6:.5f}', 'c': f'{1.1001 + i * 1e-6:.5f}'}}
+               for i in range(count)]
+    return {'instrument': 'EUR_USD', 'granularity': 'M1', 'candles': candles}
+
+
+def bench_builders(account, iterations):
+    order = {'order': {'type': 'MARKET', 'units': '100', 'instrument': 'EUR_USD', 'timeInForce': 'FOK',
+                       'positionFill': 'DEFAULT'}}
+    cases = {
+        'create_order': lambda: account.create_order(order),
+        'get_orders': account.get_orders,
+        'close_trade': lambda: account.close_trade('1234'),
+        'get_candles_count': lambda: account.get_candles('EUR_USD', count=500),
+        'get_candles_range': lambda: account.get_candles('EUR_USD', start='2020-01-01 00:00:00',
+                                                         end='2020-01-02 00:00:00'),
+        'get_changes': lambda: account.get_changes('1000'),
+    }
+    return {name: {**timed(func, iterations), **allocations(func)} for name, func in cases.items()}
+
+
+def bench_decoding(iterations):
+    body = json.dumps({**candles_payload(500), 'lastTransactionID': '9'}).encode()
+    content = json.loads(body)
+    results = {
+        'json_loads_500_candles': timed(lambda: json.loads(body), iterations),
+        'candle_frame_500_candles': timed(lambda: CandleFrame.from_payload(content), iterations),
+        'stdlib_decoder_500_candles': timed(lambda: JsonDecoder().decode(body), iterations),
+        'lazy_decoder_last_transaction_id': timed(lambda: LazyDecoder().decode(body), iterations),
+    }
+    try:
+        decoder = OrjsonDecoder()
+    except ImportError:
+        pass
+    else:
+        results['orjson_decoder_500_candles'] = timed(lambda: decoder.decode(body), iterations)
+    return results
+
+
+def bench_state_merge(iterations):
+    changes = {'changes': {'ordersCreated': [{'id': str(i), 'type': 'LIMIT'} for i in range(10)],
+                           'tradesOpened': [{'id': str(100 + i), 'currentUnits': '100'} for i in range(10)]},
+               'state': {'NAV': '1000.0', 'unrealizedPL': '1.0',
+                         'trades': [{'id': str(100 + i), 'unrealizedPL': '0.1'} for i in range(10)]}}
+    account = OandaAccount(API_KEY, 'http://localhost/v3', id=ACCOUNT_ID, lastTransactionID='1')
+    state = AccountState.from_account(account)
+
+    def dict_update():
+        account.__dict__.update(**changes['changes'])
+        account.__dict__.update(**changes['state'])
+
+    return {'dict_update': timed(dict_update, iterations),
+            'account_state_apply': timed(lambda: state.apply_changes(changes, '2'), iterations)}
+
+
+def bench_memory():
+    count = 10_000
+    tracemalloc.start()
+    payload = json.loads(json.dumps(candles_payload(count)))
+    as_dicts = tracemalloc.get_traced_memory()[0]
+    frame = CandleFrame.from_payload(payload)
+    del payload
+    gc.collect()
+    as_frame = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del frame
+    return {'json_dicts_bytes_per_10k_candles': as_dicts, 'candle_frame_bytes_per_10k_candles': as_frame}
+
+
+def bench_metrics(iterations):
+    metrics = Metrics()
+    plain = OandaAccount(API_KEY, 'http://localhost/v3', id=ACCOUNT_ID)
+    measured = OandaAccount(API_KEY, 'http://localhost/v3', session=OandaSession(metrics=metrics), id=ACCOUNT_ID)
+    return {'observe': timed(lambda: metrics.observe('GET /v3/accounts', 'ttfb', 123456), iterations),
+            'get_orders_disabled': timed(plain.get_orders, iterations),
+            'get_orders_enabled': timed(measured.get_orders, iterations)}
+
+
+def bench_risk(iterations):
+    engine = RiskEngine(balance=100000.0, max_position_units=1e6, max_margin_ratio=0.5)
+    for i in range(50):
+        engine.update_position({'instrument': f'INSTRUMENT_{i}', 'long': {'units': '1000', 'averagePrice': '1.1'}})
+    tick = {'type': 'PRICE', 'instrument': 'INSTRUMENT_7', 'bids': [{'price': '1.2'}], 'asks': [{'price': '1.2002'}]}
+    engine.update_price(tick)
+    order = {'order': {'type': 'MARKET', 'instrument': 'INSTRUMENT_7', 'units': '100'}}
+    checked = OandaAccount(API_KEY, 'http://localhost/v3', id=ACCOUNT_ID, risk=engine)
+    return {'price_tick': timed(lambda: engine.update_price(tick), iterations),
+            'check_order': timed(lambda: engine.check_order(order), iterations),
+            'create_order_checked': timed(lambda: checked.create_order(order), iterations)}
+
+
+def bench_session(base_url, iterations, workers):
+    session = OandaSession(pool_size=workers)
+    account = get_account(ACCOUNT_ID, API_KEY, base_url, session=session)
+    results = {
+        'get_orders_sequential': timed(lambda: session.send(account.get_orders()), iterations),
+        'get_candles_sequential': timed(lambda: session.send(account.get_candles('EUR_USD', count=500)),
+                                        max(iterations // 10, 1)),
+    }
+    requests = [account.get_orders() for _ in range(iterations)]
+    start = time.perf_counter()
+    send_all(session, requests, max_workers=workers)
+    results['get_orders_concurrent'] = {'ops_per_sec': iterations / (time.perf_counter() - start),
+                                        'workers': workers}
+    session.close()
+    return results
+
+
+def flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{prefix}{key}.'))
+        else:
+            flat[f'{prefix}{key}'] = value
+    return flat
+
+
+def compare(old, new):
+    old, new = flatten(old['results']), flatten(new['results'])
+    print(f'{"metric":<60}{"old":>14}{"new":>14}{"change":>10}')
+    for key in sorted(set(old) & set(new)):
+        if isinstance(old[key], (int, float)) and old[key]:
+            print(f'{key:<60}{old[key]:>14.2f}{new[key]:>14.2f}{(new[key] - old[key]) / old[key]:>+10.1%}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--base-url', default=None, help='the API to measure, instead of a local stub')
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--output', default=None, help='save the results as JSON to this file')
+    parser.add_argument('--compare', default=None, help='a JSON file of earlier results to compare with')
+    args = parser.parse_args()
+
+    account = OandaAccount(API_KEY, 'http://localhost/v3', id=ACCOUNT_ID)
+    results = {'builders': bench_builders(account, args.iterations),
+               'decoding': bench_decoding(max(args.iterations // 10, 1)),
+               'state_merge': bench_state_merge(args.iterations),
+               'memory': bench_memory(),
+               'metrics': bench_metrics(args.iterations),
+               'risk': bench_risk(args.iterations)}
+    if args.base_url is None:
+        with StubServer(api_key=API_KEY) as stub:
+            results['session'] = bench_session(stub.url, args.iterations, args.workers)
+    else:
+        results['session'] = bench_session(args.base_url, args.iterations, args.workers)
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    report = {'commit': commit, 'python': platform.python_version(), 'platform': platform.platform(),
+              'time': dt.datetime.now(dt.timezone.utc).isoformat(), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(report, fh, indent=2, default=float)
+    if args.compare:
+        with open(args.compare, 'r') as fh:
+            compare(json.load(fh), json.loads(json.dumps(report, default=float)))
+    else:
+        for key, value in flatten(results).items():
+            print(f'{key:<60}{value:>14.2f}')
+
+
+if __name__ == '__main__':
+    main()
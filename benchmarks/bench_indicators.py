@@ -0,0 +1,94 @@
+"""
+Compare the vectorized indicators against plain Python loops over the same data.
+
+    python -m benchmarks.bench_indicators --bars 1000000
+"""
+import argparse
+import math
+import time
+import numpy as np
+
+from algotradingstuff import indicators as ind
+
+
+def naive_sma(x, window):
+    out = []
+    for i in range(len(x)):
+        out.append(sum(x[i - window + 1:i + 1]) / window if i >= window - 1 else math.nan)
+    return out
+
+
+def naive_ema(x, span):
+    alpha = 2 / (span + 1)
+    out = [x[0]]
+    for value in x[1:]:
+        out.append(alpha * value + (1 - alpha) * out[-1])
+    return out
+
+
+def naive_rsi(x, window):
+    out = [math.nan] * len(x)
+    gains = [max(b - a, 0) for a, b in zip(x, x[1:])]
+    losses = [max(a - b, 0) for a, b in zip(x, x[1:])]
+    avg_gain = sum(gains[:window]) / window
+    avg_loss = sum(losses[:window]) / window
+    for i in range(window, len(x)):
+        if i > window:
+            avg_gain = (avg_gain * (window - 1) + gains[i - 1]) / window
+            avg_loss = (avg_loss * (window - 1) + losses[i - 1]) / window
+        out[i] = 100.0 if avg_loss == 0 else 100 - 100 / (1 + avg_gain / avg_loss)
+    return out
+
+
+def naive_bollinger(x, window, k=2.0):
+    middle, upper, lower = [], [], []
+    for i in range(len(x)):
+        if i < window - 1:
+            middle.append(math.nan), upper.append(math.nan), lower.append(math.nan)
+            continue
+        values = x[i - window + 1:i + 1]
+        mean = sum(values) / window
+        std = math.sqrt(sum((v - mean) ** 2 for v in values) / window)
+        middle.append(mean), upper.append(mean + k * std), lower.append(mean - k * std)
+    return middle, upper, lower
+
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--bars', type=int, default=1_000_000, help='bars per series')
+    parser.add_argument('--instruments', type=int, default=10, help='rows in the 2-D batch')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    close = 100 + np.cumsum(rng.normal(size=args.bars))
+    batch = 100 + np.cumsum(rng.normal(size=(args.instruments, args.bars)), axis=-1)
+    as_list = close.tolist()
+
+    cases = [
+        ('sma(20)', lambda: ind.sma(close, 20), lambda: naive_sma(as_list, 20)),
+        ('ema(20)', lambda: ind.ema(close, 20), lambda: naive_ema(as_list, 20)),
+        ('rsi(14)', lambda: ind.rsi(close, 14), lambda: naive_rsi(as_list, 14)),
+        ('bollinger(20)', lambda: ind.bollinger(close, 20), lambda: naive_bollinger(as_list, 20)),
+    ]
+    print(f'{"indicator":<16}{"vectorized s":>14}{"loop s":>12}{"speed up":>10}')
+    for name, vectorized, naive in cases:
+        fast = best_of(vectorized, args.repeat)
+        slow = best_of(naive, 1)
+        print(f'{name:<16}{fast:>14.4f}{slow:>12.4f}{slow / fast:>9.0f}x')
+    batched = best_of(lambda: ind.ema(batch, 20), args.repeat)
+    print(f'ema(20) over {args.instruments} instruments: {batched:.4f} s, '
+          f'{args.instruments * args.bars / batched / 1e6:.1f}M bars/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -11,8 +11,9 @@ setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/dcl10/AlgoTradingStuff",
-    packages=find_packages(exclude=["*.tests", "*.tests.*", "tests.*", "tests"]),
-    install_requires=['requests'],
+    packages=find_packages(exclude=["*.tests", "*.tests.*", "tests.*", "tests", "benchmarks", "benchmarks.*"]),
+    install_requires=['requests', 'numpy', 'backports.zoneinfo; python_version<"3.9"', 'tzdata'],
+    extras_require={'async': ['aiohttp'], 'fast': ['orjson']},
     test_suite='tests',
     python_requires='>=3.7',
     license='MIT'
@@ -0,0 +1,113 @@
+import asyncio
+import unittest
+
+try:
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+except ImportError:
+    web = None
+
+from algotradingstuff.accounts import AccountError, AsyncOandaAccount, get_accounts_async, get_account_async
+from algotradingstuff.sessions import AsyncOandaSession
+
+
+def make_app(peers):
+    async def accounts(request):
+        peers.add(request.transport.get_extra_info('peername'))
+        return web.json_response({'accounts': [{'id': '001'}, {'id': '002'}]})
+
+    async def account(request):
+        if request.match_info['id'] != '001':
+            return web.json_response({'errorMessage': 'Invalid value specified for accountID'}, status=400)
+        return web.json_response({'account': {'id': '001', 'balance': '1000.0'}, 'lastTransactionID': '10'})
+
+    async def changes(request):
+        peers.add(request.transport.get_extra_info('peername'))
+        return web.json_response({'changes': {'ordersCreated': []}, 'state': {'NAV': '1000.0'},
+                                  'lastTransactionID': request.query['sinceTransactionID']})
+
+    async def orders(request):
+        peers.add(request.transport.get_extra_info('peername'))
+        body = await request.json()
+        return web.json_response({'orderCreateTransaction': body['order'], 'lastTransactionID': '11'}, status=201)
+
+    async def transactions(request):
+        first = int(request.query.get('from', request.query.get('id', '0')) or 0)
+        first += 'id' in request.query
+        last = int(request.query.get('to', '12'))
+        return web.json_response({'transactions': [{'id': str(i)} for i in range(first, last + 1)],
+                                  'lastTransactionID': '12'})
+
+    app = web.Application()
+    app.router.add_get('/v3/accounts', accounts)
+    app.router.add_get('/v3/accounts/{id}', account)
+    app.router.add_get('/v3/accounts/{id}/changes', changes)
+    app.router.add_post('/v3/accounts/{id}/orders', orders)
+    app.router.add_get('/v3/accounts/{id}/transactions/idrange', transactions)
+    app.router.add_get('/v3/accounts/{id}/transactions/sinceid', transactions)
+    return app
+
+
+@unittest.skipIf(web is None, 'aiohttp is not installed')
+class TestAsyncOandaAccount(unittest.TestCase):
+    """
+    Runs each coroutine on a loop of its own, as IsolatedAsyncioTestCase needs Python 3.8
+    """
+
+    def run_async(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def setUp(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.peers = set()
+        self.server = TestServer(make_app(self.peers))
+        self.run_async(self.server.start_server())
+        self.base_url = str(self.server.make_url('/v3'))
+        self.session = AsyncOandaSession(limit=4)
+
+    def tearDown(self) -> None:
+        self.run_async(self.session.close())
+        self.run_async(self.server.close())
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def test_get_accounts(self):
+        async def run():
+            accounts = await get_accounts_async('key', self.base_url, self.session)
+            self.assertEqual([a.id for a in accounts], ['001', '002'])
+            self.assertIsInstance(accounts[0], AsyncOandaAccount)
+            account = await get_account_async('001', 'key', self.base_url, self.session)
+            self.assertEqual(account.balance, '1000.0')
+            with self.assertRaises(AccountError):
+                await get_account_async('999', 'key', self.base_url, self.session)
+            content, last_transaction_id = await account.get_details()
+            self.assertEqual(content['account']['balance'], '1000.0')
+            self.assertEqual(last_transaction_id, '10')
+            content, last_transaction_id = await account.get_transactions_by_id('3', '5')
+            self.assertEqual([t['id'] for t in content['transactions']], ['3', '4', '5'])
+            content, last_transaction_id = await account.get_transactions_since('10')
+            self.assertEqual([t['id'] for t in content['transactions']], ['11', '12'])
+            self.assertEqual(last_transaction_id, '12')
+
+        self.run_async(run())
+
+    def test_concurrent_requests(self):
+        async def run():
+            accounts = await get_accounts_async('key', self.base_url, self.session)
+            order = {'order': {'type': 'MARKET', 'units': '100', 'instrument': 'GBP_USD'}}
+            results = await asyncio.gather(*(account.create_order(order) for account in accounts * 50))
+            self.assertTrue(all(content['orderCreateTransaction']['units'] == '100' for content, _ in results))
+            self.assertTrue(all(lti == '11' for _, lti in results))
+            updated = await asyncio.gather(*(account.update_account(str(i))
+                                             for i, account in enumerate(accounts * 50)))
+            self.assertEqual(updated[7], '7')
+            self.assertEqual(accounts[0].NAV, '1000.0')
+            # every request went over at most `limit` kept-alive connections
+            self.assertLessEqual(len(self.peers), 4)
+
+        self.run_async(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
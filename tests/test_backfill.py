@@ -0,0 +1,108 @@
+import datetime as dt
+import threading
+import time
+import unittest
+from urllib.parse import urlparse, parse_qs
+
+from algotradingstuff.accounts import OandaAccount
+from algotradingstuff.data import backfill_candles, split_windows, stitch_candles, BackfillError
+from algotradingstuff.sessions import TokenBucket
+
+
+def make_candle(time, complete=True):
+    return {'time': f'{time:.9f}', 'complete': complete, 'volume': 1,
+            'mid': {'o': '1.0', 'h': '1.0', 'l': '1.0', 'c': '1.0'}}
+
+
+class FakeSession:
+    """
+    Answers candle requests with one M1 candle per minute of the requested range
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sent = 0
+
+    def send(self, request, **kwargs):
+        with self.lock:
+            self.sent += 1
+        params = parse_qs(urlparse(request.url).query)
+        start = int(float(params['from'][0]))
+        end = int(float(params['to'][0]))
+        first = start - start % 60 + (60 if start % 60 else 0)
+        return {'candles': [make_candle(t) for t in range(first, end + 1, 60)]}, None
+
+
+class TestBackfill(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.account = OandaAccount('key', 'https://example.com/v3', id='001')
+
+    def test_split_windows(self):
+        windows = split_windows(0, 60 * 10000, 'M1')
+        self.assertEqual(windows[0], (0, 60 * 4999))
+        self.assertEqual(windows[-1][1], 60 * 10000)
+        self.assertEqual(len(windows), 3)
+        self.assertRaises(ValueError, split_windows, 10, 0, 'M1')
+
+    def test_stitch_candles(self):
+        chunks = [[make_candle(0), make_candle(60, complete=False)],
+                  [make_candle(60), make_candle(240)]]
+        candles, gaps = stitch_candles(chunks, 'M1')
+        self.assertEqual([float(c['time']) for c in candles], [0, 60, 240])
+        self.assertTrue(candles[1]['complete'])
+        self.assertEqual(gaps, [(60, 240)])
+
+    def test_weekend_isnt_gap(self):
+        # the market is closed from 17:00 on Friday to 17:00 on Sunday in New York
+        friday = dt.datetime(2020, 1, 10, 21, 59, tzinfo=dt.timezone.utc).timestamp()
+        sunday = dt.datetime(2020, 1, 12, 22, tzinfo=dt.timezone.utc).timestamp()
+        candles, gaps = stitch_candles([[make_candle(friday), make_candle(sunday), make_candle(sunday + 600)]], 'M1')
+        self.assertEqual(gaps, [(sunday, sunday + 600)])
+        # the clocks go back on the first Sunday of November, so it reopens an hour later in UTC
+        friday = dt.datetime(2020, 10, 30, 20, 59, tzinfo=dt.timezone.utc).timestamp()
+        sunday = dt.datetime(2020, 11, 1, 22, tzinfo=dt.timezone.utc).timestamp()
+        self.assertEqual(stitch_candles([[make_candle(friday), make_candle(sunday)]], 'M1')[1], [])
+        self.assertEqual(stitch_candles([[make_candle(friday - 60), make_candle(sunday)]], 'M1')[1],
+                         [(friday - 60, sunday)])
+        self.assertEqual(stitch_candles([[make_candle(friday), make_candle(sunday + 60)]], 'M1')[1],
+                         [(friday, sunday + 60)])
+        daily = [make_candle(dt.datetime(2020, 1, day, 22, tzinfo=dt.timezone.utc).timestamp()) for day in (8, 9, 12)]
+        self.assertEqual(stitch_candles([daily], 'D')[1], [])
+
+    def test_backfill_candles(self):
+        session = FakeSession()
+        start = dt.datetime(2020, 1, 1)
+        end = start + dt.timedelta(days=10)
+        series = backfill_candles(self.account, ['EUR_USD', 'GBP_USD'], start, end,
+                                  session=session, max_workers=4, rate=None)
+        self.assertEqual(session.sent, 6)
+        for instrument in ('EUR_USD', 'GBP_USD'):
+            self.assertEqual(len(series[instrument]), 10 * 24 * 60 + 1)
+            self.assertEqual(series[instrument].gaps, [])
+
+    def test_backfill_error(self):
+        class ErrorSession:
+            def send(self, request, **kwargs):
+                return {'errorMessage': 'Too many requests'}, None
+
+        start = dt.datetime(2020, 1, 1)
+        self.assertRaises(BackfillError, backfill_candles, self.account, ['EUR_USD'], start,
+                          start + dt.timedelta(hours=1), session=ErrorSession())
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_acquire(self):
+        bucket = TokenBucket(rate=50, capacity=5)
+        for _ in range(5):
+            self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+        began = time.monotonic()
+        self.assertTrue(bucket.acquire(5))
+        self.assertGreaterEqual(time.monotonic() - began, 0.08)
+        self.assertFalse(bucket.acquire(5, timeout=0.01))
+
+
+if __name__ == '__main__':
+    unittest.main()
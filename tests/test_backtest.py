@@ -0,0 +1,120 @@
+import time
+import unittest
+import numpy as np
+
+from algotradingstuff.backtest import SimulatedAccount, Backtester, backtest_positions
+from algotradingstuff.data import CandleFrame
+
+
+def make_frames(close, spread=0.0002):
+    n = len(close)
+    times = np.arange(n, dtype=np.int64) * 60 * 10 ** 9
+    mid = CandleFrame(times, close, close + 0.001, close - 0.001, close, np.ones(n), np.ones(n, bool))
+    bid = CandleFrame(times, mid.open - spread / 2, mid.high - spread / 2, mid.low - spread / 2,
+                      mid.close - spread / 2, mid.volume, mid.complete)
+    ask = CandleFrame(times, mid.open + spread / 2, mid.high + spread / 2, mid.low + spread / 2,
+                      mid.close + spread / 2, mid.volume, mid.complete)
+    return bid, ask
+
+
+class TestSimulatedAccount(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.account = SimulatedAccount(balance=1000.0)
+        self.account.on_bar('EUR_USD', 0, (1.0, 1.0, 1.0, 1.0), (1.1, 1.1, 1.1, 1.1))
+
+    def order(self, units, kind='MARKET', **fields):
+        return self.account.create_order({'order': {'type': kind, 'instrument': 'EUR_USD', 'units': str(units),
+                                                    **fields}})
+
+    def test_market_orders(self):
+        content, lti = self.order(100)
+        self.assertEqual(content['orderFillTransaction']['price'], '1.1')
+        self.assertEqual(content['orderFillTransaction']['tradeOpened']['units'], '100')
+        self.order(50)
+        content, _ = self.order(-120)
+        fill = content['orderFillTransaction']
+        self.assertEqual([c['units'] for c in fill['tradesClosed']], ['-100'])
+        self.assertEqual(fill['tradeReduced']['units'], '-20')
+        self.assertAlmostEqual(float(fill['pl']), -12.0)
+        self.assertAlmostEqual(self.account.balance, 988.0)
+        trades, _ = self.account.get_open_trades()
+        self.assertEqual([t['currentUnits'] for t in trades['trades']], ['30'])
+        positions, _ = self.account.get_open_positions()
+        self.assertEqual(positions['positions'][0]['long']['units'], '30')
+        self.assertEqual(positions['positions'][0]['short']['units'], '0')
+
+    def test_rejects(self):
+        content, _ = self.account.create_order({'order': {'type': 'MARKET', 'instrument': 'GBP_USD', 'units': '1'}})
+        self.assertEqual(content['orderRejectTransaction']['rejectReason'], 'INSTRUMENT_PRICE_UNKNOWN')
+        content, _ = self.order(10, positionFill='REDUCE_ONLY')
+        self.assertIn('orderCancelTransaction', content)
+        content, _ = self.order(10, priceBound='1.05')
+        self.assertEqual(content['orderCancelTransaction']['reason'], 'BOUNDS_VIOLATION')
+
+    def test_pending_orders(self):
+        content, _ = self.order(100, 'LIMIT', price='1.05')
+        order_id = content['orderCreateTransaction']['id']
+        self.assertIn(order_id, self.account.orders)
+        content, _ = self.order(100, 'LIMIT', price='1.05', timeInForce='FOK')
+        self.assertIn('orderCancelTransaction', content)
+        self.order(-100, 'STOP', price='0.9', timeInForce='GTD', gtdTime='120.000000000')
+        self.account.on_bar('EUR_USD', 60 * 10 ** 9, (1.0, 1.0, 1.0, 1.0), (1.07, 1.08, 1.04, 1.06))
+        self.assertNotIn(order_id, self.account.orders)
+        trades, _ = self.account.get_open_trades()
+        self.assertEqual(trades['trades'][0]['price'], '1.05')
+        self.assertEqual(len(self.account.orders), 1)
+        self.account.on_bar('EUR_USD', 120 * 10 ** 9, (1.0, 1.0, 1.0, 1.0), (1.1, 1.1, 1.1, 1.1))
+        self.assertEqual(self.account.orders, {})
+
+    def test_close(self):
+        content, _ = self.order(100)
+        trade_id = content['orderFillTransaction']['tradeOpened']['tradeID']
+        self.order(-40, positionFill='OPEN_ONLY')
+        content, _ = self.account.close_trade(trade_id)
+        self.assertEqual(content['orderFillTransaction']['tradesClosed'][0]['tradeID'], trade_id)
+        content, _ = self.account.close_position('EUR_USD', long=False)
+        self.assertEqual(content['shortOrderFillTransaction']['units'], '40')
+        self.assertEqual(self.account.trades, {})
+        content, _ = self.account.close_position('EUR_USD', long=True)
+        self.assertIn('errorMessage', content)
+
+
+class TestBacktester(unittest.TestCase):
+
+    def setUp(self) -> None:
+        rng = np.random.default_rng(3)
+        self.close = 1.1 + np.cumsum(rng.normal(scale=0.0005, size=2000))
+        self.position = np.where(self.close > np.convolve(self.close, np.ones(20) / 20, 'same'), 1000.0, -1000.0)
+        self.bid, self.ask = make_frames(self.close)
+
+    def test_matches_vectorized(self):
+        position = self.position
+
+        def strategy(account, bar):
+            trades = account.trades.values()
+            held = sum(trade['currentUnits'] for trade in trades)
+            wanted = int(position[bar.index])
+            if wanted != held:
+                account.create_order({'order': {'type': 'MARKET', 'instrument': bar.instrument,
+                                                'units': str(wanted - held)}})
+
+        result = Backtester({'EUR_USD': self.bid}, {'EUR_USD': self.ask}, strategy).run()
+        vectorized = backtest_positions(position, self.bid.close, self.ask.close)
+        np.testing.assert_allclose(result.equity - 100000.0, vectorized.equity, atol=1e-6)
+        self.assertEqual(result.summary()['trades'], vectorized.trades)
+
+    def test_vectorized_throughput(self):
+        n = 1_000_000
+        position = np.resize(self.position, n)
+        bid, ask = np.resize(self.bid.close, n), np.resize(self.ask.close, n)
+        start = time.perf_counter()
+        result = backtest_positions(position, bid, ask)
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertEqual(result.equity.shape, (n,))
+        batch = backtest_positions(np.stack([position, -position]), bid, ask)
+        self.assertEqual(batch.summary()['pl'].shape, (2,))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import threading
+import time
+import unittest
+from requests.exceptions import ConnectionError
+
+from algotradingstuff.accounts import (OandaAccount, submit_orders, cancel_orders, close_positions,
+                                       close_all_trades)
+
+
+class FakeTradingSession:
+    """
+    Answers each request after a short delay, counting how many are in flight at once
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.most_in_flight = 0
+        self.next_id = 100
+
+    def send(self, request, **kwargs):
+        with self.lock:
+            self.in_flight += 1
+            self.most_in_flight = max(self.most_in_flight, self.in_flight)
+            self.next_id += 1
+            transaction_id = str(self.next_id)
+        time.sleep(0.01)
+        with self.lock:
+            self.in_flight -= 1
+        if request.url.endswith('/openTrades'):
+            return {'trades': [{'id': str(i)} for i in range(20)]}, transaction_id
+        if '/orders/bad/' in request.url:
+            return {'errorMessage': 'The Order specified does not exist'}, transaction_id
+        if '/positions/USD_JPY/' in request.url:
+            raise ConnectionError('connection reset')
+        if b'"-1"' in (request.body or b''):
+            return {'orderRejectTransaction': {'rejectReason': 'UNITS_INVALID'}}, transaction_id
+        return {'orderFillTransaction': {}}, transaction_id
+
+
+class TestBulk(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.session = FakeTradingSession()
+        self.account = OandaAccount('key', 'https://example.com/v3', session=self.session, id='001')
+
+    def test_submit_orders(self):
+        orders = [{'order': {'type': 'MARKET', 'instrument': 'EUR_USD', 'units': str(units)}}
+                  for units in (100, -1, 200, 300)]
+        report = submit_orders(self.account, orders, max_in_flight=2)
+        self.assertEqual(len(report), 4)
+        self.assertEqual([result.item for result in report.failed], [orders[1]])
+        self.assertEqual(len(report.succeeded), 3)
+        self.assertEqual(report.last_transaction_id, '104')
+        self.assertLessEqual(self.session.most_in_flight, 2)
+
+    def test_cancel_and_close(self):
+        report = cancel_orders(self.account, ['1', 'bad'])
+        self.assertEqual([result.ok for result in report], [True, False])
+        report = close_positions(self.account, ['EUR_USD', ('USD_JPY', False)])
+        self.assertTrue(report.results[0].ok)
+        self.assertIsInstance(report.results[1].error, ConnectionError)
+
+    def test_close_all_trades(self):
+        report = close_all_trades(self.account, max_in_flight=20)
+        self.assertEqual(len(report.succeeded), 20)
+        self.assertGreater(self.session.most_in_flight, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
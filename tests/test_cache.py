@@ -0,0 +1,69 @@
+import datetime as dt
+import mmap
+import os
+import tempfile
+import unittest
+import numpy as np
+
+from algotradingstuff.accounts import OandaAccount
+from algotradingstuff.data import CandleCache
+from tests.test_backfill import FakeSession
+
+
+class TestCandleCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = CandleCache(self.directory.name)
+        self.account = OandaAccount('key', 'https://example.com/v3', id='001')
+        self.session = FakeSession()
+        self.start = dt.datetime(2020, 1, 1)
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_get_candles(self):
+        end = self.start + dt.timedelta(hours=2)
+        frame = self.cache.get_candles(self.account, 'EUR_USD', self.start, end, session=self.session, rate=None)
+        self.assertEqual(len(frame), 120)
+        self.assertEqual(self.session.sent, 1)
+        base = frame.close
+        while isinstance(base, np.ndarray):
+            base = base.base
+        self.assertIsInstance(base, mmap.mmap)
+        again = self.cache.get_candles(self.account, 'EUR_USD', self.start, end, session=self.session, rate=None)
+        self.assertEqual(self.session.sent, 1)
+        np.testing.assert_array_equal(again.time, frame.time)
+        # only the hour after the cached range is downloaded
+        later = self.cache.get_candles(self.account, 'EUR_USD', self.start, end + dt.timedelta(hours=1),
+                                       session=self.session, rate=None)
+        self.assertEqual(self.session.sent, 2)
+        self.assertEqual(len(later), 180)
+        self.assertTrue(np.all(np.diff(later.time) == 60 * 10 ** 9))
+
+    def test_write_out_of_order(self):
+        end = self.start + dt.timedelta(hours=1)
+        self.cache.get_candles(self.account, 'EUR_USD', end, end + dt.timedelta(hours=1),
+                               session=self.session, rate=None)
+        frame = self.cache.get_candles(self.account, 'EUR_USD', self.start, end + dt.timedelta(hours=1),
+                                       session=self.session, rate=None)
+        self.assertEqual(len(frame), 120)
+        self.assertTrue(np.all(np.diff(frame.time) == 60 * 10 ** 9))
+        self.assertEqual(len(self.cache.coverage('EUR_USD', 'M1')), 1)
+
+    def test_evict(self):
+        self.cache.max_bytes = 120 * 49 + 1
+        end = self.start + dt.timedelta(hours=2)
+        self.cache.get_candles(self.account, 'EUR_USD', self.start, end, session=self.session, rate=None)
+        self.cache.get_candles(self.account, 'GBP_USD', self.start, end, session=self.session, rate=None)
+        # the lock files of evicted files go with them
+        self.assertEqual(sorted(name for name in os.listdir(self.cache.directory) if name.endswith('.lock')),
+                         [name[:-len('.bin')] + '.lock' for name in os.listdir(self.cache.directory)
+                          if name.endswith('.bin')])
+        self.assertEqual(len(self.cache.read('EUR_USD', 'M1')), 0)
+        self.assertEqual(len(self.cache.read('GBP_USD', 'M1')), 120)
+        self.assertLessEqual(self.cache.size(), self.cache.max_bytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
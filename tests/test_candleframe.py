@@ -0,0 +1,52 @@
+import unittest
+import numpy as np
+
+from algotradingstuff.data import CandleFrame, parse_times
+
+
+def make_payload(times, component='mid'):
+    return {'instrument': 'EUR_USD', 'granularity': 'M1',
+            'candles': [{'time': f'{t}.000000000', 'complete': True, 'volume': i,
+                         component: {'o': '1.10000', 'h': '1.20000', 'l': '1.00000', 'c': f'{1 + i / 10:.5f}'}}
+                        for i, t in enumerate(times)]}
+
+
+class TestCandleFrame(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.frame = CandleFrame.from_payload(make_payload(range(0, 600, 60)))
+
+    def test_parse_times(self):
+        self.assertEqual(parse_times(['1500000000.123456789'])[0], 1500000000123456789)
+        self.assertEqual(parse_times(['1500000000.5'])[0], 1500000000500000000)
+        self.assertEqual(parse_times(['2017-07-14T02:40:00.000000000Z'])[0], 1500000000000000000)
+
+    def test_from_payload(self):
+        self.assertEqual(len(self.frame), 10)
+        self.assertEqual(self.frame.instrument, 'EUR_USD')
+        self.assertEqual(self.frame.time.dtype, np.int64)
+        self.assertEqual(self.frame.time[1], 60 * 10 ** 9)
+        self.assertAlmostEqual(self.frame.close[3], 1.3)
+        self.assertEqual(self.frame.volume[3], 3)
+        self.assertTrue(self.frame.complete.all())
+        bid = CandleFrame.from_payload(make_payload([0], 'bid'))
+        self.assertAlmostEqual(bid.high[0], 1.2)
+
+    def test_between(self):
+        part = self.frame.between(120 * 10 ** 9, 300 * 10 ** 9)
+        self.assertEqual(list(part.time // 10 ** 9), [120, 180, 240])
+        self.assertTrue(np.shares_memory(part.close, self.frame.close))
+        self.assertEqual(len(self.frame[-1]), 1)
+
+    def test_concat(self):
+        joined = CandleFrame.concat([self.frame[:5], self.frame[5:]])
+        np.testing.assert_array_equal(joined.time, self.frame.time)
+        later = CandleFrame.from_payload(make_payload([480, 540, 600]))
+        joined = CandleFrame.concat([self.frame, later])
+        self.assertEqual(len(joined), 11)
+        self.assertEqual(joined.volume[8], 0)
+        self.assertEqual(len(CandleFrame.concat([])), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import json
+import unittest
+from decimal import Decimal
+from functools import partial
+
+from algotradingstuff.accounts import Candle, OandaAccount, Order, Position, Trade, Transaction, to_models
+from algotradingstuff.sessions import JsonDecoder, LazyContent, LazyDecoder, OandaSession, OrjsonDecoder
+from algotradingstuff.sessions.decoders import orjson
+from tests.test_pooling import FakeAdapter
+
+CONTENT = {
+    'account': {'id': '001', 'lastTransactionID': '41'},
+    'trades': [{'id': '7', 'instrument': 'EUR_USD', 'price': '1.10450', 'currentUnits': '-100',
+                'unrealizedPL': '0.5000'}],
+    'lastTransactionID': '42',
+}
+
+
+class TestDecoders(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.body = json.dumps(CONTENT).encode()
+
+    def test_json_decoder(self):
+        content, lti = JsonDecoder().decode(self.body)
+        self.assertEqual(lti, '42')
+        self.assertNotIn('lastTransactionID', content)
+        self.assertEqual(content['account']['lastTransactionID'], '41')
+
+    @unittest.skipIf(orjson is None, 'orjson is not installed')
+    def test_orjson_decoder(self):
+        self.assertEqual(OrjsonDecoder().decode(self.body), JsonDecoder().decode(self.body))
+
+    def test_lazy_decoder(self):
+        content, lti = LazyDecoder().decode(self.body)
+        self.assertEqual(lti, '42')
+        self.assertIsInstance(content, LazyContent)
+        self.assertFalse(content.parsed)
+        self.assertEqual(content['trades'][0]['id'], '7')
+        self.assertTrue(content.parsed)
+        self.assertNotIn('lastTransactionID', content)
+        self.assertIsNone(LazyDecoder().decode(b'{"accounts": []}')[1])
+        # a nested lastTransactionID after the top level one isn't taken for it
+        body = b'{"lastTransactionID": "42", "account": {"id": "001", "lastTransactionID": "41"}}'
+        self.assertEqual(LazyDecoder().decode(body)[1], '42')
+        self.assertIsNone(LazyDecoder().decode(b'{"account": {"lastTransactionID": "41"}}')[1])
+
+    def test_session_decoder(self):
+        session = OandaSession(decoder=JsonDecoder(hook=to_models))
+        session.mount('https://', FakeAdapter(CONTENT))
+        account = OandaAccount('key', 'https://example.com/v3', session=session, id='001')
+        content, lti = session.send(account.get_open_trades())
+        self.assertEqual(lti, '42')
+        self.assertIsInstance(content['trades'][0], Trade)
+
+    def test_default_session_unchanged(self):
+        session = OandaSession()
+        session.mount('https://', FakeAdapter(CONTENT))
+        account = OandaAccount('key', 'https://example.com/v3', session=session, id='001')
+        content, lti = session.send(account.get_open_trades())
+        self.assertEqual(lti, '42')
+        self.assertEqual(content['trades'], CONTENT['trades'])
+
+
+class TestModels(unittest.TestCase):
+
+    def test_fields_convert_on_access(self):
+        trade = Trade(dict(CONTENT['trades'][0]))
+        self.assertIsNone(trade._values)
+        self.assertEqual(trade.price, 1.1045)
+        self.assertEqual(trade.current_units, -100.0)
+        self.assertEqual(trade._values, {'price': 1.1045, 'current_units': -100.0})
+        self.assertIsNone(trade.realized_pl)
+        self.assertEqual(trade['instrument'], 'EUR_USD')
+        with self.assertRaises(AttributeError):
+            trade.extra = 1
+
+    def test_decimal_and_update(self):
+        trade = Trade(CONTENT['trades'][0], number=Decimal)
+        self.assertEqual(trade.price, Decimal('1.10450'))
+        trade.update({**CONTENT['trades'][0], 'price': '1.20000'})
+        self.assertEqual(trade.price, Decimal('1.2'))
+
+    def test_position(self):
+        position = Position({'instrument': 'EUR_USD', 'long': {'units': '300', 'averagePrice': '1.1'},
+                             'short': {'units': '-100'}})
+        self.assertEqual(position.long_average_price, 1.1)
+        self.assertIsNone(position.short_average_price)
+        self.assertEqual(position.units, 200.0)
+
+    def test_candle(self):
+        candle = Candle({'time': '1.0', 'volume': 5, 'complete': True,
+                         'bid': {'o': '1.0', 'h': '2.0', 'l': '0.5', 'c': '1.5'},
+                         'ask': {'o': '1.1', 'h': '2.1', 'l': '0.6', 'c': '1.6'}})
+        self.assertEqual((candle.open, candle.high, candle.low, candle.close), (1.0, 2.0, 0.5, 1.5))
+        self.assertEqual(candle.prices('ask'), (1.1, 2.1, 0.6, 1.6))
+        self.assertEqual(candle.volume, 5)
+
+    def test_to_models(self):
+        content = to_models({'orders': [{'id': '1', 'price': '1.5'}], 'orderFillTransaction': {'id': '2', 'pl': '3'},
+                             'relatedTransactionIDs': ['1', '2']}, number=Decimal)
+        self.assertIsInstance(content['orders'][0], Order)
+        self.assertIsInstance(content['orderFillTransaction'], Transaction)
+        self.assertEqual(content['orderFillTransaction'].pl, Decimal(3))
+        self.assertEqual(content['relatedTransactionIDs'], ['1', '2'])
+        hook = partial(to_models, number=Decimal)
+        content, _ = JsonDecoder(hook=hook).decode(b'{"candles": [{"mid": {"o": "1", "h": "1", "l": "1", "c": "1"}}]}')
+        self.assertEqual(content['candles'][0].close, Decimal(1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import numpy as np
+
+from algotradingstuff import indicators as ind
+
+
+def run(indicator, *columns):
+    results = [indicator.update(*values) for values in zip(*columns)]
+    return np.array(results, dtype=np.float64).T
+
+
+class TestIndicators(unittest.TestCase):
+
+    def setUp(self) -> None:
+        rng = np.random.default_rng(1)
+        self.close = 100 + np.cumsum(rng.normal(size=(3, 500)), axis=-1)
+        self.high = self.close + rng.uniform(0, 1, size=self.close.shape)
+        self.low = self.close - rng.uniform(0, 1, size=self.close.shape)
+        self.volume = rng.integers(1, 100, size=self.close.shape)
+
+    def assertClose(self, vectorized, incremental):
+        np.testing.assert_allclose(vectorized, incremental, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+    def test_sma_ema(self):
+        np.testing.assert_allclose(ind.sma([1, 2, 3, 4], 2), [np.nan, 1.5, 2.5, 3.5])
+        np.testing.assert_allclose(ind.ema([1, 2, 3], 3), [1, 1.5, 2.25])
+        for row in range(3):
+            self.assertClose(ind.sma(self.close, 20)[row], run(ind.SMA(20), self.close[row]))
+            self.assertClose(ind.ema(self.close, 20)[row], run(ind.EMA(20), self.close[row]))
+
+    def test_oscillators(self):
+        for row in range(3):
+            self.assertClose(ind.rsi(self.close, 14)[row], run(ind.RSI(14), self.close[row]))
+            self.assertClose(ind.atr(self.high, self.low, self.close, 14)[row],
+                             run(ind.ATR(14), self.high[row], self.low[row], self.close[row]))
+            self.assertClose(ind.zscore(self.close, 30)[row], run(ind.ZScore(30), self.close[row]))
+        self.assertTrue(np.isnan(ind.rsi(self.close, 14)[:, :14]).all())
+        self.assertFalse(np.isnan(ind.rsi(self.close, 14)[:, 14:]).any())
+        self.assertTrue(((ind.rsi(self.close) >= 0) | np.isnan(ind.rsi(self.close))).all())
+
+    def test_bands(self):
+        middle, upper, lower = ind.bollinger(self.close[0], 20)
+        incremental = run(ind.Bollinger(20), self.close[0])
+        for vectorized, expected in zip((middle, upper, lower), incremental):
+            self.assertClose(vectorized, expected)
+        self.assertAlmostEqual(upper[19] - middle[19], 2 * np.std(self.close[0, :20]))
+        for vectorized, expected in zip(ind.macd(self.close[1]), run(ind.MACD(), self.close[1])):
+            self.assertClose(vectorized, expected)
+
+    def test_vwap(self):
+        for window in (None, 10):
+            self.assertClose(ind.vwap(self.close, self.volume, window)[2],
+                             run(ind.VWAP(window), self.close[2], self.volume[2]))
+
+    def test_long_series(self):
+        x = 100 + np.cumsum(np.random.default_rng(2).normal(size=20000))
+        self.assertClose(ind.ema(x, 3), run(ind.EMA(3), x))
+
+
+if __name__ == '__main__':
+    unittest.main()
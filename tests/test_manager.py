@@ -0,0 +1,77 @@
+import unittest
+
+from algotradingstuff.accounts import AccountError, AccountManager, OandaAccount, get_account, get_accounts
+from algotradingstuff.sessions import OandaSession, OandaStreamSession
+from algotradingstuff.testing import StubServer
+
+ACCOUNT_IDS = ['101-001-0000000-001', '101-001-0000000-002', '101-001-0000000-003']
+
+
+class TestAccountManager(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.server = StubServer(api_key='key', accounts=ACCOUNT_IDS, stream_interval=0.01).start()
+        self.session = OandaSession()
+        self.manager = AccountManager(get_accounts('key', self.server.url, session=self.session), session=self.session)
+
+    def tearDown(self) -> None:
+        self.manager.stop()
+        self.session.close()
+        self.server.stop()
+
+    def order(self, account_id, units, instrument='EUR_USD'):
+        account = self.manager.accounts[account_id]
+        _, last_transaction_id = self.session.send(account.create_order(
+            {'order': {'type': 'MARKET', 'units': str(units), 'instrument': instrument}}))
+        return last_transaction_id
+
+    def test_refresh_loads_accounts(self):
+        self.assertEqual(self.manager.dirty, ACCOUNT_IDS)
+        self.assertEqual(self.manager.refresh(), dict.fromkeys(ACCOUNT_IDS, 0))
+        self.assertEqual(self.manager.dirty, [])
+        self.assertEqual(self.manager.last_transaction_ids, dict.fromkeys(ACCOUNT_IDS, '1'))
+        self.assertEqual(self.manager.nav, 300000.0)
+
+    def test_refresh_only_dirty(self):
+        self.manager.refresh()
+        last_transaction_id = self.order(ACCOUNT_IDS[1], 100)
+        self.order(ACCOUNT_IDS[2], -30)
+        self.assertTrue(self.manager.see(ACCOUNT_IDS[1], {'type': 'ORDER_FILL', 'id': last_transaction_id}))
+        self.assertEqual(self.manager.dirty, [ACCOUNT_IDS[1]])
+        requests = self.server.requests
+        self.assertEqual(list(self.manager.refresh()), [ACCOUNT_IDS[1]])
+        self.assertEqual(self.server.requests, requests + 1)
+        self.assertEqual(self.manager.exposure(), {'EUR_USD': 100.0})
+        self.manager.refresh(ACCOUNT_IDS)
+        self.assertEqual(self.manager.exposure(), {'EUR_USD': 70.0})
+        self.assertGreater(self.manager.margin_used, 0)
+
+    def test_watch(self):
+        self.manager.refresh()
+        self.manager.watch(OandaStreamSession(), max_retries=0)
+        self.assertFalse(self.manager.wait(timeout=0.1))
+        self.order(ACCOUNT_IDS[0], 10, 'GBP_USD')
+        self.assertTrue(self.manager.wait(timeout=5))
+        self.assertEqual(list(self.manager.refresh()), [ACCOUNT_IDS[0]])
+        self.assertEqual(self.manager.exposure(), {'GBP_USD': 10.0})
+
+    def test_details_already_loaded(self):
+        account = get_account(ACCOUNT_IDS[0], 'key', self.server.url, session=self.session)
+        manager = AccountManager([account], session=self.session)
+        self.assertEqual(manager.dirty, [])
+
+    def test_failed_refresh(self):
+        missing = OandaAccount('key', self.server.url, session=self.session, id='999')
+        manager = AccountManager([missing] + list(self.manager.accounts.values()), session=self.session)
+        self.assertRaises(AccountError, manager.refresh)
+        self.assertEqual(manager.dirty, ['999'])
+        # accounts that are loaded are refreshed even when another fails to load
+        last_transaction_id = self.order(ACCOUNT_IDS[0], 25)
+        manager.see(ACCOUNT_IDS[0], {'type': 'ORDER_FILL', 'id': last_transaction_id})
+        self.assertRaises(AccountError, manager.refresh)
+        self.assertEqual(manager.dirty, ['999'])
+        self.assertEqual(manager.exposure(), {'EUR_USD': 25.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
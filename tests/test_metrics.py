@@ -0,0 +1,98 @@
+import json
+import threading
+import unittest
+from requests.exceptions import ConnectionError
+
+from algotradingstuff.accounts import OandaAccount, get_account
+from algotradingstuff.sessions import Metrics, OandaSession, Scheduler
+from algotradingstuff.sessions.metrics import Histogram, endpoint
+from algotradingstuff.testing import StubServer
+
+ACCOUNT_ID = '101-001-0000000-001'
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_endpoint(self):
+        account = OandaAccount('key', 'https://example.com/v3', id=ACCOUNT_ID)
+        self.assertEqual(endpoint(account.cancel_order('12')),
+                         'PUT /v3/accounts/{accountID}/orders/{orderSpecifier}/cancel')
+        self.assertEqual(endpoint(account.get_candles('EUR_USD', count=5)),
+                         'GET /v3/accounts/{accountID}/instruments/{instrument}/candles')
+        self.assertEqual(endpoint(account.get_transactions_by_id('1', '5')),
+                         'GET /v3/accounts/{accountID}/transactions/idrange')
+
+    def test_histogram(self):
+        histogram = Histogram([10, 100, 1000])
+        for value in (5, 50, 50, 500, 5000):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [1, 2, 1, 1])
+        self.assertEqual(histogram.count, 5)
+        self.assertEqual(histogram.quantile(0.5), 100)
+        self.assertEqual(histogram.quantile(1), float('inf'))
+        self.assertIsNone(Histogram([1]).quantile(0.5))
+
+    def test_threads_merge(self):
+        metrics = Metrics()
+
+        def record():
+            for _ in range(1000):
+                metrics.observe('GET /x', 'ttfb', 2000)
+                metrics.count('GET /x', 'requests')
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        snapshot = metrics.snapshot()['GET /x']
+        self.assertEqual(snapshot['requests'], 4000)
+        self.assertEqual(snapshot['ttfb']['count'], 4000)
+        self.assertAlmostEqual(snapshot['ttfb']['sum'], 4000 * 2e-6)
+        metrics.reset()
+        self.assertEqual(metrics.snapshot(), {})
+
+    def test_session(self):
+        metrics = Metrics()
+        with StubServer(api_key='key', rate=5) as server:
+            session = OandaSession(metrics=metrics, scheduler=Scheduler(rate=None, retries=5))
+            account = get_account(ACCOUNT_ID, 'key', server.url, session=session)
+            for _ in range(8):
+                session.send(account.get_orders())
+            session.close()
+        name = 'GET /v3/accounts/{accountID}/orders'
+        snapshot = json.loads(metrics.to_json())[name]
+        self.assertEqual(snapshot['requests'], 8)
+        self.assertGreater(snapshot['retries'], 0)
+        for stage in ('prepare', 'queue', 'pool_wait', 'connect', 'ttfb', 'download', 'decode', 'response_bytes'):
+            self.assertEqual(snapshot[stage]['count'], 8, stage)
+        self.assertGreater(metrics.histogram('GET /v3/accounts/{accountID}', 'connect').sum, 0)
+        text = metrics.to_prometheus()
+        self.assertIn('# TYPE algotradingstuff_client_duration_seconds histogram', text)
+        self.assertIn(f'algotradingstuff_client_requests_total{{endpoint="{name}"}} 8', text)
+        self.assertIn(f'algotradingstuff_client_duration_seconds_count{{endpoint="{name}",stage="ttfb"}} 8', text)
+
+    def test_connection_errors(self):
+        metrics = Metrics()
+        with StubServer(api_key='key') as server:
+            url = server.url
+        session = OandaSession(metrics=metrics, scheduler=Scheduler(rate=None, retries=2, backoff_factor=0.01))
+        account = OandaAccount('key', url, session=session, id=ACCOUNT_ID)
+        self.assertRaises(ConnectionError, session.send, account.get_orders())
+        session.close()
+        snapshot = metrics.snapshot()['GET /v3/accounts/{accountID}/orders']
+        self.assertEqual(snapshot['requests'], 1)
+        self.assertEqual(snapshot['errors'], 3)
+        self.assertEqual(snapshot['retries'], 2)
+
+    def test_disabled(self):
+        session = OandaSession()
+        account = OandaAccount('key', 'https://example.com/v3', session=session, id=ACCOUNT_ID)
+        account.get_orders()
+        self.assertIsNone(session.metrics)
+        # with metrics off the account keeps the plain builder
+        self.assertIs(account.get_orders.__func__, OandaAccount.get_orders.builder)
+
+
+if __name__ == '__main__':
+    unittest.main()
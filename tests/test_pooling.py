@@ -0,0 +1,72 @@
+import io
+import json
+import unittest
+from requests import Response
+from requests.adapters import BaseAdapter
+
+from algotradingstuff.accounts import OandaAccount, get_accounts
+from algotradingstuff.sessions import OandaSession
+
+
+class FakeAdapter(BaseAdapter):
+
+    def __init__(self, content):
+        super().__init__()
+        self.content = content
+        self.sent = []
+
+    def send(self, request, **kwargs):
+        self.sent.append(request)
+        res = Response()
+        res.status_code = 200
+        res.reason = 'OK'
+        res.raw = io.BytesIO(json.dumps(self.content).encode())
+        return res
+
+    def close(self):
+        pass
+
+
+class TestPooling(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.session = OandaSession(pool_size=4, retries=2)
+        self.account = OandaAccount('key', 'https://example.com/v3', session=self.session, id='001')
+
+    def test_session_adapter(self):
+        adapter = self.session.get_adapter('https://example.com')
+        self.assertEqual(adapter._pool_maxsize, 4)
+        self.assertEqual(adapter.max_retries.total, 2)
+        self.assertNotIn('POST', adapter.max_retries.allowed_methods)
+
+    def test_templates_are_copied(self):
+        first = self.account.create_order({'order': {'units': '100'}})
+        second = self.account.create_order({'order': {'units': '200'}})
+        self.assertIn(b'100', first.body)
+        self.assertIn(b'200', second.body)
+        self.assertEqual(first.headers['Content-Type'], 'application/json')
+        self.assertIsNot(first.headers, second.headers)
+        self.assertIsNone(self.account.get_orders().body)
+        self.assertEqual(self.account.cancel_order('7').url, 'https://example.com/v3/accounts/001/orders/7/cancel')
+        # one template is kept per route, not one per order or trade
+        for i in range(100):
+            self.account.cancel_order(str(i))
+            self.account.close_trade(f'@{i}')
+        self.assertEqual(self.account.close_trade('@5').url, 'https://example.com/v3/accounts/001/trades/@5/close')
+        self.assertEqual(len(self.account._templates), 4)
+        self.assertEqual(self.account.get_changes('10').url,
+                         'https://example.com/v3/accounts/001/changes?sinceTransactionID=10')
+
+    def test_get_accounts_shares_session(self):
+        adapter = FakeAdapter({'accounts': [{'id': '001'}, {'id': '002'}]})
+        self.session.mount('https://', adapter)
+        accounts = get_accounts('key', 'https://example.com/v3', session=self.session)
+        self.assertTrue(all(account.session is self.session for account in accounts))
+        adapter.content = {'changes': {'ordersCreated': []}, 'state': {'NAV': '1.0'}, 'lastTransactionID': '11'}
+        self.assertEqual(accounts[0].update_account('10'), '11')
+        self.assertEqual(accounts[0].NAV, '1.0')
+        self.assertEqual(len(adapter.sent), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import datetime as dt
+import tempfile
+import unittest
+import numpy as np
+
+from algotradingstuff.accounts import OandaAccount
+from algotradingstuff.data import Alignment, CandleAggregator, CandleCache, CandleFrame, Resampler, resample, to_ns
+from tests.test_backfill import FakeSession
+
+MINUTE = 60 * 10 ** 9
+
+
+def minutes(start, count):
+    """
+    M1 candles from `start`, whose close rises by one each minute
+    """
+    time = to_ns(start) + np.arange(count) * MINUTE
+    close = np.arange(count, dtype=np.float64)
+    return CandleFrame(time, close - 0.5, close + 1, close - 1, close, np.ones(count), np.ones(count, dtype=bool),
+                       granularity='M1')
+
+
+class TestAlignment(unittest.TestCase):
+
+    def test_bounds(self):
+        alignment = Alignment()
+        winter = to_ns(dt.datetime(2020, 1, 8, 12))
+        self.assertEqual(alignment.bucket(winter, 'M5'), (winter, winter + 5 * MINUTE))
+        self.assertEqual(alignment.bucket(winter, 'D'), (to_ns(dt.datetime(2020, 1, 7, 22)),
+                                                         to_ns(dt.datetime(2020, 1, 8, 22))))
+        self.assertEqual(alignment.bucket(winter, 'H4')[0], to_ns(dt.datetime(2020, 1, 8, 10)))
+        self.assertEqual(alignment.bucket(winter, 'W')[0], to_ns(dt.datetime(2020, 1, 3, 22)))
+        self.assertEqual(alignment.bucket(winter, 'M')[0], to_ns(dt.datetime(2019, 12, 31, 22)))
+        summer = to_ns(dt.datetime(2020, 7, 8, 12))
+        self.assertEqual(alignment.bucket(summer, 'D')[0], to_ns(dt.datetime(2020, 7, 7, 21)))
+        # the day New York moves its clocks forward is 23 hours long
+        self.assertEqual(alignment.bucket(to_ns(dt.datetime(2020, 3, 8, 20)), 'H12'),
+                         (to_ns(dt.datetime(2020, 3, 8, 10)), to_ns(dt.datetime(2020, 3, 8, 21))))
+        london = Alignment(daily_alignment=0, timezone='Europe/London', weekly_alignment='Monday')
+        self.assertEqual(london.bucket(winter, 'W')[0], to_ns(dt.datetime(2020, 1, 6)))
+        self.assertEqual(london.bucket(winter, 'M')[0], to_ns(dt.datetime(2020, 1, 1)))
+        self.assertRaises(ValueError, Alignment, weekly_alignment='Someday')
+
+    def test_vectorized(self):
+        alignment = Alignment()
+        times = to_ns(dt.datetime(2020, 1, 1)) + np.arange(0, 60 * 24 * 90, 37) * MINUTE
+        for granularity in ('H4', 'D', 'W', 'M'):
+            starts, ends = alignment.bounds(times, granularity)
+            expected = [alignment.bucket(time, granularity) for time in times[::97].tolist()]
+            self.assertEqual(list(zip(starts[::97].tolist(), ends[::97].tolist())), expected)
+
+
+class TestResample(unittest.TestCase):
+
+    def test_resample(self):
+        frame = minutes(dt.datetime(2020, 1, 8, 12), 12)
+        m5 = resample(frame, 'M5')
+        np.testing.assert_array_equal(m5.time, frame.time[[0, 5, 10]])
+        np.testing.assert_array_equal(m5.open, [-0.5, 4.5, 9.5])
+        np.testing.assert_array_equal(m5.high, [5, 10, 12])
+        np.testing.assert_array_equal(m5.low, [-1, 4, 9])
+        np.testing.assert_array_equal(m5.close, [4, 9, 11])
+        np.testing.assert_array_equal(m5.volume, [5, 5, 2])
+        np.testing.assert_array_equal(m5.complete, [True, True, False])
+        self.assertEqual(m5.granularity, 'M5')
+
+    def test_daily(self):
+        frame = minutes(dt.datetime(2020, 1, 7, 21), 60 * 26)
+        daily = resample(frame, 'D')
+        np.testing.assert_array_equal(daily.time, [to_ns(dt.datetime(2020, 1, 6, 22)), to_ns(dt.datetime(2020, 1, 7, 22)),
+                                                   to_ns(dt.datetime(2020, 1, 8, 22))])
+        np.testing.assert_array_equal(daily.volume, [60, 24 * 60, 60])
+        np.testing.assert_array_equal(daily.complete, [True, True, False])
+
+    def test_unsupported(self):
+        frame = minutes(dt.datetime(2020, 1, 1), 10)
+        self.assertRaises(ValueError, resample, frame, 'S5')
+        self.assertRaises(ValueError, resample, resample(frame, 'M2'), 'M5')
+        self.assertRaises(ValueError, resample, resample(frame, 'W'), 'M')
+        self.assertRaises(ValueError, Resampler, 'M', ['W'])
+
+
+class TestResampler(unittest.TestCase):
+
+    def test_matches_resample(self):
+        frame = minutes(dt.datetime(2020, 1, 7, 21), 60 * 30)
+        resampler = Resampler('M1', ['M5', 'H4', 'D'])
+        built = {granularity: [] for granularity in ('M5', 'H4', 'D')}
+        for chunk in (frame[:1], frame[1:2], frame[2:700], *(frame[i:i + 1] for i in range(700, len(frame)))):
+            for granularity, candles in resampler.update(chunk).items():
+                built[granularity].append(candles)
+        for granularity, frames in built.items():
+            incremental = CandleFrame.concat(frames + [resampler.current(granularity)])
+            batch = resample(frame, granularity)
+            for column in ('time', 'open', 'high', 'low', 'close', 'volume', 'complete'):
+                np.testing.assert_array_equal(getattr(incremental, column), getattr(batch, column), granularity)
+        self.assertRaises(ValueError, resampler.update, frame[:1])
+
+    def test_close(self):
+        resampler = Resampler('M1', ['H1'])
+        start = dt.datetime(2020, 1, 3, 21, 58)
+        self.assertEqual(resampler.update(minutes(start, 1)), {})
+        self.assertEqual(resampler.close(start + dt.timedelta(minutes=1)), {})
+        closed = resampler.close(start + dt.timedelta(days=2))
+        self.assertEqual(closed['H1'].time.tolist(), [to_ns(dt.datetime(2020, 1, 3, 21))])
+        self.assertTrue(closed['H1'].complete[0])
+        self.assertEqual(len(resampler.current('H1')), 0)
+
+
+class TestAlignedAggregator(unittest.TestCase):
+
+    def test_h4(self):
+        aggregator = CandleAggregator(['H4'])
+        start = to_ns(dt.datetime(2020, 1, 8, 9, 59))
+        aggregator.update_prices(start, {'mid': 1.0})
+        completed = aggregator.update_prices(start + MINUTE, {'mid': 1.1})
+        self.assertEqual(completed[0][1]['time'], f'{to_ns(dt.datetime(2020, 1, 8, 6)) // 10 ** 9}.000000000')
+
+
+class TestCachedResample(unittest.TestCase):
+
+    def test_get_resampled(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = CandleCache(directory)
+            account = OandaAccount('key', 'https://example.com/v3', id='001')
+            session = FakeSession()
+            start = dt.datetime(2020, 1, 1, 0, 20)
+            frame = cache.get_resampled(account, 'EUR_USD', start, start + dt.timedelta(hours=3), 'H1',
+                                        session=session, rate=None)
+            self.assertEqual(frame.granularity, 'H1')
+            self.assertEqual(frame.time[0], to_ns(dt.datetime(2020, 1, 1)))
+            self.assertEqual(frame.volume.tolist(), [60, 60, 60, 20])
+            self.assertEqual(frame.complete.tolist(), [True, True, True, False])
+            self.assertEqual(len(cache.coverage('EUR_USD', 'M1')), 1)
+            self.assertEqual(cache.coverage('EUR_USD', 'H1'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+import numpy as np
+
+from algotradingstuff.accounts import AccountState, OandaAccount, submit_orders
+from algotradingstuff.risk import RiskEngine, RiskError
+
+
+def position(instrument, long_units=0, long_price=0.0, short_units=0, short_price=0.0):
+    return {'instrument': instrument,
+            'long': {'units': str(long_units), 'averagePrice': str(long_price)},
+            'short': {'units': str(short_units), 'averagePrice': str(short_price)}}
+
+
+def price(instrument, bid, ask, factors=None):
+    message = {'type': 'PRICE', 'instrument': instrument, 'bids': [{'price': str(bid)}],
+               'asks': [{'price': str(ask)}]}
+    if factors is not None:
+        message['quoteHomeConversionFactors'] = {'positiveUnits': str(factors[0]), 'negativeUnits': str(factors[1])}
+    return message
+
+
+class TestRiskEngine(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.engine = RiskEngine(balance=10000.0, margin_rate=0.05)
+        self.engine.update_position(position('EUR_USD', 1000, 1.1))
+        self.engine.update_position(position('GBP_USD', short_units=-2000, short_price=1.3))
+
+    def test_revalue(self):
+        self.assertEqual(self.engine.unrealized_pl, 0)
+        self.engine.update_price(price('EUR_USD', 1.2, 1.2002))
+        self.assertAlmostEqual(self.engine.unrealized_pl, 100)
+        self.assertAlmostEqual(self.engine.margin_used, 1000 * 1.2001 * 0.05)
+        self.engine.update_price(price('GBP_USD', 1.2, 1.25, factors=(0.8, 0.9)))
+        self.assertAlmostEqual(self.engine.pl[1], -2000 * (1.25 - 1.3) * 0.9)
+        self.assertAlmostEqual(self.engine.unrealized_pl, 100 + 90)
+        self.assertAlmostEqual(self.engine.nav, 10190)
+        self.assertEqual(self.engine.exposure(), {'EUR_USD': 1000, 'GBP_USD': -2000})
+        self.assertAlmostEqual(self.engine.closeout_distance, self.engine.nav - self.engine.margin_used / 2)
+
+    def test_totals_match_arrays(self):
+        rng = np.random.default_rng(0)
+        for bid in rng.uniform(1.0, 1.5, 500):
+            self.engine.update_price(price('EUR_USD', bid, bid + 0.0002))
+            self.engine.update_price(price('GBP_USD', bid, bid + 0.0003))
+        self.engine.update_prices(['EUR_USD', 'GBP_USD', 'EUR_USD'], [1.3, 1.2, 1.4], [1.3002, 1.2003, 1.4002])
+        self.assertAlmostEqual(self.engine.pl[0], 300)
+        self.assertAlmostEqual(self.engine.unrealized_pl, self.engine.pl.sum())
+        self.assertAlmostEqual(self.engine.margin_used, self.engine.margin.sum())
+
+    def test_sync(self):
+        state = AccountState({'id': '001', 'balance': '500.0', 'marginRate': '0.02',
+                              'positions': [position('USD_JPY', 10, 100.0)]}, '1')
+        self.engine.update_price(price('EUR_USD', 1.2, 1.2002))
+        self.engine.sync(state)
+        self.assertEqual(self.engine.balance, 500)
+        self.assertEqual(self.engine.exposure(), {'USD_JPY': 10})
+        self.assertEqual(self.engine.unrealized_pl, 0)
+        self.engine.update_price(price('USD_JPY', 101.0, 101.02, factors=(0.01, 0.01)))
+        self.assertAlmostEqual(self.engine.unrealized_pl, 0.1)
+        self.assertAlmostEqual(self.engine.margin_used, 10 * 101.01 * 0.01 * 0.02)
+
+    def test_check_order(self):
+        engine = RiskEngine(balance=10000.0, margin_rate=0.05, max_order_units=5000,
+                            max_position_units={'EUR_USD': 3000}, max_margin_ratio=0.5)
+        engine.update_position(position('EUR_USD', 1000, 1.1))
+        engine.update_price(price('EUR_USD', 1.1, 1.1002))
+        engine.check_order({'order': {'type': 'MARKET', 'instrument': 'EUR_USD', 'units': '2000'}})
+        engine.check_order({'order': {'type': 'MARKET', 'instrument': 'EUR_USD', 'units': '-4000'}})
+        engine.check_order({})
+        self.assertRaises(RiskError, engine.check_order, {'order': {'instrument': 'USD_JPY', 'units': '6000'}})
+        self.assertRaises(RiskError, engine.check_order, {'order': {'instrument': 'EUR_USD', 'units': '2500'}})
+        # the margin check needs a price
+        self.assertRaises(RiskError, engine.check_order, {'order': {'instrument': 'USD_JPY', 'units': '100'}})
+        engine.update_price(price('USD_JPY', 100.0, 100.02, factors=(0.01, 0.01)))
+        engine.check_order({'order': {'instrument': 'USD_JPY', 'units': '4000'}})
+        with self.assertRaises(RiskError) as raised:
+            engine.max_margin_ratio = 0.001
+            engine.check_order({'order': {'instrument': 'USD_JPY', 'units': '4000'}})
+        self.assertIn('Reason the margin used would be', str(raised.exception))
+        # reducing a position is always allowed
+        engine.check_order({'order': {'instrument': 'EUR_USD', 'units': '-500'}})
+        # a rejected order for an instrument not seen before doesn't add it
+        self.assertRaises(RiskError, engine.check_order, {'order': {'instrument': 'FOO', 'units': '100'}})
+        self.assertNotIn('FOO', engine.instruments)
+
+    def test_check_orders(self):
+        engine = RiskEngine(max_position_units=3000)
+        orders = [{'order': {'instrument': 'EUR_USD', 'units': '2000'}} for _ in range(5)]
+        engine.check_order(orders[0])
+        self.assertRaises(RiskError, engine.check_orders, orders)
+        engine.check_orders([orders[0], {'order': {'instrument': 'EUR_USD', 'units': '-1000'}}, orders[0]])
+        self.assertEqual(engine.instruments, [])
+        margin = RiskEngine(balance=1000.0, margin_rate=0.5, max_margin_ratio=0.5)
+        margin.update_price(price('EUR_USD', 1.0, 1.0))
+        margin.check_orders([{'order': {'instrument': 'EUR_USD', 'units': '500'}}])
+        self.assertRaises(RiskError, margin.check_orders, [{'order': {'instrument': 'EUR_USD', 'units': '500'}}] * 3)
+
+    def test_hedging(self):
+        engine = RiskEngine(hedging=True, max_position_units=1500)
+        engine.update_position(position('EUR_USD', 1000, 1.1))
+        engine.check_order({'order': {'instrument': 'EUR_USD', 'units': '-2000'}})
+        netting = RiskEngine(max_position_units=1500)
+        netting.update_position(position('EUR_USD', 1000, 1.1))
+        self.assertRaises(RiskError, netting.check_order, {'order': {'instrument': 'EUR_USD', 'units': '-3000'}})
+
+    def test_account_checks_orders(self):
+        engine = RiskEngine(max_order_units=10)
+        account = OandaAccount('key', 'https://example.com/v3', risk=engine, id='001')
+        account.create_order({'order': {'type': 'MARKET', 'instrument': 'EUR_USD', 'units': '10'}})
+        self.assertRaises(RiskError, account.create_order,
+                          {'order': {'type': 'MARKET', 'instrument': 'EUR_USD', 'units': '11'}})
+        self.assertNotIn('risk', AccountState.from_account(account, '1').summary)
+
+    def test_submit_orders_checks_batch(self):
+        engine = RiskEngine(max_position_units=3000)
+        account = OandaAccount('key', 'https://example.com/v3', risk=engine, id='001')
+        orders = [{'order': {'type': 'MARKET', 'instrument': 'EUR_USD', 'units': '2000'}} for _ in range(5)]
+        self.assertRaises(RiskError, submit_orders, account, orders)
+
+
+if __name__ == '__main__':
+    unittest.main()
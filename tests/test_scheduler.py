@@ -0,0 +1,121 @@
+import io
+import threading
+import time
+import unittest
+from requests import Response
+from requests.adapters import BaseAdapter
+from requests.exceptions import ConnectionError
+
+from algotradingstuff.accounts import OandaAccount
+from algotradingstuff.sessions import OandaSession, Scheduler, SchedulerError, send_all
+from algotradingstuff.sessions.scheduler import is_trading, retry_after
+from algotradingstuff.testing import StubServer
+
+
+class ScriptedAdapter(BaseAdapter):
+    """
+    Answers each request with the next status in the script, then with 200
+    """
+
+    def __init__(self, script):
+        super().__init__()
+        self.script = list(script)
+        self.sent = []
+
+    def send(self, request, **kwargs):
+        self.sent.append(request)
+        status = self.script.pop(0) if self.script else 200
+        if isinstance(status, Exception):
+            raise status
+        status, headers = status if isinstance(status, tuple) else (status, {})
+        res = Response()
+        res.status_code = status
+        res.headers.update(headers)
+        res.raw = io.BytesIO(b'{"lastTransactionID": "1"}')
+        return res
+
+    def close(self):
+        pass
+
+
+class TestScheduler(unittest.TestCase):
+
+    def session(self, script, **kwargs):
+        session = OandaSession(scheduler=Scheduler(**{'backoff_factor': 0.01, **kwargs}))
+        adapter = ScriptedAdapter(script)
+        session.mount('https://', adapter)
+        return session, adapter
+
+    def setUp(self) -> None:
+        self.account = OandaAccount('key', 'https://example.com/v3', id='001')
+
+    def test_classify(self):
+        self.assertTrue(is_trading(self.account.create_order({})))
+        self.assertTrue(is_trading(self.account.get_open_trades()))
+        self.assertFalse(is_trading(self.account.get_candles('EUR_USD')))
+        self.assertFalse(is_trading(self.account.get_changes('1')))
+
+    def test_retry_after(self):
+        res = Response()
+        self.assertIsNone(retry_after(res))
+        res.headers['Retry-After'] = '2'
+        self.assertEqual(retry_after(res), 2.0)
+        res.headers['Retry-After'] = 'Wed, 21 Oct 2015 07:28:00 GMT'
+        self.assertEqual(retry_after(res), 0.0)
+
+    def test_retries_get(self):
+        session, adapter = self.session([503, ConnectionError(), 500])
+        self.assertEqual(session.send(self.account.get_candles('EUR_USD')), ({}, '1'))
+        self.assertEqual(len(adapter.sent), 4)
+
+    def test_does_not_repeat_orders(self):
+        session, adapter = self.session([500])
+        self.assertEqual(session.fetch(self.account.create_order({})).status_code, 500)
+        session, adapter = self.session([ConnectionError()])
+        self.assertRaises(ConnectionError, session.fetch, self.account.create_order({}))
+        session, adapter = self.session([429])
+        self.assertEqual(session.fetch(self.account.create_order({})).status_code, 200)
+        self.assertEqual(len(adapter.sent), 2)
+
+    def test_gives_up(self):
+        session, adapter = self.session([503] * 3, retries=2)
+        self.assertRaises(SchedulerError, session.send, self.account.get_orders())
+        self.assertEqual(len(adapter.sent), 3)
+
+    def test_retry_after_pauses_every_request(self):
+        session, adapter = self.session([(429, {'Retry-After': '0.2'})])
+        start = time.monotonic()
+        results = send_all(session, [self.account.get_candles('EUR_USD'), self.account.get_orders()], max_workers=2)
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertEqual(results, [({}, '1')] * 2)
+
+    def test_orders_get_priority(self):
+        scheduler = Scheduler(rate=20.0, trading_share=0.5)
+        for _ in range(10):
+            scheduler._acquire(trading=False)
+        done = []
+
+        def backfill():
+            for _ in range(5):
+                scheduler._acquire(trading=False)
+            done.append('data')
+
+        data = threading.Thread(target=backfill)
+        data.start()
+        start = time.monotonic()
+        for _ in range(10):
+            scheduler._acquire(trading=True)
+        self.assertLess(time.monotonic() - start, 0.1)
+        data.join()
+        self.assertEqual(done, ['data'])
+
+    def test_stub_throttling(self):
+        with StubServer(api_key='key', rate=20) as server:
+            session = OandaSession(scheduler=Scheduler(rate=None, retries=5))
+            account = OandaAccount('key', server.url, session=session, id='101-001-0000000-001')
+            results = send_all(session, [account.get_orders() for _ in range(30)], max_workers=8)
+        self.assertFalse([result for result in results if isinstance(result, Exception) or 'orders' not in result[0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+from decimal import Decimal
+
+from algotradingstuff.accounts import OandaAccount, AccountState, AccountError, Trade
+
+
+class FakeChangesSession:
+
+    def __init__(self, content, last_transaction_id):
+        self.content = content
+        self.last_transaction_id = last_transaction_id
+        self.urls = []
+
+    def send(self, request, **kwargs):
+        self.urls.append(request.url)
+        return dict(self.content), self.last_transaction_id
+
+
+class TestAccountState(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.account = OandaAccount('key', 'https://example.com/v3', id='001', balance='1000.0',
+                                    lastTransactionID='10',
+                                    orders=[{'id': '5', 'type': 'LIMIT'}],
+                                    trades=[{'id': '6', 'instrument': 'EUR_USD', 'currentUnits': '100'}],
+                                    positions=[{'instrument': 'EUR_USD', 'long': {'units': '100'}}])
+        self.state = AccountState.from_account(self.account)
+        self.changes = {
+            'changes': {'ordersCreated': [{'id': '11', 'type': 'STOP'}],
+                        'ordersFilled': [{'id': '5'}],
+                        'tradesOpened': [{'id': '12', 'instrument': 'GBP_USD', 'currentUnits': '50'}],
+                        'tradesClosed': [{'id': '6'}],
+                        'positions': [{'instrument': 'EUR_USD', 'long': {'units': '0'}}]},
+            'state': {'NAV': '1010.0', 'unrealizedPL': '10.0',
+                      'trades': [{'id': '12', 'unrealizedPL': '10.0'}],
+                      'positions': [{'instrument': 'EUR_USD', 'netUnrealizedPL': '0.0'}]}}
+
+    def test_from_account(self):
+        self.assertEqual(self.state.last_transaction_id, '10')
+        self.assertEqual(self.state.orders['5']['type'], 'LIMIT')
+        self.assertEqual(self.state.summary['balance'], '1000.0')
+        self.assertNotIn('api_key', self.state.summary)
+        # only what came from the API is part of the state, not attributes set on the account since
+        self.account.label = 'mine'
+        self.assertNotIn('label', AccountState.from_account(self.account).summary)
+
+    def test_apply_changes(self):
+        self.assertEqual(self.state.apply_changes(self.changes, '13'), 5)
+        self.assertEqual(set(self.state.orders), {'11'})
+        self.assertEqual(set(self.state.trades), {'12'})
+        self.assertEqual(self.state.trades['12']['unrealizedPL'], '10.0')
+        self.assertEqual(self.state.positions['EUR_USD']['netUnrealizedPL'], '0.0')
+        self.assertEqual(self.state.summary['NAV'], '1010.0')
+        self.assertEqual(self.state.last_transaction_id, '13')
+        self.state.apply_changes({'changes': {}, 'state': {}}, '12')
+        self.assertEqual(self.state.last_transaction_id, '13')
+
+    def test_position_state(self):
+        position = self.state.positions['EUR_USD']
+        self.assertIsNone(position.unrealized_pl)
+        self.state.apply_changes({'state': {'positions': [{'instrument': 'EUR_USD', 'netUnrealizedPL': '7.0',
+                                                           'longUnrealizedPL': '7.0', 'shortUnrealizedPL': '0.0'}]}},
+                                 '10')
+        self.assertEqual(position.unrealized_pl, 7.0)
+        self.assertEqual(position.net_unrealized_pl, 7.0)
+        self.assertEqual(position.long_unrealized_pl, 7.0)
+        self.assertEqual(position.short_unrealized_pl, 0.0)
+        self.assertEqual(position.long_units, 100.0)
+
+    def test_typed_records(self):
+        trade = self.state.trades['6']
+        self.assertIsInstance(trade, Trade)
+        self.assertEqual(trade.current_units, 100.0)
+        self.assertEqual(self.state.summary.balance, 1000.0)
+        self.assertEqual(self.state.positions['EUR_USD'].long_units, 100.0)
+        with self.assertRaises(AttributeError):
+            self.state.extra = 1
+
+    def test_updates_in_place(self):
+        state = AccountState.from_account(self.account, number=Decimal)
+        self.changes['changes']['tradesClosed'] = []
+        self.changes['state']['trades'].append({'id': '6', 'unrealizedPL': '-2.5'})
+        trade = state.trades['6']
+        self.assertEqual(trade.current_units, Decimal(100))
+        state.apply_changes(self.changes, '13')
+        self.assertIs(state.trades['6'], trade)
+        self.assertEqual(trade.unrealized_pl, Decimal('-2.5'))
+        self.assertEqual(trade._values['current_units'], Decimal(100))
+        self.assertEqual(state.summary.nav, Decimal('1010.0'))
+        self.assertEqual(state.summary.last_transaction_id, '13')
+
+    def test_poll(self):
+        session = FakeChangesSession(self.changes, '13')
+        self.state.poll(session, self.account)
+        self.assertIn('sinceTransactionID=10', session.urls[0])
+        self.assertEqual(self.state.last_transaction_id, '13')
+        self.assertRaises(AccountError, self.state.poll, FakeChangesSession({'errorMessage': 'no'}, None),
+                          self.account)
+
+    def test_follow(self):
+        session = FakeChangesSession(self.changes, '13')
+        messages = [{'type': 'HEARTBEAT', 'lastTransactionID': '10'},
+                    {'type': 'ORDER_FILL', 'id': '12'},
+                    {'type': 'ORDER_CREATE', 'id': '13'},
+                    {'type': 'HEARTBEAT', 'lastTransactionID': '13'}]
+        transactions = list(self.state.follow(messages, session, self.account))
+        self.assertEqual([t['id'] for t in transactions], ['12', '13'])
+        self.assertEqual(len(session.urls), 1)
+        self.assertFalse(self.state.pending)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import io
+import json
+import time
+import unittest
+from requests import Response
+from requests.adapters import BaseAdapter
+from requests.exceptions import ConnectionError
+
+from algotradingstuff.accounts import OandaAccount
+from algotradingstuff.data import CandleAggregator
+from algotradingstuff.sessions import OandaStreamSession, StreamError
+
+
+def price(time, bid, ask):
+    return {'type': 'PRICE', 'instrument': 'EUR_USD', 'time': f'{time}.000000000',
+            'bids': [{'price': f'{bid:.5f}', 'liquidity': 1000000}],
+            'asks': [{'price': f'{ask:.5f}', 'liquidity': 1000000}]}
+
+
+def heartbeat(time):
+    return {'type': 'HEARTBEAT', 'time': f'{time}.000000000'}
+
+
+class FakeStreamAdapter(BaseAdapter):
+    """
+    Fails to connect once, then sends each body in turn as a stream
+    """
+
+    def __init__(self, bodies, status=200, statuses=None):
+        super().__init__()
+        self.bodies = list(bodies)
+        self.status = status
+        # `(status, headers)` of the first responses, before they all get `status`
+        self.statuses = list(statuses or [])
+        self.sent = 0
+
+    def send(self, request, **kwargs):
+        self.sent += 1
+        if self.sent == 1:
+            raise ConnectionError('connection refused')
+        res = Response()
+        res.url = request.url
+        if self.statuses:
+            res.status_code, headers = self.statuses.pop(0)
+            res.headers.update(headers)
+            res.raw = io.BytesIO(b'{"errorMessage": "Service unavailable"}')
+            return res
+        res.status_code = self.status
+        lines = self.bodies.pop(0) if self.bodies else []
+        res.raw = io.BytesIO(b''.join(json.dumps(line).encode() + b'\n' for line in lines))
+        return res
+
+    def close(self):
+        pass
+
+
+class TestPricingStream(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.account = OandaAccount('key', 'https://api-fxpractice.oanda.com/v3', id='001')
+        self.request = self.account.get_pricing_stream(['EUR_USD', 'GBP_USD'])
+
+    def test_get_pricing_stream(self):
+        self.assertTrue(self.request.url.startswith('https://stream-fxpractice.oanda.com/v3/accounts/001/pricing/stream'))
+        self.assertIn('EUR_USD%2CGBP_USD', self.request.url)
+        self.assertEqual(self.request.headers['Authorization'], 'Bearer key')
+
+    def test_stream_reconnects(self):
+        session = OandaStreamSession()
+        adapter = FakeStreamAdapter([[price(0, 1.1, 1.2), heartbeat(5)], [price(10, 1.1, 1.2)]])
+        session.mount('https://', adapter)
+        messages = session.messages(self.request, backoff=0, max_retries=2)
+        self.assertEqual(next(messages)['time'], '0.000000000')
+        self.assertEqual(next(messages)['time'], '10.000000000')
+        self.assertRaises(StreamError, list, messages)
+        self.assertEqual(adapter.sent, 5)
+
+    def test_stream_error_status(self):
+        session = OandaStreamSession()
+        adapter = FakeStreamAdapter([[]], status=401)
+        adapter.sent = 1
+        session.mount('https://', adapter)
+        self.assertRaises(StreamError, next, session.messages(self.request, backoff=0))
+
+    def test_stream_retries_unavailable(self):
+        session = OandaStreamSession()
+        adapter = FakeStreamAdapter([[price(0, 1.1, 1.2)]], statuses=[(503, {}), (429, {'Retry-After': '0.2'})])
+        adapter.sent = 1
+        session.mount('https://', adapter)
+        start = time.monotonic()
+        self.assertEqual(next(session.messages(self.request, backoff=0))['time'], '0.000000000')
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertEqual(adapter.sent, 4)
+
+
+class TestCandleAggregator(unittest.TestCase):
+
+    def test_feed(self):
+        aggregator = CandleAggregator(['S5', 'M1'], price='MBA')
+        messages = [price(0, 1.0, 1.2), price(2, 1.4, 1.6), price(4, 0.8, 1.0), price(6, 1.2, 1.4),
+                    heartbeat(61)]
+        candles = list(aggregator.feed(messages))
+        self.assertEqual([g for g, _ in candles], ['S5', 'S5', 'M1'])
+        s5 = candles[0][1]
+        self.assertTrue(s5['complete'])
+        self.assertEqual(s5['volume'], 3)
+        self.assertEqual(s5['time'], '0.000000000')
+        self.assertEqual(s5['mid'], {'o': 1.1, 'h': 1.5, 'l': 0.9, 'c': 0.9})
+        self.assertEqual(s5['bid']['h'], 1.4)
+        self.assertEqual(candles[1][1]['time'], '5.000000000')
+        self.assertEqual(candles[2][1]['volume'], 4)
+        self.assertIsNone(aggregator.current('M1'))
+
+    def test_unsupported_granularity(self):
+        self.assertRaises(ValueError, CandleAggregator, ['D'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import datetime as dt
+import itertools
+import os
+import tempfile
+import unittest
+import requests
+
+from algotradingstuff.accounts import AccountError, AccountState, get_account, get_accounts
+from algotradingstuff.data import CandleFrame
+from algotradingstuff.sessions import OandaSession, OandaStreamSession
+from algotradingstuff.testing import StubServer, RecordingProxy, ReplayServer
+
+
+class TestStubServer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.server = StubServer(api_key='key', stream_messages=3, stream_interval=0.01).start()
+        self.session = OandaSession()
+        self.account = get_account('101-001-0000000-001', 'key', self.server.url, session=self.session)
+
+    def tearDown(self) -> None:
+        self.session.close()
+        self.server.stop()
+
+    def test_accounts(self):
+        self.assertEqual(get_accounts('key', self.server.url)[0].id, '101-001-0000000-001')
+        self.assertRaises(AccountError, get_accounts, 'wrong', self.server.url)
+        self.assertRaises(AccountError, get_account, '999', 'key', self.server.url)
+        self.assertEqual(self.account.balance, '100000.0')
+
+    def test_orders_and_changes(self):
+        state = AccountState.from_account(self.account)
+        order = {'order': {'type': 'MARKET', 'units': '100', 'instrument': 'GBP_USD'}}
+        content, last_transaction_id = self.session.send(self.account.create_order(order))
+        self.assertIn('orderFillTransaction', content)
+        state.poll(self.session, self.account)
+        self.assertEqual(state.last_transaction_id, last_transaction_id)
+        self.assertEqual([trade['currentUnits'] for trade in state.trades.values()], ['100'])
+        self.assertTrue(self.account.update_account_state(last_transaction_id))
+        self.assertRaises(AccountError, self.account.update_account_state, '0000')
+        content, _ = self.session.send(self.account.close_position('GBP_USD', long=True))
+        self.assertIn('longOrderFillTransaction', content)
+        state.poll(self.session, self.account)
+        self.assertEqual(state.trades, {})
+
+    def test_candles(self):
+        end = dt.datetime.now() - dt.timedelta(hours=1)
+        content, _ = self.session.send(self.account.get_candles('EUR_USD', end=end.strftime('%Y-%m-%d %H:%M:%S'),
+                                                                 price='BA', count=10))
+        frame = CandleFrame.from_payload(content, 'ask')
+        self.assertEqual(len(frame), 10)
+        self.assertTrue((frame.high >= frame.low).all())
+
+    def test_pricing_stream(self):
+        stream = OandaStreamSession()
+        request = self.account.get_pricing_stream(['EUR_USD'])
+        messages = list(itertools.islice(stream.messages(request, max_retries=0), 3))
+        self.assertEqual([m['type'] for m in messages], ['PRICE'] * 3)
+        stream.close()
+
+    def test_throttling_and_errors(self):
+        with StubServer(rate=2) as throttled:
+            codes = [requests.get(f'{throttled.url}/accounts').status_code for _ in range(5)]
+        self.assertIn(429, codes)
+        with StubServer(error_rate=1.0) as failing:
+            self.assertEqual(requests.get(f'{failing.url}/accounts').status_code, 500)
+
+
+class TestReplay(unittest.TestCase):
+
+    def test_record_and_replay(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'session.jsonl')
+            with StubServer() as stub, RecordingProxy(stub.url[:-len('/v3')], path) as proxy:
+                recorded = [requests.get(f'{proxy.url}/accounts').content,
+                            requests.post(f'{proxy.url}/accounts/101-001-0000000-001/orders',
+                                          json={'order': {'units': '1', 'instrument': 'EUR_USD'}}).content]
+            with ReplayServer(path) as replay:
+                replayed = [requests.get(f'{replay.url}/accounts').content,
+                            requests.post(f'{replay.url}/accounts/101-001-0000000-001/orders',
+                                          json={'order': {'units': '1', 'instrument': 'EUR_USD'}}).content]
+                self.assertEqual(requests.get(f'{replay.url}/missing').status_code, 404)
+        self.assertEqual(recorded, replayed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+import numpy as np
+
+from algotradingstuff.backtest import sweep, parameter_grid, walk_forward, backtest_positions
+from algotradingstuff.indicators import sma
+from tests.test_backtest import make_frames
+
+
+def crossover(train, test, fast, slow):
+    close = (test['bid'].close + test['ask'].close) / 2
+    position = np.where(sma(close, fast) > sma(close, slow), 1000.0, -1000.0)
+    position[np.isnan(sma(close, slow))] = 0.0
+    return backtest_positions(position, test['bid'].close, test['ask'].close).summary()
+
+
+class TestSweep(unittest.TestCase):
+
+    def test_parameter_grid(self):
+        self.assertEqual(parameter_grid({'a': [1, 2], 'b': [3]}), [{'a': 1, 'b': 3}, {'a': 2, 'b': 3}])
+
+    def test_walk_forward(self):
+        folds = walk_forward(100, 3, 40)
+        self.assertEqual(folds[0], (slice(0, 40), slice(40, 60)))
+        self.assertEqual(folds[2], (slice(40, 80), slice(80, 100)))
+        self.assertRaises(ValueError, walk_forward, 10, 3, 10)
+
+    def test_sweep(self):
+        close = 1.1 + np.cumsum(np.random.default_rng(4).normal(scale=0.0005, size=3000))
+        bid, ask = make_frames(close)
+        table = sweep(crossover, {'bid': bid, 'ask': ask}, {'fast': [5, 10], 'slow': [20, 40]},
+                      folds=4, train=1000, max_workers=2)
+        self.assertEqual(len(table), 4)
+        self.assertEqual(table[0]['folds'], 4)
+        self.assertEqual([row['pl'] for row in table], sorted((row['pl'] for row in table), reverse=True))
+        expected = np.mean([crossover({}, {'bid': bid[s], 'ask': ask[s]}, 5, 20)['pl']
+                            for _, s in walk_forward(3000, 4, 1000)])
+        row = next(row for row in table if row['fast'] == 5 and row['slow'] == 20)
+        self.assertAlmostEqual(row['pl'], expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
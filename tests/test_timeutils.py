@@ -0,0 +1,62 @@
+import datetime as dt
+import unittest
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+
+from algotradingstuff.accounts import OandaAccount
+from algotradingstuff.data import align, parse_times, to_ns, to_unix_string
+
+NEW_YEAR = 1577836800 * 10 ** 9
+
+
+class TestTimeUtils(unittest.TestCase):
+
+    def test_to_ns(self):
+        self.assertEqual(to_ns(dt.datetime(2020, 1, 1)), NEW_YEAR)
+        self.assertEqual(to_ns(dt.datetime(2020, 1, 1, 1, tzinfo=dt.timezone(dt.timedelta(hours=1)))), NEW_YEAR)
+        self.assertEqual(to_ns(dt.datetime(2020, 1, 1, microsecond=1)), NEW_YEAR + 1000)
+        self.assertEqual(to_ns(dt.date(2020, 1, 1)), NEW_YEAR)
+        self.assertEqual(to_ns(np.datetime64('2020-01-01T00:00:00.000000001')), NEW_YEAR + 1)
+        self.assertEqual(to_ns('2020-01-01T00:00:00.000000001Z'), NEW_YEAR + 1)
+        self.assertEqual(to_ns('1577836800.000000001'), NEW_YEAR + 1)
+        self.assertEqual(to_ns(NEW_YEAR), NEW_YEAR)
+        self.assertEqual(to_ns(1577836800, unit='s'), NEW_YEAR)
+        self.assertEqual(to_ns(1577836800.5, unit='s'), NEW_YEAR + 500_000_000)
+        self.assertRaises(TypeError, to_ns, None)
+
+    def test_legacy_string(self):
+        local = dt.datetime(2020, 1, 1).astimezone()
+        self.assertEqual(to_ns('2020-01-01 00:00:00'), to_ns(local))
+
+    def test_to_unix_string(self):
+        self.assertEqual(to_unix_string(NEW_YEAR + 1), '1577836800.000000001')
+        self.assertEqual(to_unix_string(dt.datetime(2020, 1, 1)), '1577836800.000000000')
+        self.assertEqual(to_unix_string(-1), '-1.999999999')
+
+    def test_parse_times(self):
+        times = parse_times(['1577836800.000000000', '1577836860.5'])
+        self.assertEqual(times.tolist(), [NEW_YEAR, NEW_YEAR + 60_500_000_000])
+        times = parse_times(['2020-01-01T00:00:00.000000000Z', '2020-01-01T00:02:00.000000001Z'])
+        self.assertEqual(times.tolist(), [NEW_YEAR, NEW_YEAR + 120 * 10 ** 9 + 1])
+
+    def test_align(self):
+        self.assertEqual(align(NEW_YEAR + 61 * 10 ** 9, 'M1'), NEW_YEAR + 60 * 10 ** 9)
+        self.assertEqual(align(NEW_YEAR + 61 * 10 ** 9, 'M1', ceil=True), NEW_YEAR + 120 * 10 ** 9)
+        self.assertEqual(align(NEW_YEAR, 'H1', ceil=True), NEW_YEAR)
+        self.assertEqual(align(NEW_YEAR + 1, 'D'), NEW_YEAR + 1)
+
+    def test_account_times(self):
+        account = OandaAccount('key', 'https://example.com/v3', id='001')
+        for start in (dt.datetime(2020, 1, 1), np.datetime64('2020-01-01'), 1577836800):
+            request = account.get_candles('EUR_USD', start=start, end=1577840400.25)
+            params = parse_qs(urlparse(request.url).query)
+            self.assertEqual(params['from'], ['1577836800.000000000'])
+            self.assertEqual(params['to'], ['1577840400.250000000'])
+            self.assertNotIn('count', params)
+        params = parse_qs(urlparse(account.get_candles('EUR_USD', count=5).url).query)
+        self.assertEqual(params['count'], ['5'])
+        self.assertNotIn('from', params)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import tempfile
+import unittest
+
+from algotradingstuff.accounts import OandaAccount, get_account
+from algotradingstuff.data import TransactionStore, TransactionSyncError, sync_transactions
+from algotradingstuff.sessions import OandaSession
+from algotradingstuff.testing import StubServer
+
+
+class TestTransactionStore(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = TransactionStore(self.directory.name, '001')
+        self.transactions = [
+            {'id': '1', 'time': '100.000000000', 'type': 'CREATE'},
+            {'id': '2', 'time': '200.000000000', 'type': 'ORDER_FILL', 'instrument': 'EUR_USD', 'units': '10'},
+            {'id': '3', 'time': '300.000000000', 'type': 'ORDER_FILL', 'instrument': 'GBP_USD', 'units': '5'},
+            {'id': '4', 'time': '400.000000000', 'type': 'MARKET_ORDER', 'instrument': 'EUR_USD'},
+        ]
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_append(self):
+        self.assertEqual(self.store.append(self.transactions[2:]), 2)
+        self.assertEqual(self.store.append(self.transactions), 0)
+        self.assertEqual(self.store.last_id, 4)
+        self.assertEqual(len(TransactionStore(self.directory.name, '001')), 2)
+
+    def test_query(self):
+        self.store.append(self.transactions[:2])
+        self.store.append(self.transactions[2:])
+        fills = self.store.query('EUR_USD', 'ORDER_FILL')
+        self.assertEqual(fills, [self.transactions[1]])
+        self.assertEqual([t['id'] for t in self.store.query(types=['ORDER_FILL', 'CREATE'])], ['1', '2', '3'])
+        self.assertEqual([t['id'] for t in self.store.query(start=200 * 10 ** 9, end=400 * 10 ** 9)], ['2', '3'])
+        self.assertEqual([t['id'] for t in self.store.query(since_id='2')], ['3', '4'])
+        self.assertEqual(self.store.query('USD_JPY'), [])
+        self.assertEqual(self.store.query(types='STOP_ORDER'), [])
+        self.assertEqual(self.store.get('3'), self.transactions[2])
+        self.assertIsNone(self.store.get('9'))
+
+    def test_unfinished_write(self):
+        self.store.append(self.transactions[:2])
+        with open(f'{self.store._path}.jsonl', 'ab') as fh:
+            fh.write(b'{"id": "3", "ti')
+        self.store.append(self.transactions[2:])
+        self.assertEqual(self.store.query(), self.transactions)
+
+
+class TestSyncTransactions(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.server = StubServer(api_key='key').start()
+        self.session = OandaSession()
+        self.account = get_account('101-001-0000000-001', 'key', self.server.url, session=self.session)
+        self.store = TransactionStore(self.directory.name, self.account.id)
+
+    def tearDown(self) -> None:
+        self.session.close()
+        self.server.stop()
+        self.directory.cleanup()
+
+    def order(self, instrument):
+        self.session.send(self.account.create_order({'order': {'type': 'MARKET', 'units': '10',
+                                                               'instrument': instrument}}))
+
+    def test_sync(self):
+        for instrument in ('EUR_USD', 'GBP_USD', 'EUR_USD'):
+            self.order(instrument)
+        added = sync_transactions(self.account, self.store, session=self.session, page_size=2)
+        self.assertEqual(added, 7)
+        self.assertEqual(len(self.store.query('EUR_USD', 'ORDER_FILL')), 2)
+        self.order('EUR_USD')
+        self.assertEqual(sync_transactions(self.account, self.store, page_size=2), 2)
+        self.assertEqual(sync_transactions(self.account, self.store, session=self.session), 0)
+        self.assertEqual(self.store.last_id, 9)
+
+    def test_sync_since_last(self):
+        sent = []
+        send = self.session.send
+        self.session.send = lambda request, **kwargs: sent.append(request.url) or send(request, **kwargs)
+        self.assertEqual(sync_transactions(self.account, self.store, session=self.session), 1)
+        self.assertTrue(sent[0].endswith('/summary'))
+        self.order('EUR_USD')
+        sent.clear()
+        self.assertEqual(sync_transactions(self.account, self.store, session=self.session), 2)
+        self.assertEqual(len(sent), 1)
+        self.assertIn('/transactions/sinceid?id=1', sent[0])
+        self.order('EUR_USD')
+        self.order('GBP_USD')
+        self.assertEqual(sync_transactions(self.account, self.store, session=self.session), 4)
+        self.assertEqual(self.store.last_id, 7)
+
+    def test_failed_sync(self):
+        account = OandaAccount('key', self.server.url, session=self.session, id='999')
+        self.assertRaises(TransactionSyncError, sync_transactions, account, self.store, session=self.session)
+        self.assertEqual(len(self.store), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()